@@ -1 +1,13 @@
-"""Glyph core package."""
+"""Glyph core package.
+
+``from core import Client`` is the in-process API (see ``core.client``).
+"""
+
+
+def __getattr__(name):
+    # ленивый реэкспорт: ``import core.<module>`` не тянет весь клиент
+    if name == "Client":
+        from core.client import Client
+
+        return Client
+    raise AttributeError(f"module 'core' has no attribute {name!r}")
@@ -1,32 +1,392 @@
-import os
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""HTTP client for chat-completion APIs (``ai`` config section).
+
+``AIClient`` keeps a pool of keep-alive ``http.client`` connections, caps
+concurrent requests, spaces them with a token bucket and retries 429/5xx
+and connection errors with exponential backoff (honouring ``Retry-After``).
+Responses can be cached on disk (``ResponseCache``, SQLite) keyed by model
+and a hash of the request, with a TTL, so bulk enrichment does not pay
+twice for identical prompts.
+
+The endpoint is configurable, so tests and CI run against a local stub.
+"""
+
+import hashlib
+import http.client
 import json
-import subprocess
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+DEFAULT_ENDPOINT = "https://api.openai.com/v1/chat/completions"
+DEFAULT_MODEL = "gpt-3.5-turbo"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# сервер закрыл простаивавшее keep-alive соединение: запрос не ушёл или
+# ответа не было вовсе — такое повторяется сразу, без backoff
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class AIRequestError(RuntimeError):
+    """Request failed after all retries (or with a non-retryable status)."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class TokenBucket:
+    """Allows ``rate`` acquisitions per second with bursts of ``capacity``."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._stamp) * self.rate
+                )
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """Disk cache of responses keyed by (model, request hash), with TTL.
+
+    Args:
+        path (Path): SQLite file.
+        ttl (float): Seconds a response stays valid.
+    """
+
+    def __init__(self, path: Union[str, Path], ttl: float = 7 * 24 * 3600):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._get_conn()
+        try:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    model TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    expires REAL NOT NULL,
+                    PRIMARY KEY (model, key)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_expires "
+                "ON responses (expires)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        # кэш делят потоки пула: соединение на операцию, ожидание блокировки
+        return sqlite3.connect(str(self.path), timeout=30)
+
+    @staticmethod
+    def key(model: str, payload: Dict[str, Any]) -> str:
+        """Hash of everything that affects the answer except the model name."""
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, model: str, key: str) -> Optional[Dict[str, Any]]:
+        conn = self._get_conn()
+        try:
+            row = conn.execute(
+                "SELECT response FROM responses "
+                "WHERE model = ? AND key = ? AND expires > ?",
+                (model, key, time.time()),
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+        finally:
+            conn.close()
+
+    def put(self, model: str, key: str, response: Dict[str, Any]) -> None:
+        conn = self._get_conn()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (model, key, response, expires) "
+                "VALUES (?, ?, ?, ?)",
+                (model, key, json.dumps(response), time.time() + self.ttl),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def evict_expired(self) -> int:
+        """Deletes expired responses; returns how many."""
+        conn = self._get_conn()
+        try:
+            cur = conn.execute(
+                "DELETE FROM responses WHERE expires <= ?", (time.time(),)
+            )
+            conn.commit()
+            return cur.rowcount
+        finally:
+            conn.close()
+
 
-# Можно будет реализовать вызов curl или написать на socket
+class _ConnectionPool:
+    """Idle keep-alive connections to one host (LIFO: warmest first)."""
 
+    def __init__(self, endpoint: str, timeout: float):
+        parts = urlsplit(endpoint)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported endpoint scheme: {endpoint}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.opened = 0
 
-def query_ai(prompt, model="gpt-3.5-turbo", api_key_env="OPENAI_API_KEY"):
+    def get(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """Returns (connection, reused)."""
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            pass
+        cls = (
+            http.client.HTTPSConnection
+            if self.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        with self._lock:
+            self.opened += 1
+        return cls(self.host, self.port, timeout=self.timeout), False
+
+    def put(self, conn: http.client.HTTPConnection) -> None:
+        self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class AIClient:
+    """Pooled, rate-limited chat-completion client.
+
+    Args:
+        endpoint (str): Full URL of the chat-completions endpoint.
+        api_key (str, optional): Sent as a bearer token when set.
+        model (str): Default model.
+        max_concurrency (int): Requests in flight (and pooled connections).
+        rate (float): Requests per second; 0 disables rate limiting.
+        burst (float, optional): Token bucket capacity (default: ``rate``).
+        max_retries (int): Retries after the first attempt.
+        backoff (float): Base delay; attempt ``n`` waits ``backoff * 2**n``
+            plus jitter, or ``Retry-After`` when the server sends it.
+        timeout (float): Socket timeout per request.
+        cache (ResponseCache, optional): Response cache.
+        logger (logging.Logger, optional): Logger instance.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = DEFAULT_ENDPOINT,
+        api_key: Optional[str] = None,
+        model: str = DEFAULT_MODEL,
+        max_concurrency: int = 4,
+        rate: float = 0,
+        burst: Optional[float] = None,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 60,
+        cache: Optional[ResponseCache] = None,
+        logger=None,
+    ):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache
+        self.logger = logger
+        self._pool = _ConnectionPool(endpoint, timeout)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._bucket = TokenBucket(rate, burst)
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "cache_hits": 0}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], logger=None) -> "AIClient":
+        """Builds a client from the ``ai`` config section."""
+        cfg = config.get("ai", {})
+        cache_cfg = cfg.get("cache", {})
+        cache = None
+        if cache_cfg.get("path"):
+            cache = ResponseCache(
+                cache_cfg["path"], cache_cfg.get("ttl", 7 * 24 * 3600)
+            )
+        return cls(
+            endpoint=cfg.get("endpoint", DEFAULT_ENDPOINT),
+            api_key=os.environ.get(cfg.get("api_key_env", "OPENAI_API_KEY")),
+            model=cfg.get("model", DEFAULT_MODEL),
+            max_concurrency=cfg.get("max_concurrency", 4),
+            rate=cfg.get("rate_per_second", 0),
+            burst=cfg.get("burst"),
+            max_retries=cfg.get("max_retries", 3),
+            backoff=cfg.get("backoff", 0.5),
+            timeout=cfg.get("timeout", 60),
+            cache=cache,
+            logger=logger,
+        )
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _send(self, body: bytes) -> Dict[str, Any]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        attempt = 0
+        while True:
+            self._bucket.acquire()
+            conn, reused = self._pool.get()
+            delay = None
+            try:
+                conn.request("POST", self._pool.path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                # таймауты и прочие ошибки идут через backoff и счётчик попыток
+                if reused and isinstance(exc, STALE_CONNECTION_ERRORS):
+                    continue
+                error = AIRequestError(f"{self.endpoint}: {exc}")
+            else:
+                if resp.will_close:
+                    conn.close()
+                else:
+                    self._pool.put(conn)
+                self._count("requests")
+                if resp.status == 200:
+                    return json.loads(data)
+                error = AIRequestError(
+                    f"{self.endpoint}: HTTP {resp.status} {data[:200]!r}", resp.status
+                )
+                if resp.status not in RETRY_STATUSES:
+                    raise error
+                retry_after = resp.getheader("Retry-After")
+                if retry_after and retry_after.replace(".", "", 1).isdigit():
+                    delay = float(retry_after)
+            if attempt >= self.max_retries:
+                raise error
+            if delay is None:
+                delay = self.backoff * (2**attempt) * (1 + random.random() / 2)
+            if self.logger:
+                self.logger.warning(
+                    f"AI request failed ({error}); retry in {delay:.2f}s"
+                )
+            self._count("retries")
+            time.sleep(delay)
+            attempt += 1
+
+    def complete(
+        self, prompt: str, model: Optional[str] = None, **params: Any
+    ) -> Dict[str, Any]:
+        """Sends one chat prompt; returns the decoded JSON response.
+
+        Extra ``params`` (temperature, max_tokens, ...) go into the request
+        body and into the cache key.
+        """
+        model = model or self.model
+        payload = {"messages": [{"role": "user", "content": prompt}], **params}
+        key = None
+        if self.cache is not None:
+            key = ResponseCache.key(model, payload)
+            cached = self.cache.get(model, key)
+            if cached is not None:
+                self._count("cache_hits")
+                return cached
+        body = json.dumps({"model": model, **payload}).encode()
+        with self._slots:
+            response = self._send(body)
+        if self.cache is not None:
+            self.cache.put(model, key, response)
+        return response
+
+    def complete_many(
+        self, prompts: Iterable[str], model: Optional[str] = None, **params: Any
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """Runs prompts concurrently (``max_concurrency``), keeping order.
+
+        Identical prompts are sent once. Failures are returned in place as
+        exceptions instead of aborting the batch.
+        """
+        prompts = list(prompts)
+        unique = list(dict.fromkeys(prompts))
+
+        def one(prompt: str):
+            try:
+                return self.complete(prompt, model, **params)
+            except Exception as exc:  # noqa: BLE001
+                return exc
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            answers = dict(zip(unique, pool.map(one, unique)))
+        return [answers[p] for p in prompts]
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def __enter__(self) -> "AIClient":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+_default: Optional[AIClient] = None
+_default_lock = threading.Lock()
+
+
+def query_ai(prompt, model=DEFAULT_MODEL, api_key_env="OPENAI_API_KEY"):
+    """Backward-compatible one-shot call; None without a key or on failure."""
+    global _default
     api_key = os.environ.get(api_key_env)
     if not api_key:
         return None
-    # Пример вызова через curl (системный вызов)
-    cmd = [
-        "curl",
-        "https://api.openai.com/v1/chat/completions",
-        "-H",
-        f"Authorization: Bearer {api_key}",
-        "-H",
-        "Content-Type: application/json",
-        "-d",
-        json.dumps(
-            {
-                "model": model,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.7,
-            }
-        ),
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode == 0:
-        return json.loads(result.stdout)
-    return None
+    with _default_lock:
+        if _default is None or _default.api_key != api_key:
+            _default = AIClient(api_key=api_key, model=model)
+        client = _default
+    try:
+        return client.complete(prompt, model=model, temperature=0.7)
+    except (AIRequestError, ValueError):
+        return None
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""asyncio API for Glyph.
+
+``AsyncClient`` mirrors ``core.client.Client`` for asyncio services. Blocking
+work (file hashing, archive copies, SQLite) runs on a bounded thread pool;
+the crypto module is driven through asyncio subprocess streams. A semaphore
+caps in-flight operations, so thousands of concurrent ``add`` calls overlap
+their I/O without one thread per request.
+
+Every coroutine accepts ``timeout`` (seconds) and can be cancelled; an
+``add`` interrupted mid-copy removes its partial archive file once the
+worker thread finishes.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+from core.client import AddResult, Client, Entry, PathLike, VerifyResult
+from core.exceptions import IngestError
+from core.ingest import IngestItem, IngestStages, hash_item
+from core.ipc import AsyncModuleIPC
+from core.reader import is_entry_compressed, is_entry_encrypted
+
+
+class AsyncClient:
+    """Embeddable asyncio Glyph client.
+
+    Args:
+        config (dict): Settings (same layout as ``config/settings.json``).
+        max_concurrency (int): Operations allowed in flight at once.
+        executor_workers (int, optional): Threads for blocking work
+            (default: ``async.executor_workers`` or 32).
+        **kwargs: Passed to ``Client`` (``logger``, ``base_dir``, ``master_key``).
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        max_concurrency: int = 256,
+        executor_workers: Optional[int] = None,
+        **kwargs,
+    ):
+        self._client = Client(config, **kwargs)
+        async_cfg = config.get("async", {})
+        self._executor = ThreadPoolExecutor(
+            max_workers=executor_workers or async_cfg.get("executor_workers", 32),
+            thread_name_prefix="glyph-async",
+        )
+        self._max_concurrency = max_concurrency
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._stages: Optional[IngestStages] = None
+        self._ipc: Optional[AsyncModuleIPC] = None
+        if self._client.crypto_ipc is not None:
+            self._ipc = AsyncModuleIPC(
+                self._client.crypto_ipc.module_path, logger=self._client.logger
+            )
+
+    @property
+    def client(self) -> Client:
+        """Underlying synchronous client (shares store, audit log and keys)."""
+        return self._client
+
+    async def aclose(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._client.close()
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    @asynccontextmanager
+    async def _slot(self, timeout: Optional[float]):
+        # семафор создаётся лениво, внутри работающего event loop
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self._max_concurrency)
+        async with asyncio.timeout(timeout):
+            async with self._sem:
+                yield
+
+    def _submit(self, func: Callable, *args) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def _run(self, func: Callable, *args) -> Any:
+        return await self._submit(func, *args)
+
+    def _ingest_stages(self) -> IngestStages:
+        if self._stages is None:
+            self._stages = IngestStages(self._client._ingest_context())
+        return self._stages
+
+    async def _hash(self, item: IngestItem) -> IngestItem:
+        if self._ipc is None:
+            return await self._run(hash_item, self._client.hash_algo, item)
+        path = item.source
+        if not path.is_file():
+            raise FileNotFoundError(f"File not found: {path}")
+        item.size_bytes = path.stat().st_size
+        resp = await self._ipc.call(
+            {
+                "cmd": "hash",
+                "path": str(path.resolve()),
+                "algorithm": self._client.hash_algo,
+            }
+        )
+        if "error" in resp:
+            raise IngestError(resp["error"])
+        item.file_hash = resp["result"]
+        return item
+
+    # -------------------------
+    # API
+    # -------------------------
+    async def add(
+        self,
+        path: PathLike,
+        title: Optional[str] = None,
+        author: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        verify: bool = True,
+        timeout: Optional[float] = None,
+    ) -> AddResult:
+        """Adds one file; raises ``DuplicateEntryError`` / ``IngestError``."""
+        item = IngestItem(
+            Path(path).expanduser().resolve(),
+            title=title,
+            author=author,
+            tags=list(tags or []),
+            verify=verify,
+        )
+        async with self._slot(timeout):
+            stages = await self._run(self._ingest_stages)
+            await self._hash(item)
+            steps = [stages.dedup, stages.archive, stages.register]
+            if stages.ctx.minhasher is not None:
+                steps.insert(1, stages.near_dup)
+            for step in steps:
+                fut = self._submit(step, item)
+                try:
+                    await asyncio.shield(fut)
+                except asyncio.CancelledError:
+                    # поток ещё пишет файл: убираем результат, когда он закончит
+                    fut.add_done_callback(lambda _: stages.cleanup(item))
+                    raise
+                except Exception:
+                    stages.cleanup(item)
+                    raise
+        return AddResult(item.entry_id, item.source, item.archive_path, item.file_hash)
+
+    async def add_many(
+        self, paths: List[PathLike], timeout: Optional[float] = None, **kwargs
+    ) -> List[Any]:
+        """Adds files concurrently.
+
+        Returns:
+            list: ``AddResult`` or the raised exception, in input order.
+        """
+        return await asyncio.gather(
+            *(self.add(p, timeout=timeout, **kwargs) for p in paths),
+            return_exceptions=True,
+        )
+
+    async def verify(
+        self,
+        id: Optional[int] = None,
+        hash: Optional[str] = None,
+        path: Optional[PathLike] = None,
+        timeout: Optional[float] = None,
+    ) -> VerifyResult:
+        """Re-hashes one entry and records the outcome (see ``Client.verify``)."""
+        client = self._client
+        async with self._slot(timeout):
+            entry = await self._run(client._find, id, hash, path)
+            file_path = Path(entry["file_path"])
+            if (
+                self._ipc is not None
+                and not is_entry_encrypted(entry)
+                and not is_entry_compressed(entry)
+            ):
+                if not file_path.exists():
+                    await self._run(client._check, entry)  # raises EntryNotFoundError
+                resp = await self._ipc.call(
+                    {
+                        "cmd": "hash",
+                        "path": str(file_path.resolve()),
+                        "algorithm": entry.get("hash_algo") or client.hash_algo,
+                    }
+                )
+                actual = resp.get("result") or ""
+                result = VerifyResult(
+                    entry["id"],
+                    file_path,
+                    entry["hash"],
+                    actual,
+                    actual == entry["hash"],
+                    resp.get("error"),
+                )
+            else:
+                result = await self._run(client._check, entry)
+            await self._run(client._record, result)
+        return result
+
+    async def list(
+        self, limit: int = 20, timeout: Optional[float] = None
+    ) -> List[Entry]:
+        async with self._slot(timeout):
+            return await self._run(self._client.list, limit)
+
+    async def search(
+        self, text: str, limit: int = 100, timeout: Optional[float] = None
+    ) -> List[Entry]:
+        async with self._slot(timeout):
+            return await self._run(self._client.search, text, limit)
+
+    async def get(
+        self,
+        entry_id: int,
+        start: int = 0,
+        end: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> bytes:
+        async with self._slot(timeout):
+            return await self._run(self._client.get, entry_id, start, end)
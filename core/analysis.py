@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Background content analysis (``analysis`` config, ``modules.ai``).
+
+Flow::
+
+    add  --(same transaction)-->  analysis_queue (hash)
+         Enricher: claim batch -> analyze_batch over a persistent module
+         process -> analysis (hash -> result JSON)
+
+Ingest only inserts a queue row; analysis happens later in the background
+(``glyph watch``, a long-lived ``Client``) or in ``glyph analyze``. Queue
+and cache are both keyed by content hash, so re-adding, duplicating or
+moving identical content never analyzes it twice.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_MAX_BYTES = 64 * 1024
+
+
+@dataclass
+class AnalysisReport:
+    analyzed: int = 0
+    failed: int = 0
+    batches: int = 0
+
+    def merge(self, other: "AnalysisReport") -> None:
+        self.analyzed += other.analyzed
+        self.failed += other.failed
+        self.batches += other.batches
+
+
+class Enricher:
+    """Drains ``analysis_queue`` through an analysis module.
+
+    Args:
+        store (MetadataStore): Catalog holding the queue and the cache.
+        ipc (PersistentModuleIPC): Analysis service (``analyze_batch``).
+        load_item (callable): Maps a content hash to a request item
+            (``{"text": ...}`` or ``{"path": ..., "max_bytes": ...}``);
+            raises if the content cannot be read.
+        batch_size (int): Hashes per ``analyze_batch`` request.
+        concurrency (int): Batches in flight at once.
+        lease (float): Seconds before a claimed batch may be re-claimed.
+        max_attempts (int): Failures after which a hash is given up.
+        retry_delay (float): Seconds before a failed hash is retried.
+        timeout (float): Per-batch response timeout.
+        poll_interval (float): Idle re-check period of the background
+            workers (picks up rows queued by other processes).
+        logger (logging.Logger, optional): Logger instance.
+    """
+
+    def __init__(
+        self,
+        store,
+        ipc,
+        load_item: Callable[[str], Dict[str, Any]],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        concurrency: int = 2,
+        lease: float = 300,
+        max_attempts: int = 3,
+        retry_delay: float = 60,
+        timeout: float = 120,
+        poll_interval: float = 5.0,
+        logger=None,
+    ):
+        self.store = store
+        self.ipc = ipc
+        self.load_item = load_item
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.logger = logger
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._totals = AnalysisReport()
+        self._totals_lock = threading.Lock()
+
+    def run_once(self) -> Optional[AnalysisReport]:
+        """Analyzes one claimed batch; None if the queue had nothing to claim."""
+        hashes = self.store.claim_analysis(
+            self.batch_size, lease=self.lease, max_attempts=self.max_attempts
+        )
+        if not hashes:
+            return None
+        report = AnalysisReport(batches=1)
+        items, failures = [], []
+        for file_hash in hashes:
+            try:
+                items.append({"key": file_hash, **self.load_item(file_hash)})
+            except Exception as exc:  # noqa: BLE001
+                failures.append((file_hash, f"{exc.__class__.__name__}: {exc}"))
+
+        results = []
+        if items:
+            try:
+                response = self.ipc.call(
+                    {"cmd": "analyze_batch", "items": items}, timeout=self.timeout
+                )
+                if "error" in response:
+                    raise RuntimeError(response["error"])
+            except Exception as exc:  # noqa: BLE001
+                failures.extend((item["key"], str(exc)) for item in items)
+            else:
+                analyzer = response.get("analyzer", "unknown")
+                answered = set()
+                for row in response.get("results", []):
+                    answered.add(row.get("key"))
+                    if "result" in row:
+                        results.append((row["key"], row["result"], analyzer))
+                    else:
+                        failures.append((row.get("key"), row.get("error", "no result")))
+                failures.extend(
+                    (item["key"], "missing from response")
+                    for item in items
+                    if item["key"] not in answered
+                )
+
+        if results:
+            self.store.put_analysis(results)
+        if failures:
+            self.store.fail_analysis(failures, self.retry_delay)
+            if self.logger:
+                for file_hash, error in failures:
+                    self.logger.warning(f"Analysis failed for {file_hash}: {error}")
+        report.analyzed, report.failed = len(results), len(failures)
+        with self._totals_lock:
+            self._totals.merge(report)
+        return report
+
+    def _drain_loop(self, report: AnalysisReport, stop: threading.Event) -> None:
+        while not stop.is_set():
+            batch = self.run_once()
+            if batch is None:
+                return
+            report.merge(batch)
+
+    def drain(self, stop: Optional[threading.Event] = None) -> AnalysisReport:
+        """Works the queue with ``concurrency`` batches in flight until empty."""
+        stop = stop or threading.Event()
+        reports = [AnalysisReport() for _ in range(self.concurrency)]
+        threads = [
+            threading.Thread(target=self._drain_loop, args=(r, stop))
+            for r in reports[1:]
+        ]
+        for t in threads:
+            t.start()
+        self._drain_loop(reports[0], stop)
+        for t in threads:
+            t.join()
+        total = AnalysisReport()
+        for r in reports:
+            total.merge(r)
+        return total
+
+    # -------------------------
+    # Background mode
+    # -------------------------
+    def _background(self) -> None:
+        while not self._stop.is_set():
+            try:
+                batch = self.run_once()
+            except Exception as exc:  # noqa: BLE001
+                if self.logger:
+                    self.logger.error(f"Enrichment worker: {exc}")
+                batch = None
+            if batch is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self) -> None:
+        """Starts background workers (idempotent)."""
+        if self._threads:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._background, name=f"enricher-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def notify(self) -> None:
+        """Wakes idle workers (new rows were queued)."""
+        self._wake.set()
+
+    @property
+    def totals(self) -> AnalysisReport:
+        with self._totals_lock:
+            return AnalysisReport(**vars(self._totals))
+
+    def stop(self, timeout: float = 30) -> None:
+        """Stops the workers after their current batch and closes the module."""
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        self.ipc.close()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Catalog snapshots in a columnar binary format (``.glycat``).
+
+``export_catalog`` streams the catalog in row groups; ``import_catalog``
+bulk-loads a snapshot into an empty catalog (single or sharded) with
+secondary indexes rebuilt once at the end. The layout is documented in
+``docs/source/catalog_format.rst``.
+
+Entries, their wrapped data keys and ``store_meta`` (the KDF salt among
+others) are exported; replication state is not (``glyph sync`` re-derives
+it from the remote manifest).
+"""
+
+import array
+import json
+import struct
+import sys
+import zlib
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"GLYCAT1\n"
+FORMAT_VERSION = 2
+# формат 1 — без колонки hash_algo (все записи sha256)
+_READABLE_FORMATS = (1, 2)
+DEFAULT_GROUP_SIZE = 65536
+
+COLUMNS = (
+    "id",
+    "hash",
+    "file_path",
+    "added",
+    "last_checked",
+    "verified",
+    "author",
+    "tags",
+    "metadata",
+    "key_id",
+    "wrapped_key",
+    "hash_algo",
+)
+
+_GROUP = b"G"
+_END = b"E"
+_U32 = struct.Struct("<I")
+_GROUP_HEADER = struct.Struct("<II")  # строк в группе, crc32 блоков
+_NULL = -1
+# Заглушка в JSON остальных полей: сохраняет позицию ключа author/tags
+_PLACEHOLDER = 0
+
+
+def _le(arr: array.array) -> bytes:
+    if sys.byteorder != "little":
+        arr = array.array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_le(typecode: str, data: bytes) -> array.array:
+    arr = array.array(typecode)
+    arr.frombytes(data)
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+# -------------------------------------------------
+# Column encoders
+# -------------------------------------------------
+def _encode_strings(values: List[Optional[bytes]]) -> bytes:
+    lengths = array.array("i", (_NULL if v is None else len(v) for v in values))
+    return _le(lengths) + b"".join(v for v in values if v is not None)
+
+
+def _decode_strings(data: bytes, n: int) -> List[Optional[bytes]]:
+    lengths = _from_le("i", data[: 4 * n])
+    out: List[Optional[bytes]] = []
+    pos = 4 * n
+    for length in lengths:
+        if length == _NULL:
+            out.append(None)
+        else:
+            out.append(data[pos : pos + length])
+            pos += length
+    return out
+
+
+def _encode_dict(values: List[Optional[str]]) -> bytes:
+    index: Dict[str, int] = {}
+    codes = array.array("i")
+    for v in values:
+        codes.append(_NULL if v is None else index.setdefault(v, len(index)))
+    words = [w.encode() for w in index]
+    return _U32.pack(len(words)) + _encode_strings(words) + _le(codes)
+
+
+def _decode_dict(data: bytes, n: int) -> List[Optional[str]]:
+    (size,) = _U32.unpack_from(data)
+    words = [w.decode() for w in _decode_strings(data[4:], size)]
+    pos = 4 + 4 * size + sum(len(w.encode()) for w in words)
+    return [None if c == _NULL else words[c] for c in _from_le("i", data[pos:])]
+
+
+def _encode_tags(values: List[Optional[List[str]]]) -> bytes:
+    index: Dict[str, int] = {}
+    counts = array.array("i")
+    codes = array.array("I")
+    for tags in values:
+        if tags is None:
+            counts.append(_NULL)
+            continue
+        counts.append(len(tags))
+        codes.extend(index.setdefault(t, len(index)) for t in tags)
+    words = [w.encode() for w in index]
+    return (
+        _U32.pack(len(words))
+        + _encode_strings(words)
+        + _le(counts)
+        + _U32.pack(len(codes))
+        + _le(codes)
+    )
+
+
+def _decode_tags(data: bytes, n: int) -> List[Optional[List[str]]]:
+    (size,) = _U32.unpack_from(data)
+    words = [w.decode() for w in _decode_strings(data[4:], size)]
+    pos = 4 + 4 * size + sum(len(w.encode()) for w in words)
+    counts = _from_le("i", data[pos : pos + 4 * n])
+    pos += 4 * n
+    (total,) = _U32.unpack_from(data, pos)
+    codes = _from_le("I", data[pos + 4 : pos + 4 + 4 * total])
+    out: List[Optional[List[str]]] = []
+    i = 0
+    for count in counts:
+        if count == _NULL:
+            out.append(None)
+        else:
+            out.append([words[c] for c in codes[i : i + count]])
+            i += count
+    return out
+
+
+def _text(values) -> List[Optional[bytes]]:
+    return [None if v is None else v.encode() for v in values]
+
+
+def _untext(values) -> List[Optional[str]]:
+    return [None if v is None else v.decode() for v in values]
+
+
+def _encode_group(rows: List[Dict[str, Any]], keys: Dict[int, Tuple[str, bytes]]):
+    ids = array.array("q")
+    prev = 0
+    authors, tags, rest = [], [], []
+    for row in rows:
+        ids.append(row["id"] - prev)
+        prev = row["id"]
+        meta = dict(row["metadata"])
+        authors.append(meta["author"] if "author" in meta else None)
+        tags.append(list(meta["tags"]) if "tags" in meta else None)
+        for k in ("author", "tags"):
+            if k in meta:
+                meta[k] = _PLACEHOLDER
+        rest.append(json.dumps(meta, ensure_ascii=False).encode())
+    blocks = [
+        _le(ids),
+        _encode_strings(_text(r["hash"] for r in rows)),
+        _encode_strings(_text(r["file_path"] for r in rows)),
+        _encode_strings(_text(r["added"] for r in rows)),
+        _encode_strings(_text(r["last_checked"] for r in rows)),
+        bytes(1 if r["verified"] else 0 for r in rows),
+        _encode_dict(authors),
+        _encode_tags(tags),
+        _encode_strings(rest),
+        _encode_dict([keys[r["id"]][0] if r["id"] in keys else None for r in rows]),
+        _encode_strings([keys[r["id"]][1] if r["id"] in keys else None for r in rows]),
+        _encode_dict([r["hash_algo"] for r in rows]),
+    ]
+    return [zlib.compress(b, 6) for b in blocks]
+
+
+def _decode_group(blocks: List[bytes], n: int) -> Iterator[Dict[str, Any]]:
+    raw = [zlib.decompress(b) for b in blocks]
+    deltas = _from_le("q", raw[0])
+    hashes = _untext(_decode_strings(raw[1], n))
+    paths = _untext(_decode_strings(raw[2], n))
+    added = _untext(_decode_strings(raw[3], n))
+    checked = _untext(_decode_strings(raw[4], n))
+    verified = raw[5]
+    authors = _decode_dict(raw[6], n)
+    tags = _decode_tags(raw[7], n)
+    rest = _decode_strings(raw[8], n)
+    key_ids = _decode_dict(raw[9], n)
+    wrapped = _decode_strings(raw[10], n)
+    algos = _decode_dict(raw[11], n) if len(raw) > 11 else ["sha256"] * n
+    entry_id = 0
+    for i in range(n):
+        entry_id += deltas[i]
+        meta = json.loads(rest[i])
+        if "author" in meta:
+            meta["author"] = authors[i]
+        if "tags" in meta:
+            meta["tags"] = tags[i]
+        yield {
+            "id": entry_id,
+            "hash": hashes[i],
+            "file_path": paths[i],
+            "added": added[i],
+            "last_checked": checked[i],
+            "verified": verified[i],
+            "metadata": meta,
+            "data_key": (key_ids[i], wrapped[i]) if key_ids[i] is not None else None,
+            "hash_algo": algos[i],
+        }
+
+
+# -------------------------------------------------
+# Export
+# -------------------------------------------------
+def export_catalog(
+    store, out: BinaryIO, group_size: int = DEFAULT_GROUP_SIZE, logger=None
+) -> int:
+    """Writes a snapshot of ``store`` to ``out``; returns the number of entries."""
+    header = {
+        "format": FORMAT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "columns": list(COLUMNS),
+        "group_size": group_size,
+        "meta": {
+            k: v
+            for k, v in store.list_meta().items()
+            if k not in ("shard_index", "shard_count", "id_floor")
+        },
+    }
+    blob = json.dumps(header, ensure_ascii=False).encode()
+    out.write(MAGIC + _U32.pack(len(blob)) + blob)
+
+    total = 0
+    rows = store.iter_entries(order="asc", batch_size=group_size)
+    while True:
+        group = [row for _, row in zip(range(group_size), rows)]
+        if not group:
+            break
+        keys = store.get_data_keys(r["id"] for r in group)
+        blocks = _encode_group(group, keys)
+        crc = 0
+        for b in blocks:
+            crc = zlib.crc32(b, crc)
+        out.write(_GROUP + _GROUP_HEADER.pack(len(group), crc))
+        for b in blocks:
+            out.write(_U32.pack(len(b)) + b)
+        total += len(group)
+        if logger:
+            logger.debug(f"Exported {total} entries")
+    out.write(_END + struct.pack("<Q", total))
+    return total
+
+
+# -------------------------------------------------
+# Import
+# -------------------------------------------------
+def _read_exact(src: BinaryIO, n: int) -> bytes:
+    data = src.read(n)
+    if len(data) != n:
+        raise ValueError("Truncated catalog snapshot")
+    return data
+
+
+def read_catalog(src: BinaryIO) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """Parses a snapshot: returns (header, iterator of entry dicts).
+
+    Entry dicts carry ``data_key`` = (key_id, wrapped) or None. Raises
+    ``ValueError`` for a foreign, corrupt or truncated file.
+    """
+    if src.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a Glyph catalog snapshot")
+    (size,) = _U32.unpack(_read_exact(src, 4))
+    header = json.loads(_read_exact(src, size))
+    if header.get("format") not in _READABLE_FORMATS:
+        raise ValueError(f"Unsupported snapshot format: {header.get('format')}")
+
+    def entries() -> Iterator[Dict[str, Any]]:
+        seen = 0
+        while True:
+            kind = _read_exact(src, 1)
+            if kind == _END:
+                (total,) = struct.unpack("<Q", _read_exact(src, 8))
+                if total != seen:
+                    raise ValueError(f"Snapshot declares {total} rows, read {seen}")
+                return
+            if kind != _GROUP:
+                raise ValueError("Corrupt catalog snapshot")
+            n, crc = _GROUP_HEADER.unpack(_read_exact(src, _GROUP_HEADER.size))
+            blocks = []
+            check = 0
+            for _ in header["columns"]:
+                (length,) = _U32.unpack(_read_exact(src, 4))
+                block = _read_exact(src, length)
+                check = zlib.crc32(block, check)
+                blocks.append(block)
+            if check != crc:
+                raise ValueError("Catalog snapshot checksum mismatch")
+            yield from _decode_group(blocks, n)
+            seen += n
+
+    return header, entries()
+
+
+def import_catalog(store, src: BinaryIO, batch_size: int = 10000, logger=None) -> int:
+    """Bulk-loads a snapshot into an empty ``store``; returns rows loaded."""
+    if store.count():
+        raise ValueError("Catalog import needs an empty catalog")
+    header, entries = read_catalog(src)
+
+    shards = list(getattr(store, "shards", [store]))
+    if len(shards) > 1:
+        from core.sharding import shard_for_hash
+
+        def route(file_hash: str) -> int:
+            return shard_for_hash(file_hash, len(shards))
+
+    else:
+
+        def route(file_hash: str) -> int:
+            return 0
+
+    insert_book = (
+        "INSERT INTO books (id, file_path, hash, metadata, added, verified, "
+        "last_checked, hash_algo) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    insert_key = "INSERT INTO data_keys (entry_id, key_id, wrapped) VALUES (?, ?, ?)"
+    total = 0
+    max_id = 0
+    with ExitStack() as stack:
+        conns = [stack.enter_context(shard.bulk_load()) for shard in shards]
+        books: List[List[tuple]] = [[] for _ in shards]
+        keys: List[List[tuple]] = [[] for _ in shards]
+
+        def flush() -> None:
+            for conn, b, k in zip(conns, books, keys):
+                conn.executemany(insert_book, b)
+                conn.executemany(insert_key, k)
+                b.clear()
+                k.clear()
+
+        for entry in entries:
+            i = route(entry["hash"])
+            books[i].append(
+                (
+                    entry["id"],
+                    entry["file_path"],
+                    entry["hash"],
+                    json.dumps(entry["metadata"], ensure_ascii=False),
+                    entry["added"],
+                    entry["verified"],
+                    entry["last_checked"],
+                    entry["hash_algo"],
+                )
+            )
+            if entry["data_key"]:
+                keys[i].append((entry["id"], *entry["data_key"]))
+            total += 1
+            max_id = max(max_id, entry["id"])
+            if total % batch_size == 0:
+                flush()
+                if logger:
+                    logger.debug(f"Imported {total} entries")
+        flush()
+
+        # id_floor: новые id после импорта не пересекутся с импортированными
+        meta = list(header.get("meta", {}).items())
+        for index, conn in enumerate(conns):
+            rows = [("id_floor", str(max_id))] + (meta if index == 0 else [])
+            conn.executemany(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", rows
+            )
+    return total
@@ -0,0 +1,1173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""In-process API for Glyph.
+
+``Client`` is built from an explicit config dict, owns the long-lived
+resources (metadata store, audit log, remote, crypto module IPC, key
+manager), returns typed results and raises ``core.exceptions`` errors
+instead of exiting. The CLI in ``core.orchestrator`` is a thin wrapper.
+
+Example::
+
+    with Client.from_file("config/settings.json") as glyph:
+        added = glyph.add("~/papers/paper.pdf", author="Doe")
+        assert glyph.verify(id=added.entry_id).ok
+"""
+
+import json
+import logging
+import os
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from core.exceptions import (
+    ConfigError,
+    EncryptionKeyError,
+    EntryNotFoundError,
+    GlyphError,
+    IngestError,
+)
+from core.metadata_store import MetadataStore
+from core.treehash import check_algorithm
+
+# Подсистемы (шифрование, конвейер, remote, IPC) импортируются и создаются
+# лениво: `glyph list` не должен платить за cryptography, asyncio и т. п.
+if TYPE_CHECKING:
+    import threading
+
+    from core.ai_bridge import AIClient
+    from core.analysis import AnalysisReport, Enricher
+    from core.compression import Dictionaries
+    from core.dedup import DedupIndex
+    from core.fsck import FsckIssue, FsckReport
+    from core.ingest import IngestContext, IngestItem
+    from core.ipc import ModuleIPC
+    from core.keys import KeyManager
+    from core.logger import AuditLogger
+    from core.neardup import MinHasher
+    from core.pipeline import StageStats
+    from core.remote import RemoteStorage
+    from core.similarity import SimilarityIndex
+    from core.watch import WatchBatch
+    from core.sync import SyncReport
+
+PathLike = Union[str, Path]
+
+
+@dataclass
+class Entry:
+    id: int
+    file_path: str
+    hash: str
+    metadata: Dict[str, Any]
+    added: str
+    verified: bool
+    last_checked: Optional[str] = None
+    hash_algo: str = "sha256"
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "Entry":
+        names = {f.name for f in fields(cls)}
+        entry = cls(**{k: v for k, v in row.items() if k in names})
+        entry.verified = bool(entry.verified)
+        return entry
+
+    @property
+    def title(self) -> str:
+        return self.metadata.get("title", "")
+
+
+@dataclass
+class AddResult:
+    entry_id: int
+    source: Path
+    file_path: Path
+    hash: str
+
+
+@dataclass
+class AddManyResult:
+    added: List[AddResult] = field(default_factory=list)
+    errors: List[Tuple[Path, str, Exception]] = field(default_factory=list)
+    stats: Dict[str, "StageStats"] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+@dataclass
+class NearDuplicateCluster:
+    entries: List[Entry]
+    similarity: float  # наименьшее сходство среди связанных пар
+
+
+@dataclass
+class VerifyResult:
+    entry_id: int
+    file_path: Path
+    expected: str
+    actual: str
+    ok: bool
+    error: Optional[str] = None
+
+
+class Client:
+    """Embeddable Glyph client.
+
+    Args:
+        config (dict): Settings (same layout as ``config/settings.json``).
+        logger (logging.Logger, optional): Defaults to ``logging.getLogger("glyph")``
+            without installing handlers.
+        base_dir (Path, optional): Base for relative module paths
+            (default: current directory).
+        master_key (str, optional): Master key or passphrase; defaults to the
+            env var named by ``security.encryption.key_env_var``.
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        logger: Optional[logging.Logger] = None,
+        base_dir: Optional[PathLike] = None,
+        master_key: Optional[str] = None,
+    ):
+        try:
+            self.hash_algo = config["security"]["hash_algo"]
+            self.enc_cfg = config["security"]["encryption"]
+            db_path = config["metadata"]["database"]
+            self.archive_dir = Path(config["storage"]["archive_dir"])
+        except KeyError as exc:
+            raise ConfigError(f"Missing config key: {exc}") from exc
+        try:
+            check_algorithm(self.hash_algo)
+        except ValueError as exc:
+            raise ConfigError(str(exc)) from exc
+
+        self.config = config
+        self.logger = logger or logging.getLogger("glyph")
+        self.base_dir = Path(base_dir) if base_dir else Path.cwd()
+        self._db_path = db_path
+        self._master_key = master_key
+        self._keys: Optional[KeyManager] = None
+        self._store: Optional[MetadataStore] = None
+        self._audit: Optional[AuditLogger] = None
+        self._remote: Optional[RemoteStorage] = None
+        self._crypto_ipc: Optional[ModuleIPC] = None
+        self._crypto_resolved = False
+        self._dedup: Optional[DedupIndex] = None
+        self._dictionaries: Optional[Dictionaries] = None
+        self._enricher: Optional[Enricher] = None
+        self._ai: Optional[AIClient] = None
+        self._similarity: Optional[SimilarityIndex] = None
+        self._minhasher: Optional[MinHasher] = None
+        self._embedder: Any = None
+
+    @classmethod
+    def from_file(cls, path: PathLike, **kwargs) -> "Client":
+        """Builds a client from a JSON settings file."""
+        path = Path(path).expanduser()
+        if not path.exists():
+            raise ConfigError(f"Config not found: {path}")
+        with path.open("r", encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def close(self) -> None:
+        """Stops background analysis, saves the dedup snapshot, drops key material."""
+        if self._enricher is not None:
+            self._enricher.stop()
+            self._enricher = None
+        if self._ai is not None:
+            self._ai.close()
+            self._ai = None
+        if self._dedup is not None:
+            self._dedup.save_snapshot()
+        self._keys = None
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    # -------------------------
+    # Subsystems (created on first use)
+    # -------------------------
+    @property
+    def store(self) -> MetadataStore:
+        """Catalog (``ShardedMetadataStore`` when ``metadata.shards`` > 1)."""
+        if self._store is None:
+            shards = self.config["metadata"].get("shards", 1)
+            promoted = self.config["metadata"].get("promoted_keys")
+            if shards > 1:
+                from core.sharding import ShardedMetadataStore
+
+                try:
+                    self._store = ShardedMetadataStore(
+                        self._db_path, shards, self.logger, promoted
+                    )
+                except ValueError as exc:
+                    raise ConfigError(str(exc)) from exc
+            else:
+                self._store = MetadataStore(
+                    db_path=self._db_path, logger=self.logger, promoted_keys=promoted
+                )
+        return self._store
+
+    @property
+    def audit(self) -> "AuditLogger":
+        if self._audit is None:
+            from core.logger import AuditLogger
+
+            audit_file = self.config.get("logging", {}).get(
+                "audit_file", "logs/audit.jsonl"
+            )
+            self._audit = AuditLogger(Path(audit_file))
+        return self._audit
+
+    @property
+    def remote(self) -> "RemoteStorage":
+        if self._remote is None:
+            from core.remote import RemoteStorage
+
+            self._remote = RemoteStorage(self.config["storage"], logger=self.logger)
+        return self._remote
+
+    @property
+    def crypto_ipc(self) -> Optional["ModuleIPC"]:
+        """External crypto module, or None when ``modules.crypto`` is disabled."""
+        if not self._crypto_resolved:
+            crypto_cfg = self.config.get("modules", {}).get("crypto", {})
+            if crypto_cfg.get("enabled"):
+                from core.ipc import ModuleIPC
+
+                try:
+                    self._crypto_ipc = ModuleIPC(
+                        self.base_dir / crypto_cfg["path"], logger=self.logger
+                    )
+                except FileNotFoundError as exc:
+                    raise ConfigError(f"Crypto module init failed: {exc}") from exc
+            self._crypto_resolved = True
+        return self._crypto_ipc
+
+    @property
+    def dedup(self) -> Optional["DedupIndex"]:
+        """Bloom filter + LRU cache over the catalog, or None if ``dedup`` is off."""
+        cfg = self.config.get("dedup", {})
+        if self._dedup is None and cfg.get("enabled"):
+            from core.dedup import DedupIndex, ShardedDedupIndex
+
+            snapshot = cfg.get("snapshot")
+            index_cls = ShardedDedupIndex if self.store.writers > 1 else DedupIndex
+            self._dedup = index_cls(
+                self.store,
+                capacity=cfg.get("capacity", 1_000_000),
+                error_rate=cfg.get("error_rate", 0.001),
+                cache_size=cfg.get("cache_size", 10000),
+                snapshot_path=Path(snapshot) if snapshot else None,
+                logger=self.logger,
+            )
+        return self._dedup
+
+    # -------------------------
+    # Keys
+    # -------------------------
+    @property
+    def dictionaries(self) -> "Dictionaries":
+        """zstd dictionaries stored in the catalog (see ``core.compression``)."""
+        if self._dictionaries is None:
+            from core.compression import Dictionaries
+
+            self._dictionaries = Dictionaries(self.store)
+        return self._dictionaries
+
+    @property
+    def keys(self) -> "KeyManager":
+        if self._keys is None:
+            from core.keys import KeyManager
+
+            secret = self._master_key or os.environ.get(self.enc_cfg["key_env_var"])
+            if not secret:
+                raise EncryptionKeyError(
+                    f"Encryption key env var not set: {self.enc_cfg['key_env_var']}"
+                )
+            self._keys = KeyManager(self.store, secret, logger=self.logger)
+        return self._keys
+
+    def _data_key(self, entry: Dict[str, Any]) -> Optional[bytes]:
+        from core.reader import is_entry_encrypted
+
+        if not is_entry_encrypted(entry):
+            return None
+        try:
+            return self.keys.data_key_for(entry)
+        except ValueError as exc:
+            raise EncryptionKeyError(str(exc)) from exc
+
+    # -------------------------
+    # Add
+    # -------------------------
+    def _ingest_context(self) -> "IngestContext":
+        from core.ingest import IngestContext
+
+        return IngestContext(
+            self.config,
+            self.store,
+            self.audit,
+            self.remote,
+            logger=self.logger,
+            crypto_ipc=self.crypto_ipc,
+            keys=self.keys if self.enc_cfg["enabled"] else None,
+            dedup=self.dedup,
+            dictionaries=self._compression_dictionaries(),
+            minhasher=(
+                self.minhasher
+                if self.config.get("near_dup", {}).get("enabled", False)
+                else None
+            ),
+        )
+
+    def _compression_dictionaries(self) -> Optional["Dictionaries"]:
+        if not self.config.get("compression", {}).get("enabled", False):
+            return None
+        from core.compression import require_zstandard
+
+        try:
+            require_zstandard()
+        except RuntimeError as exc:
+            raise ConfigError(str(exc)) from exc
+        return self.dictionaries
+
+    def add_many(
+        self,
+        items: Iterable[Union[PathLike, "IngestItem"]],
+        workers: Optional[int] = None,
+        on_added=None,
+    ) -> AddManyResult:
+        """Ingests many files through the staged pipeline.
+
+        Per-file failures are collected in ``AddManyResult.errors``
+        as (source, stage, exception) instead of being raised.
+        """
+        from core.ingest import IngestItem, ingest_files
+
+        items = (
+            (
+                i
+                if isinstance(i, IngestItem)
+                else IngestItem(Path(i).expanduser().resolve())
+            )
+            for i in items
+        )
+        result = AddManyResult()
+
+        def collect(item: IngestItem) -> None:
+            added = AddResult(
+                item.entry_id, item.source, item.archive_path, item.file_hash
+            )
+            result.added.append(added)
+            if on_added:
+                on_added(added)
+
+        run = ingest_files(
+            self._ingest_context(), items, workers=workers, on_result=collect
+        )
+        result.errors = [(item.source, stage, exc) for stage, item, exc in run.errors]
+        result.stats = run.stats
+        if self._enricher is not None and result.added:
+            self._enricher.notify()
+        return result
+
+    def add(
+        self,
+        path: PathLike,
+        title: Optional[str] = None,
+        author: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        verify: bool = True,
+    ) -> AddResult:
+        """Adds one file; raises ``DuplicateEntryError`` / ``IngestError``."""
+        from core.ingest import IngestItem
+
+        item = IngestItem(
+            Path(path).expanduser().resolve(),
+            title=title,
+            author=author,
+            tags=list(tags or []),
+            verify=verify,
+        )
+        result = self.add_many([item], workers=1)
+        if result.errors:
+            _, _, exc = result.errors[0]
+            if isinstance(exc, (GlyphError, FileNotFoundError)):
+                raise exc
+            raise IngestError(f"Add failed for {item.source}: {exc}") from exc
+        return result.added[0]
+
+    # -------------------------
+    # Verify
+    # -------------------------
+    def _find(
+        self,
+        id: Optional[int] = None,
+        hash: Optional[str] = None,
+        path: Optional[PathLike] = None,
+    ) -> Dict[str, Any]:
+        lookup = self.dedup or self.store
+        if id is not None:
+            entry = lookup.get_entry_by_id(id)
+        elif hash is not None:
+            entry = lookup.get_entry_by_hash(hash)
+        elif path is not None:
+            entry = self.store.get_entry_by_path(str(Path(path).expanduser().resolve()))
+        else:
+            raise ValueError("One of id, hash or path is required")
+        if not entry:
+            raise EntryNotFoundError("Entry not found")
+        return entry
+
+    def _check(self, entry: Dict[str, Any]) -> VerifyResult:
+        """Hashes the archived content of ``entry`` (no DB writes)."""
+        from core.ingest import hash_file
+        from core.reader import is_entry_compressed, is_entry_encrypted
+
+        file_path = Path(entry["file_path"])
+        if not file_path.exists():
+            raise EntryNotFoundError(f"Archived file not found: {file_path}")
+        # запись проверяется тем алгоритмом, которым её хеш был посчитан
+        algorithm = entry.get("hash_algo") or self.hash_algo
+        error = None
+        if is_entry_encrypted(entry) or is_entry_compressed(entry):
+            from core.file_handler import hash_stream
+            from core.reader import iter_content, open_entry
+
+            key = self._data_key(entry)
+            try:
+                with open_entry(entry, key, self._dictionaries_for(entry)) as f:
+                    actual = hash_stream(iter_content(f), algorithm)
+            except Exception as exc:  # noqa: BLE001
+                # ошибка аутентификации сегмента или кадра zstd == нарушение целостности
+                reason = "Decryption" if key is not None else "Decompression"
+                actual, error = "", f"{reason} failed: {exc.__class__.__name__} {exc}"
+        else:
+            actual = hash_file(file_path, algorithm, self.crypto_ipc, self.logger)
+        return VerifyResult(
+            entry["id"],
+            file_path,
+            entry["hash"],
+            actual,
+            actual == entry["hash"],
+            error,
+        )
+
+    def _record(self, result: VerifyResult) -> None:
+        self.store.update_verification(str(result.file_path), result.ok)
+        if self._dedup is not None:
+            self._dedup.invalidate(result.entry_id)
+        self.audit.log(
+            "verify",
+            {
+                "file": str(result.file_path),
+                "expected": result.expected,
+                "actual": result.actual,
+                "ok": result.ok,
+            },
+        )
+
+    def verify(
+        self,
+        id: Optional[int] = None,
+        hash: Optional[str] = None,
+        path: Optional[PathLike] = None,
+    ) -> VerifyResult:
+        """Re-hashes one entry and records the outcome.
+
+        Returns a result with ``ok=False`` on mismatch; raises
+        ``EntryNotFoundError`` if the entry or its file is missing.
+        """
+        result = self._check(self._find(id=id, hash=hash, path=path))
+        self._record(result)
+        return result
+
+    def verify_many(self, ids: Iterable[int], workers: int = 4) -> List[VerifyResult]:
+        """Verifies entries in parallel; missing entries yield ``ok=False``."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        def check(entry_id: int) -> VerifyResult:
+            try:
+                return self._check(self._find(id=entry_id))
+            except GlyphError as exc:
+                return VerifyResult(entry_id, Path(""), "", "", False, str(exc))
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = list(pool.map(check, ids))
+        for result in results:
+            if result.expected:
+                self._record(result)
+        return results
+
+    # -------------------------
+    # Read
+    # -------------------------
+    def list(self, limit: int = 20) -> List[Entry]:
+        return [Entry.from_row(e) for e in self.store.list_entries(limit=limit)]
+
+    def iter_entries(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        after: Optional[str] = None,
+        order: str = "desc",
+        limit: Optional[int] = None,
+        decode_metadata: bool = True,
+        with_cursor: bool = False,
+    ) -> Iterator[Any]:
+        """Streams catalog rows as dicts (see ``MetadataStore.iter_entries``).
+
+        Raises ``ValueError`` for an unknown field, order or malformed cursor.
+        """
+        return self.store.iter_entries(
+            fields=fields,
+            after=after,
+            order=order,
+            limit=limit,
+            decode_metadata=decode_metadata,
+            with_cursor=with_cursor,
+        )
+
+    def query(self, limit: Optional[int] = None, **filters: Any) -> List[Entry]:
+        """Entries matching metadata filters, newest first.
+
+        Example: ``glyph.query(author="Doe", size_gt=10_000_000, tag="physics")``
+        (see ``MetadataStore.query`` for the filter syntax).
+        """
+        return [Entry.from_row(e) for e in self.store.query(limit=limit, **filters)]
+
+    def count(self, **filters: Any) -> int:
+        return self.store.count(**filters)
+
+    def search(self, text: str, limit: int = 100) -> List[Entry]:
+        return [Entry.from_row(e) for e in self.store.search(text, limit=limit)]
+
+    def entry(self, entry_id: int) -> Entry:
+        return Entry.from_row(self._find(id=entry_id))
+
+    def open(self, entry_id: int) -> BinaryIO:
+        """Opens the decrypted content of an entry as a seekable stream."""
+        from core.reader import open_entry
+
+        entry = self._find(id=entry_id)
+        try:
+            return open_entry(
+                entry, self._data_key(entry), self._dictionaries_for(entry)
+            )
+        except FileNotFoundError as exc:
+            raise EntryNotFoundError(str(exc)) from exc
+
+    def _dictionaries_for(self, entry: Dict[str, Any]) -> Optional["Dictionaries"]:
+        from core.reader import is_entry_compressed
+
+        return self.dictionaries if is_entry_compressed(entry) else None
+
+    def get(self, entry_id: int, start: int = 0, end: Optional[int] = None) -> bytes:
+        """Returns ``content[start:end]`` of an entry."""
+        from core.reader import read_range
+
+        with self.open(entry_id) as f:
+            return read_range(f, start, end)
+
+    def export(
+        self,
+        entry_id: int,
+        dst: BinaryIO,
+        start: int = 0,
+        end: Optional[int] = None,
+    ) -> int:
+        """Streams ``content[start:end]`` into ``dst``; returns bytes written."""
+        from core.reader import copy_range
+
+        with self.open(entry_id) as f:
+            return copy_range(f, dst, start, end)
+
+    # -------------------------
+    # Maintenance
+    # -------------------------
+    def sync(self, workers: int = 8, dry_run: bool = False) -> "SyncReport":
+        from core.sync import sync_remote
+
+        if not self.remote.is_available():
+            raise ConfigError("Remote storage is not configured (storage.remote)")
+        report = sync_remote(
+            self.store,
+            self.remote,
+            workers=workers,
+            dry_run=dry_run,
+            logger=self.logger,
+        )
+        if not dry_run:
+            self.audit.log(
+                "sync",
+                {
+                    "remote": report.remote,
+                    "uploaded": report.uploaded,
+                    "failed": report.failed,
+                    "bytes": report.bytes_sent,
+                },
+            )
+        return report
+
+    def fsck(
+        self,
+        action: Optional[str] = None,
+        grace: float = 3600,
+        workers: int = 8,
+        on_issue: Optional[Callable[["FsckIssue"], None]] = None,
+    ) -> "FsckReport":
+        """Reconciles the archive directory with the catalog (see ``core.fsck``)."""
+        from core.fsck import fsck
+
+        quarantine = self.config["storage"].get("quarantine_dir")
+        try:
+            report = fsck(
+                self.store,
+                self.archive_dir,
+                action=action,
+                quarantine_dir=Path(quarantine) if quarantine else None,
+                grace=grace,
+                workers=workers,
+                audit=self.audit if action else None,
+                on_issue=on_issue,
+                logger=self.logger,
+            )
+        except ValueError as exc:
+            raise ConfigError(str(exc)) from exc
+        if action and (report.quarantined or report.purged) and self._dedup:
+            self._dedup = None  # удалённые записи могли остаться в LRU
+        self.audit.log(
+            "fsck",
+            {
+                "action": action,
+                "files": report.files,
+                "entries": report.entries,
+                "orphans": report.orphans,
+                "missing": report.missing,
+                "quarantined": report.quarantined,
+                "purged": report.purged,
+                "errors": len(report.errors),
+            },
+        )
+        return report
+
+    def reshard(self, shards: int) -> int:
+        """Redistributes the catalog over ``shards`` files; returns entries copied.
+
+        Run it while no other process uses the catalog, then set
+        ``metadata.shards`` to the new value.
+        """
+        from core.sharding import reshard
+
+        old = self.config["metadata"].get("shards", 1)
+        try:
+            copied = reshard(
+                self._db_path,
+                old,
+                shards,
+                promoted_keys=self.config["metadata"].get("promoted_keys"),
+                logger=self.logger,
+            )
+        except ValueError as exc:
+            raise ConfigError(str(exc)) from exc
+        self.config["metadata"]["shards"] = shards
+        self._store = None
+        self._dedup = None
+        self.audit.log("resharded", {"from": old, "to": shards, "entries": copied})
+        return copied
+
+    def export_catalog(self, dst: BinaryIO) -> int:
+        """Writes a columnar snapshot of the catalog to ``dst``; returns entries."""
+        from core.catalog import export_catalog
+
+        count = export_catalog(self.store, dst, logger=self.logger)
+        self.audit.log("catalog_exported", {"entries": count})
+        return count
+
+    def import_catalog(self, src: BinaryIO) -> int:
+        """Bulk-loads a snapshot into this (empty) catalog; returns entries."""
+        from core.catalog import import_catalog
+
+        try:
+            count = import_catalog(self.store, src, logger=self.logger)
+        except ValueError as exc:
+            raise ConfigError(str(exc)) from exc
+        self._dedup = None
+        self.audit.log("catalog_imported", {"entries": count})
+        return count
+
+    def train_dictionary(
+        self, suffix: str, samples: int = 1000, size: Optional[int] = None
+    ) -> Tuple[int, int]:
+        """Trains a zstd dictionary on archived files with ``suffix``.
+
+        The newest entries below ``compression.dictionary_threshold`` are
+        sampled; the dictionary becomes active for new files with that
+        suffix. Returns (dictionary id, samples used).
+        """
+        from core.compression import (
+            DEFAULT_DICT_SIZE,
+            DEFAULT_DICT_THRESHOLD,
+            suffix_key,
+            train_dictionary,
+        )
+        from core.reader import open_entry
+
+        cfg = self.config.get("compression", {})
+        threshold = cfg.get("dictionary_threshold", DEFAULT_DICT_THRESHOLD)
+        suffix = suffix.lstrip(".").lower()
+        data: List[bytes] = []
+        for entry in self.store.iter_entries():
+            meta = entry["metadata"]
+            if (
+                suffix_key(meta.get("original_filename", "")) != suffix
+                or meta.get("size_bytes", threshold) >= threshold
+            ):
+                continue
+            try:
+                with open_entry(
+                    entry, self._data_key(entry), self._dictionaries_for(entry)
+                ) as f:
+                    data.append(f.read())
+            except FileNotFoundError:
+                continue
+            if len(data) >= samples:
+                break
+        try:
+            blob = train_dictionary(
+                data, size or cfg.get("dictionary_size", DEFAULT_DICT_SIZE)
+            )
+            dict_id = self.dictionaries.add(blob, suffix)
+        except (RuntimeError, ValueError) as exc:
+            raise ConfigError(
+                f"Cannot train a dictionary for .{suffix}: {exc}"
+            ) from exc
+        self.audit.log(
+            "dictionary_trained",
+            {"suffix": suffix, "id": dict_id, "samples": len(data), "bytes": len(blob)},
+        )
+        return dict_id, len(data)
+
+    # -------------------------
+    # Analysis
+    # -------------------------
+    @property
+    def ai(self) -> "AIClient":
+        """Pooled chat-completion client configured by the ``ai`` section."""
+        if self._ai is None:
+            from core.ai_bridge import AIClient
+
+            try:
+                self._ai = AIClient.from_config(self.config, logger=self.logger)
+            except ValueError as exc:
+                raise ConfigError(str(exc)) from exc
+        return self._ai
+
+    @property
+    def enricher(self) -> "Enricher":
+        """Analysis queue worker over the ``modules.ai`` service."""
+        if self._enricher is None:
+            from core.analysis import DEFAULT_BATCH_SIZE, Enricher
+            from core.ipc import PersistentModuleIPC
+
+            cfg = self.config.get("analysis", {})
+            ai_cfg = self.config.get("modules", {}).get("ai", {})
+            if "path" not in ai_cfg:
+                raise ConfigError("Analysis requires modules.ai.path")
+            try:
+                ipc = PersistentModuleIPC(
+                    self.base_dir / ai_cfg["path"],
+                    args=["--workers", str(ai_cfg.get("workers", 4))],
+                    logger=self.logger,
+                )
+            except FileNotFoundError as exc:
+                raise ConfigError(f"AI module init failed: {exc}") from exc
+            self._enricher = Enricher(
+                self.store,
+                ipc,
+                self._analysis_item,
+                batch_size=cfg.get("batch_size", DEFAULT_BATCH_SIZE),
+                concurrency=cfg.get("concurrency", 2),
+                lease=cfg.get("lease_seconds", 300),
+                max_attempts=cfg.get("max_attempts", 3),
+                retry_delay=cfg.get("retry_delay", 60),
+                timeout=cfg.get("timeout", 120),
+                logger=self.logger,
+            )
+        return self._enricher
+
+    def _analysis_item(self, file_hash: str) -> Dict[str, Any]:
+        from core.analysis import DEFAULT_MAX_BYTES
+        from core.reader import is_entry_compressed, is_entry_encrypted
+
+        entry = self.store.get_entry_by_hash(file_hash)
+        if entry is None:
+            raise EntryNotFoundError(f"No entry with hash {file_hash}")
+        max_bytes = self.config.get("analysis", {}).get("max_bytes", DEFAULT_MAX_BYTES)
+        # открытый файл модуль читает сам; иначе передаём расшифрованный префикс
+        if not is_entry_encrypted(entry) and not is_entry_compressed(entry):
+            return {"path": entry["file_path"], "max_bytes": max_bytes}
+        return {"text": self._entry_text(entry, max_bytes)}
+
+    def _entry_bytes(self, entry: Dict[str, Any], max_bytes: int) -> bytes:
+        """First ``max_bytes`` of decrypted, decompressed content."""
+        from core.reader import open_entry, read_range
+
+        with open_entry(
+            entry, self._data_key(entry), self._dictionaries_for(entry)
+        ) as f:
+            # один read() зашифрованного файла отдаёт не больше сегмента
+            return read_range(f, 0, max_bytes)
+
+    def _entry_text(self, entry: Dict[str, Any], max_bytes: int) -> str:
+        """First ``max_bytes`` of content, decoded leniently."""
+        return self._entry_bytes(entry, max_bytes).decode("utf-8", errors="replace")
+
+    def start_enrichment(self) -> None:
+        """Analyzes queued content in background threads until ``close``."""
+        self.enricher.start()
+        self.enricher.notify()
+
+    def analyze_pending(
+        self, backfill: bool = False, stop: Optional["threading.Event"] = None
+    ) -> "AnalysisReport":
+        """Analyzes everything in the queue now (``glyph analyze``).
+
+        With ``backfill``, entries added before analysis was enabled are
+        queued first. Content with a cached result is never re-analyzed.
+        """
+        if backfill:
+            queued = self.store.enqueue_unanalyzed()
+            if self.logger:
+                self.logger.info(f"Queued {queued} entries for analysis")
+        report = self.enricher.drain(stop)
+        if report.batches:
+            self.audit.log(
+                "analyzed", {"analyzed": report.analyzed, "failed": report.failed}
+            )
+        return report
+
+    def analysis(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        """Cached analysis of an entry's content, or None if not analyzed yet."""
+        return self.store.get_analysis(self._find(id=entry_id)["hash"])
+
+    def analysis_summary(self) -> Dict[str, int]:
+        """Counts of analyzed, queued and given-up content hashes."""
+        max_attempts = self.config.get("analysis", {}).get("max_attempts", 3)
+        return self.store.analysis_summary(max_attempts)
+
+    # -------------------------
+    # Similarity
+    # -------------------------
+    @property
+    def similarity(self) -> "SimilarityIndex":
+        """Embedding index over entry content (``similarity`` config section)."""
+        if self._similarity is None:
+            from core.similarity import (
+                DEFAULT_DIM,
+                SimilarityIndex,
+                load_embedder,
+            )
+
+            cfg = self.config.get("similarity", {})
+            dim = cfg.get("dim", DEFAULT_DIM)
+            try:
+                self._embedder = load_embedder(cfg.get("embedder", "hashing"), dim)
+                self._similarity = SimilarityIndex(
+                    Path(cfg.get("path", "data/similarity")), dim, self._embedder.name
+                )
+            except (ImportError, RuntimeError, ValueError) as exc:
+                raise ConfigError(f"Similarity index unavailable: {exc}") from exc
+        return self._similarity
+
+    def _similarity_max_bytes(self) -> int:
+        from core.similarity import DEFAULT_MAX_BYTES
+
+        return self.config.get("similarity", {}).get("max_bytes", DEFAULT_MAX_BYTES)
+
+    def index_similarity(self, batch_size: int = 256) -> int:
+        """Embeds entries added since the last call; returns how many.
+
+        Only new catalog ids are read (from the per-shard watermarks), so
+        the call is cheap when the index is current and never rebuilds it.
+        When the shard layout changed, the catalog is read once more and
+        ids already indexed are skipped.
+        """
+        index = self.similarity
+        index.refresh()
+        max_bytes = self._similarity_max_bytes()
+        parts = list(getattr(self.store, "shards", [self.store]))
+        rescan = len(index.watermarks) != len(parts)
+        skip = set(index.entry_ids().tolist()) if rescan else set()
+        marks = [0] * len(parts) if rescan else list(index.watermarks)
+        indexed = 0
+        ids: List[int] = []
+        texts: List[str] = []
+
+        def flush(final: bool = False) -> None:
+            nonlocal indexed
+            vectors = self._embedder.embed(texts) if texts else None
+            if vectors is None:
+                vectors = index.np.zeros((0, index.dim), dtype=index.np.float32)
+            # при полном проходе отметки пишем только в конце: прерванный
+            # проход повторится, а пропуск по ids.i64 не даст дублей строк
+            keep = rescan and not final
+            index.append(ids, vectors, watermarks=None if keep else marks)
+            indexed += len(ids)
+            ids.clear()
+            texts.clear()
+
+        # id монотонны только внутри шарда — у каждого своя отметка
+        for i, part in enumerate(parts):
+            for entry_id, file_hash in part.iter_hashes(after_id=marks[i]):
+                marks[i] = entry_id
+                if entry_id in skip:
+                    continue
+                entry = self.store.get_entry_by_hash(file_hash)
+                if entry is None:
+                    continue
+                try:
+                    texts.append(self._entry_text(entry, max_bytes))
+                except (FileNotFoundError, OSError) as exc:
+                    if self.logger:
+                        self.logger.warning(
+                            f"Not indexed for similarity: {entry_id}: {exc}"
+                        )
+                    continue
+                ids.append(entry_id)
+                if len(ids) >= batch_size:
+                    flush()
+        if ids or marks != index.watermarks:
+            flush(final=True)
+        if indexed and self.logger:
+            self.logger.info(
+                f"Similarity index: +{indexed} entries ({len(index)} total)"
+            )
+        return indexed
+
+    def similar_many(
+        self, entry_ids: List[int], k: int = 10
+    ) -> Dict[int, List[Tuple[Entry, float]]]:
+        """Top-``k`` most similar entries (cosine, best first) for each id.
+
+        The index is brought up to date first; all queries are scored in
+        one pass over the matrix. Deleted entries are skipped.
+        """
+        index = self.similarity
+        self.index_similarity()
+        np = index.np
+        queries = []
+        for entry_id in entry_ids:
+            entry = self._find(id=entry_id)
+            vector = index.vector(entry_id)
+            if vector is None:
+                # не проиндексирована (например, не читалась) — считаем на лету
+                text = self._entry_text(entry, self._similarity_max_bytes())
+                vector = self._embedder.embed([text])[0]
+            queries.append(vector)
+        if not queries:
+            return {}
+        matrix = np.vstack(queries)
+        results: Dict[int, List[Tuple[Entry, float]]] = {}
+        want = k
+        while True:
+            found = index.search(matrix, k=want, self_ids=entry_ids)
+            complete = True
+            for entry_id, hits in zip(entry_ids, found):
+                entries = []
+                for hit_id, score in hits:
+                    row = self.store.get_entry_by_id(hit_id)
+                    if row is not None:
+                        entries.append((Entry.from_row(row), score))
+                results[entry_id] = entries[:k]
+                if len(entries) < k and len(hits) == want:
+                    complete = False
+            # удалённые записи вытеснили результаты — расширяем выборку
+            if complete or want >= len(index):
+                return results
+            want *= 2
+
+    def similar(self, entry_id: int, k: int = 10) -> List[Tuple[Entry, float]]:
+        """Top-``k`` entries most similar to ``entry_id`` (``glyph similar``)."""
+        return self.similar_many([entry_id], k)[entry_id]
+
+    # -------------------------
+    # Near duplicates
+    # -------------------------
+    @property
+    def minhasher(self) -> "MinHasher":
+        """MinHash parameters from ``near_dup``, pinned in the catalog on first use."""
+        if self._minhasher is None:
+            from core.neardup import (
+                DEFAULT_BANDS,
+                DEFAULT_MAX_BYTES,
+                DEFAULT_NUM_PERM,
+                DEFAULT_SHINGLE_SIZE,
+                MinHasher,
+            )
+
+            cfg = self.config.get("near_dup", {})
+            try:
+                hasher = MinHasher(
+                    num_perm=cfg.get("num_perm", DEFAULT_NUM_PERM),
+                    bands=cfg.get("bands", DEFAULT_BANDS),
+                    shingle_size=cfg.get("shingle_size", DEFAULT_SHINGLE_SIZE),
+                    max_bytes=cfg.get("max_bytes", DEFAULT_MAX_BYTES),
+                )
+            except ValueError as exc:
+                raise ConfigError(f"Invalid near_dup settings: {exc}") from exc
+            # подписи с другими параметрами несравнимы
+            pinned = self.store.get_or_set_meta("minhash_params", hasher.params)
+            if pinned != hasher.params:
+                raise ConfigError(
+                    f"near_dup parameters ({hasher.params}) differ from the ones "
+                    f"the catalog was indexed with ({pinned})"
+                )
+            self._minhasher = hasher
+        return self._minhasher
+
+    def index_near_duplicates(self, batch_size: int = 500) -> int:
+        """Computes MinHash signatures of entries that have none; returns how many.
+
+        Covers entries added before ``near_dup`` was enabled; new entries
+        are indexed at ingest.
+        """
+        hasher = self.minhasher
+        indexed = 0
+        after_id = 0
+        while True:
+            pending = self.store.unindexed_minhashes(after_id, batch_size)
+            if not pending:
+                break
+            rows = []
+            for entry_id, file_hash in pending:
+                after_id = entry_id
+                entry = self.store.get_entry_by_hash(file_hash)
+                if entry is None:
+                    continue
+                try:
+                    signature = hasher.signature(
+                        self._entry_bytes(entry, hasher.max_bytes)
+                    )
+                except OSError as exc:
+                    if self.logger:
+                        self.logger.warning(
+                            f"Not indexed for near_dup: {entry_id}: {exc}"
+                        )
+                    continue
+                rows.append(
+                    (file_hash, hasher.pack(signature), hasher.buckets(signature))
+                )
+            self.store.put_minhashes(rows)
+            indexed += len(rows)
+        if indexed and self.logger:
+            self.logger.info(f"Near-duplicate index: +{indexed} entries")
+        return indexed
+
+    def near_duplicates(
+        self, threshold: Optional[float] = None, backfill: bool = False
+    ) -> List[NearDuplicateCluster]:
+        """Clusters catalogued content by estimated similarity (``glyph near-dups``).
+
+        Only entries sharing an LSH bucket are compared, so the cost follows
+        the number of collisions rather than the square of the catalog.
+        With ``backfill``, entries without a signature are indexed first.
+        """
+        from core.neardup import DEFAULT_THRESHOLD, cluster
+
+        hasher = self.minhasher
+        if backfill:
+            self.index_near_duplicates()
+        if threshold is None:
+            threshold = self.config.get("near_dup", {}).get(
+                "threshold", DEFAULT_THRESHOLD
+            )
+        clusters = []
+        for hashes, similarity in cluster(
+            hasher, self.store.iter_lsh_buckets(), self.store.get_minhashes, threshold
+        ):
+            rows = (self.store.get_entry_by_hash(h) for h in hashes)
+            entries = sorted(
+                (Entry.from_row(row) for row in rows if row is not None),
+                key=lambda e: e.id,
+            )
+            if len(entries) > 1:
+                clusters.append(NearDuplicateCluster(entries, similarity))
+        return clusters
+
+    def watch(
+        self,
+        stop: Optional["threading.Event"] = None,
+        once: bool = False,
+        backend: Optional[str] = None,
+        processed_dir: Optional[PathLike] = None,
+        on_batch: Optional[Callable[["WatchBatch"], None]] = None,
+    ) -> List["WatchBatch"]:
+        """Ingests files that appear in ``storage.incoming_dir`` (see ``core.watch``).
+
+        Runs until ``stop`` is set; with ``once`` returns after the files
+        present (and settled) at start have been processed. ``backend`` and
+        ``processed_dir`` override the ``watch`` config section.
+        """
+        from core.watch import DEFAULT_IGNORE, IncomingWatcher
+
+        cfg = self.config.get("watch", {})
+        processed = processed_dir or cfg.get("processed_dir")
+        try:
+            watcher = IncomingWatcher(
+                self,
+                Path(self.config["storage"]["incoming_dir"]),
+                settle=cfg.get("settle_seconds", 2.0),
+                batch_size=cfg.get("batch_size", 100),
+                batch_delay=cfg.get("batch_delay", 1.0),
+                processed_dir=Path(processed) if processed else None,
+                backend=backend or cfg.get("backend", "auto"),
+                poll_interval=cfg.get("poll_interval", 1.0),
+                ignore=cfg.get("ignore", DEFAULT_IGNORE),
+                on_batch=on_batch,
+                logger=self.logger,
+            )
+        except (KeyError, ValueError, OSError) as exc:
+            raise ConfigError(f"Cannot watch incoming_dir: {exc}") from exc
+        if self.logger:
+            self.logger.info(f"Watching {watcher.root} ({watcher.backend})")
+        if self.config.get("analysis", {}).get("enabled") and not once:
+            self.start_enrichment()
+        return watcher.run(stop=stop, once=once)
+
+    def rotate_key(self, new_secret: str) -> Tuple[str, str, int]:
+        """Rewraps data keys under ``new_secret``; returns (old_id, new_id, count)."""
+        from core.keys import KeyManager, rotate_master_key
+
+        old = self.keys
+        new = KeyManager(self.store, new_secret, logger=self.logger)
+        try:
+            count = rotate_master_key(self.store, old, new, logger=self.logger)
+        except ValueError as exc:
+            raise EncryptionKeyError(str(exc)) from exc
+        self.audit.log(
+            "key_rotated", {"old": old.key_id, "new": new.key_id, "keys": count}
+        )
+        self._keys = new
+        self._master_key = new_secret
+        return old.key_id, new.key_id, count
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Transparent zstd compression of archived content (``compression`` config).
+
+The archive write path is ``source -> hash -> zstd -> [encrypt] -> file``:
+the hash is always taken over the logical (uncompressed) bytes, so dedup and
+``verify`` are unaffected. Compressed entries get a ``.zst`` suffix (before
+``.enc``) and record in their metadata::
+
+    "compression": "zstd", "stored_size_bytes": <bytes on disk>,
+    "compression_dict": <zstd dictionary id>    # only when one was used
+
+``size_bytes`` stays the logical size.
+
+Small files compress poorly on their own, so dictionaries can be trained
+per file suffix from already archived entries (``glyph train-dict``). They
+are kept in ``store_meta`` (``zstd_dict:<id>``, and ``zstd_dict_for:<suffix>``
+for the active one), so they travel with catalog snapshots.
+
+Requires the optional ``zstandard`` package.
+"""
+
+import base64
+import io
+import threading
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional
+
+ZSTD = "zstd"
+SUFFIX = ".zst"
+DEFAULT_LEVEL = 3
+DEFAULT_DICT_SIZE = 112 * 1024
+# файлы меньше порога сжимаются словарём своего суффикса (если он обучен)
+DEFAULT_DICT_THRESHOLD = 64 * 1024
+
+_DICT_KEY = "zstd_dict:"
+_SUFFIX_KEY = "zstd_dict_for:"
+READ_CHUNK = 1024 * 1024
+
+
+def require_zstandard():
+    """Returns the ``zstandard`` module; raises ``RuntimeError`` if missing."""
+    try:
+        import zstandard
+    except ImportError as exc:
+        raise RuntimeError(
+            "Compression requires the 'zstandard' package (pip install glyph[zstd])"
+        ) from exc
+    return zstandard
+
+
+def suffix_key(filename: str) -> str:
+    """Dictionary group of a file: its lower-cased last suffix (or "")."""
+    name = filename.rsplit("/", 1)[-1]
+    return name.rsplit(".", 1)[-1].lower() if "." in name[1:] else ""
+
+
+class Dictionaries:
+    """zstd dictionaries stored in ``store_meta``, cached in memory.
+
+    Args:
+        store (MetadataStore): Catalog holding the dictionaries.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._by_id: Dict[int, Any] = {}
+        self._for_suffix: Dict[str, Optional[int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, dict_id: int):
+        """Returns the ``ZstdCompressionDict`` with ``dict_id``."""
+        with self._lock:
+            cached = self._by_id.get(dict_id)
+        if cached is not None:
+            return cached
+        blob = self.store.get_meta(f"{_DICT_KEY}{dict_id}")
+        if blob is None:
+            raise KeyError(f"zstd dictionary {dict_id} is not in the catalog")
+        zdict = require_zstandard().ZstdCompressionDict(base64.b64decode(blob))
+        with self._lock:
+            self._by_id[dict_id] = zdict
+        return zdict
+
+    def for_suffix(self, suffix: str):
+        """Active dictionary for files with ``suffix``, or None."""
+        with self._lock:
+            if suffix in self._for_suffix:
+                dict_id = self._for_suffix[suffix]
+                return None if dict_id is None else self._by_id.get(dict_id)
+        value = self.store.get_meta(f"{_SUFFIX_KEY}{suffix}")
+        dict_id = int(value) if value else None
+        zdict = self.get(dict_id) if dict_id is not None else None
+        with self._lock:
+            self._for_suffix[suffix] = dict_id
+        return zdict
+
+    def add(self, data: bytes, suffix: Optional[str] = None) -> int:
+        """Stores a trained dictionary (and activates it for ``suffix``)."""
+        zdict = require_zstandard().ZstdCompressionDict(data)
+        dict_id = zdict.dict_id()
+        self.store.set_meta(f"{_DICT_KEY}{dict_id}", base64.b64encode(data).decode())
+        if suffix is not None:
+            self.store.set_meta(f"{_SUFFIX_KEY}{suffix}", str(dict_id))
+        with self._lock:
+            self._by_id[dict_id] = zdict
+            if suffix is not None:
+                self._for_suffix[suffix] = dict_id
+        return dict_id
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = DEFAULT_DICT_SIZE) -> bytes:
+    """Trains a zstd dictionary of at most ``size`` bytes from ``samples``."""
+    samples = list(samples)
+    if len(samples) < 8:
+        raise ValueError("Need at least 8 samples to train a dictionary")
+    return require_zstandard().train_dictionary(size, samples).as_bytes()
+
+
+def compressing_writer(raw: BinaryIO, level: int = DEFAULT_LEVEL, zdict=None):
+    """Writable file-like that zstd-compresses into ``raw``.
+
+    Closing it finishes the frame and closes ``raw`` (e.g. a
+    ``StreamEncryptor``, which then seals its last segment).
+    """
+    cctx = require_zstandard().ZstdCompressor(
+        level=level, dict_data=zdict, write_checksum=True
+    )
+    return cctx.stream_writer(raw, closefd=True)
+
+
+def _dctx(zdict=None):
+    return require_zstandard().ZstdDecompressor(dict_data=zdict)
+
+
+def iter_decompress(src: BinaryIO, zdict=None) -> Iterator[bytes]:
+    """Yields the decompressed content of ``src`` in bounded chunks."""
+    with _dctx(zdict).stream_reader(src, closefd=False) as reader:
+        for chunk in iter(lambda: reader.read(READ_CHUNK), b""):
+            yield chunk
+
+
+class DecompressedReader(io.RawIOBase):
+    """Readable, seekable view of a zstd stream.
+
+    zstd frames cannot be entered in the middle: forward seeks decompress
+    and discard, backward seeks restart from the beginning of ``src``
+    (which must itself be seekable).
+    """
+
+    def __init__(self, src: BinaryIO, zdict=None):
+        super().__init__()
+        self._src = src
+        self._zdict = zdict
+        self._reader = None
+        self._pos = 0
+        self._restart()
+
+    def _restart(self) -> None:
+        if self._reader is not None:
+            self._reader.close()
+        self._src.seek(0)
+        self._reader = _dctx(self._zdict).stream_reader(self._src, closefd=False)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("zstd streams support SEEK_SET/SEEK_CUR")
+        if offset < self._pos:
+            self._restart()
+        while self._pos < offset:
+            skipped = self._reader.read(min(READ_CHUNK, offset - self._pos))
+            if not skipped:
+                break
+            self._pos += len(skipped)
+        return self._pos
+
+    def readinto(self, buf) -> int:
+        data = self._reader.read(len(buf))
+        buf[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            if self._reader is not None:
+                self._reader.close()
+            self._src.close()
+        super().close()
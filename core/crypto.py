@@ -1,108 +1,301 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import subprocess
+"""Segmented streaming AEAD (AES-256-GCM, STREAM construction).
+
+File layout::
+
+    header  = magic "GLYE" | version u8 | segment_size u32 BE | nonce_prefix[7]
+    segment = AES-GCM(plaintext[segment_size]) || tag[16]
+
+Segment ``i`` is sealed with nonce ``nonce_prefix || i (u32 BE) || last (u8)``
+and the header as associated data, so segments cannot be reordered,
+truncated or spliced between files. Memory use is bounded by one segment.
+"""
+
+import base64
+import io
 import os
+import struct
 from pathlib import Path
+from typing import BinaryIO
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+MAGIC = b"GLYE"
+VERSION = 1
+DEFAULT_SEGMENT_SIZE = 64 * 1024
+NONCE_PREFIX_SIZE = 7
+TAG_SIZE = 16
+HEADER_SIZE = len(MAGIC) + 1 + 4 + NONCE_PREFIX_SIZE
+SUPPORTED_ALGORITHMS = ("aes-256-gcm",)
+
+_HEADER = struct.Struct(">4sBI7s")
+
+
+def load_key(value: str) -> bytes:
+    """Decodes a base64 (standard or urlsafe) 32-byte key."""
+    try:
+        key = base64.urlsafe_b64decode(value.replace("+", "-").replace("/", "_"))
+    except (ValueError, TypeError) as exc:
+        raise ValueError(f"Invalid base64 key: {exc}") from exc
+    if len(key) != 32:
+        raise ValueError("Key must be 32 bytes")
+    return key
+
+
+def _check_algorithm(algorithm: str) -> None:
+    if algorithm not in SUPPORTED_ALGORITHMS:
+        raise ValueError(f"Unsupported encryption algorithm: {algorithm}")
+
+
+def _segment_nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    if index > 0xFFFFFFFF:
+        raise OverflowError("Too many segments for one stream")
+    return prefix + struct.pack(">IB", index, 1 if last else 0)
+
+
+class StreamEncryptor:
+    """Writable file-like object that encrypts into ``raw`` segment by segment.
+
+    Args:
+        raw (BinaryIO): Destination for ciphertext.
+        key (bytes): 32-byte AES key.
+        segment_size (int): Plaintext bytes per segment.
+    """
+
+    def __init__(
+        self,
+        raw: BinaryIO,
+        key: bytes,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+    ):
+        self._raw = raw
+        self._aead = AESGCM(key)
+        self._segment_size = segment_size
+        self._prefix = os.urandom(NONCE_PREFIX_SIZE)
+        self._header = _HEADER.pack(MAGIC, VERSION, segment_size, self._prefix)
+        self._buf = bytearray()
+        self._index = 0
+        self.closed = False
+        raw.write(self._header)
+
+    def _seal(self, chunk: bytes, last: bool) -> None:
+        nonce = _segment_nonce(self._prefix, self._index, last)
+        self._raw.write(self._aead.encrypt(nonce, chunk, self._header))
+        self._index += 1
+
+    def write(self, data: bytes) -> int:
+        if self.closed:
+            raise ValueError("write to closed StreamEncryptor")
+        self._buf += data
+        # последний сегмент всегда остаётся в буфере до close()
+        while len(self._buf) > self._segment_size:
+            self._seal(bytes(self._buf[: self._segment_size]), last=False)
+            del self._buf[: self._segment_size]
+        return len(data)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._seal(bytes(self._buf), last=True)
+        self._buf.clear()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+def iter_decrypt(raw: BinaryIO, key: bytes):
+    """Yields plaintext segments of a stream written by ``StreamEncryptor``."""
+    header = raw.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE:
+        raise ValueError("Truncated encrypted stream header")
+    magic, version, segment_size, prefix = _HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a Glyph encrypted stream")
+    aead = AESGCM(key)
+    full = segment_size + TAG_SIZE
+    index = 0
+    chunk = raw.read(full)
+    while True:
+        nxt = raw.read(full)
+        last = not nxt
+        if len(chunk) < TAG_SIZE:
+            raise ValueError("Truncated encrypted stream")
+        yield aead.decrypt(_segment_nonce(prefix, index, last), chunk, header)
+        if last:
+            return
+        chunk = nxt
+        index += 1
+
+
+class EncryptedFileReader(io.RawIOBase):
+    """Seekable plaintext view of an encrypted file.
+
+    Only the segments overlapping a read are decrypted (and authenticated),
+    so reading a small byte range of a large file costs one or two segments.
+
+    Args:
+        path (Path): Encrypted file.
+        key (bytes): 32-byte AES key.
+    """
+
+    def __init__(self, path: Path, key: bytes):
+        super().__init__()
+        self._raw = open(path, "rb")
+        try:
+            self._header = self._raw.read(HEADER_SIZE)
+            if len(self._header) != HEADER_SIZE:
+                raise ValueError("Truncated encrypted stream header")
+            magic, version, segment_size, prefix = _HEADER.unpack(self._header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("Not a Glyph encrypted stream")
+            body = os.fstat(self._raw.fileno()).st_size - HEADER_SIZE
+            if body < TAG_SIZE:
+                raise ValueError("Truncated encrypted stream")
+        except Exception:
+            self._raw.close()
+            raise
+        self._aead = AESGCM(key)
+        self._prefix = prefix
+        self.segment_size = segment_size
+        full = segment_size + TAG_SIZE
+        self._segments = -(-body // full)
+        last_len = body - (self._segments - 1) * full - TAG_SIZE
+        if last_len < 0:
+            self._raw.close()
+            raise ValueError("Truncated encrypted stream")
+        self.size = (self._segments - 1) * segment_size + last_len
+        self._pos = 0
+        self._cached_index = -1
+        self._cached = b""
+
+    def _segment(self, index: int) -> bytes:
+        if index != self._cached_index:
+            full = self.segment_size + TAG_SIZE
+            self._raw.seek(HEADER_SIZE + index * full)
+            chunk = self._raw.read(full)
+            last = index == self._segments - 1
+            self._cached = self._aead.decrypt(
+                _segment_nonce(self._prefix, index, last), chunk, self._header
+            )
+            self._cached_index = index
+        return self._cached
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer) -> int:
+        if self._pos >= self.size:
+            return 0
+        index, offset = divmod(self._pos, self.segment_size)
+        data = self._segment(index)[offset : offset + len(buffer)]
+        n = len(data)
+        buffer[:n] = data
+        self._pos += n
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._raw.close()
+        super().close()
+
+
+def is_encrypted_file(path: Path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
 
 
 def encrypt_file(
     input_path: Path,
     output_path: Path,
-    key: str,
-    algorithm: str = "aes-256-cbc",
+    key: bytes,
+    algorithm: str = "aes-256-gcm",
     logger=None,
 ) -> Path:
     """
-    Шифрует файл с помощью openssl.
-    Требует наличия openssl в системе.
+    Шифрует файл потоково (AES-256-GCM STREAM), без загрузки в память.
     """
+    _check_algorithm(algorithm)
     if not input_path.is_file():
         raise FileNotFoundError(f"Файл для шифрования не найден: {input_path}")
 
     # Создаем директорию для выходного файла, если нужно
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    cmd = [
-        "openssl",
-        "enc",
-        f"-{algorithm}",
-        "-salt",
-        "-in",
-        str(input_path),
-        "-out",
-        str(output_path),
-        "-pass",
-        f"pass:{key}",
-    ]
-
     if logger:
         logger.info(f"Шифрование {input_path} -> {output_path}")
 
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-        if result.returncode != 0:
-            error_msg = f"Ошибка шифрования: {result.stderr}"
-            if logger:
-                logger.error(error_msg)
-            raise RuntimeError(error_msg)
-        if logger:
-            logger.debug("Шифрование успешно.")
-        return output_path
-    except FileNotFoundError:
-        # openssl не найден
-        raise RuntimeError(
-            "OpenSSL не найден в системе. Установите openssl или проверьте PATH."
-        )
+    with open(input_path, "rb") as src, open(output_path, "wb") as dst:
+        with StreamEncryptor(dst, key) as enc:
+            for chunk in iter(lambda: src.read(DEFAULT_SEGMENT_SIZE), b""):
+                enc.write(chunk)
+
+    if logger:
+        logger.debug("Шифрование успешно.")
+    return output_path
 
 
 def decrypt_file(
     input_path: Path,
     output_path: Path,
-    key: str,
-    algorithm: str = "aes-256-cbc",
+    key: bytes,
+    algorithm: str = "aes-256-gcm",
     logger=None,
 ) -> Path:
     """
-    Дешифрует файл.
+    Дешифрует файл. При ошибке аутентификации частичный вывод удаляется.
     """
+    _check_algorithm(algorithm)
     if not input_path.is_file():
         raise FileNotFoundError(f"Файл для дешифровки не найден: {input_path}")
 
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    cmd = [
-        "openssl",
-        "enc",
-        "-d",
-        f"-{algorithm}",
-        "-in",
-        str(input_path),
-        "-out",
-        str(output_path),
-        "-pass",
-        f"pass:{key}",
-    ]
-
     if logger:
         logger.info(f"Дешифровка {input_path} -> {output_path}")
 
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-        if result.returncode != 0:
-            error_msg = f"Ошибка дешифровки: {result.stderr}"
-            if logger:
-                logger.error(error_msg)
-            raise RuntimeError(error_msg)
+        with open(input_path, "rb") as src, open(output_path, "wb") as dst:
+            for chunk in iter_decrypt(src, key):
+                dst.write(chunk)
+    except Exception as exc:
+        output_path.unlink(missing_ok=True)
+        error_msg = f"Ошибка дешифровки: {str(exc) or type(exc).__name__}"
         if logger:
-            logger.debug("Дешифровка успешна.")
-        return output_path
-    except FileNotFoundError:
-        raise RuntimeError("OpenSSL не найден в системе.")
+            logger.error(error_msg)
+        raise RuntimeError(error_msg) from exc
 
+    if logger:
+        logger.debug("Дешифровка успешна.")
+    return output_path
 
-def generate_key() -> str:
-    """Генерирует случайный ключ (пароль) для шифрования."""
-    import base64
 
+def generate_key() -> str:
+    """Генерирует случайный 32-байтный ключ (base64) для шифрования."""
     return base64.urlsafe_b64encode(os.urandom(32)).decode()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""In-process dedup index in front of ``MetadataStore``.
+
+``DedupIndex`` answers "is this hash already in the catalog?" for the ingest
+dedup stage and caches recently used entries for ``verify``:
+
+* a Bloom filter of every known hash gives definite negatives, so new
+  files (the common case) cost one ``MAX(id)`` probe instead of a hash
+  lookup;
+* an LRU cache of entries, keyed by id and by hash, serves repeated
+  lookups; writes made through the index update or invalidate it;
+* a snapshot file (filter bits + id watermark) makes warm-up a file read
+  plus a scan of rows added since the snapshot.
+
+Every lookup first compares the catalog's ``MAX(id)`` with the value seen
+last time. When it moved, the rows added since are read into the filter
+(``refresh()``), and if another client or process wrote them, the LRU
+cache is dropped. A long-lived index (``AsyncClient``) never answers from
+a stale filter. Rows that other processes delete or update without
+inserting anything are not detected; callers that change entries
+through the store call ``invalidate()``. A sharded catalog gets one index
+per shard (``ShardedDedupIndex``).
+"""
+
+import hashlib
+import math
+import os
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+SNAPSHOT_MAGIC = b"GLYBLM1\n"
+# k, число бит, число ключей, id-водяной знак, длина хеша строки-водяного знака
+_SNAPSHOT_HEADER = struct.Struct(">IQQQH")
+
+
+class BloomFilter:
+    """Bloom filter over string keys (double hashing of a BLAKE2b digest).
+
+    Args:
+        capacity (int): Expected number of keys.
+        error_rate (float): Target false-positive rate at ``capacity``.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        nbits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.nbits = max(8, nbits)
+        self.k = max(1, round(self.nbits / capacity * math.log(2)))
+        self.bits = bytearray((self.nbits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.nbits for i in range(self.k))
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key)
+        )
+
+
+class LRUCache:
+    """Size-bounded LRU of catalog entries, addressable by id and by hash."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max(1, max_entries)
+        self._by_id: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._by_hash: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def get(self, entry_id: Optional[int] = None, file_hash: Optional[str] = None):
+        with self._lock:
+            if entry_id is None:
+                entry_id = self._by_hash.get(file_hash)
+            entry = self._by_id.get(entry_id) if entry_id is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._by_id.move_to_end(entry_id)
+            self.hits += 1
+            return dict(entry)
+
+    def put(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._by_id[entry["id"]] = dict(entry)
+            self._by_id.move_to_end(entry["id"])
+            self._by_hash[entry["hash"]] = entry["id"]
+            while len(self._by_id) > self.max_entries:
+                _, old = self._by_id.popitem(last=False)
+                if self._by_hash.get(old["hash"]) == old["id"]:
+                    del self._by_hash[old["hash"]]
+
+    def invalidate(self, entry_id: int) -> None:
+        with self._lock:
+            old = self._by_id.pop(entry_id, None)
+            if old is not None and self._by_hash.get(old["hash"]) == entry_id:
+                del self._by_hash[old["hash"]]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_id.clear()
+            self._by_hash.clear()
+
+
+class DedupIndex:
+    """Bloom filter + LRU cache over a ``MetadataStore``.
+
+    Args:
+        store (MetadataStore): Catalog.
+        capacity (int): Expected number of entries; the filter is rebuilt
+            with double capacity when exceeded.
+        error_rate (float): Bloom false-positive rate.
+        cache_size (int): Max entries in the LRU cache.
+        snapshot_path (Path, optional): Snapshot file for fast warm-up.
+        logger (logging.Logger, optional): Logger instance.
+    """
+
+    def __init__(
+        self,
+        store,
+        capacity: int = 1_000_000,
+        error_rate: float = 0.001,
+        cache_size: int = 10000,
+        snapshot_path: Optional[Path] = None,
+        logger=None,
+    ):
+        self.store = store
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.logger = logger
+        self.cache = LRUCache(cache_size)
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.db_lookups = 0
+        self._watermark = 0  # max(id), уже внесённый в фильтр
+        self._store_max = 0  # MAX(id) каталога при последней проверке
+        self._recorded: Set[str] = set()  # свои вставки, ещё не прочитанные refresh
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        if not self._load_snapshot():
+            self._dirty = True
+        self._store_max = store.max_id()
+        self.refresh()
+
+    # -------------------------
+    # Filter maintenance
+    # -------------------------
+    def _add_hash(self, file_hash: str) -> None:
+        with self._lock:
+            self.bloom.add(file_hash)
+            self._dirty = True
+            if self.bloom.count > self.capacity:
+                self._rebuild(self.capacity * 2)
+
+    def _rebuild(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.bloom = BloomFilter(capacity, self.error_rate)
+        self._watermark = 0
+        for entry_id, file_hash in self.store.iter_hashes():
+            self.bloom.add(file_hash)
+            self._watermark = entry_id
+        if self.logger:
+            self.logger.debug(f"Dedup filter rebuilt for {capacity} entries")
+
+    def refresh(self) -> int:
+        """Adds rows written since the last refresh (e.g. by other processes)."""
+        added = 0
+        foreign = False
+        with self._refresh_lock:
+            for entry_id, file_hash in self.store.iter_hashes(after_id=self._watermark):
+                # свои вставки уже в фильтре: повторно не считаем
+                if file_hash in self._recorded:
+                    self._recorded.discard(file_hash)
+                else:
+                    self._add_hash(file_hash)
+                    foreign = True
+                self._watermark = max(self._watermark, entry_id)
+                added += 1
+            self._recorded.clear()
+            # писал кто-то другой: закэшированные строки могли устареть
+            if foreign:
+                self.cache.clear()
+        return added
+
+    def _catch_up(self) -> None:
+        # промах фильтра верен только до водяного знака: если MAX(id)
+        # сдвинулся, сначала дочитываем новые строки
+        current = self.store.max_id()
+        if current != self._store_max:
+            self.refresh()
+            self._store_max = current
+
+    # -------------------------
+    # Lookups
+    # -------------------------
+    def get_entry_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        self._catch_up()
+        if file_hash not in self.bloom:
+            return None  # точно нет в каталоге
+        entry = self.cache.get(file_hash=file_hash)
+        if entry is None:
+            self.db_lookups += 1
+            entry = self.store.get_entry_by_hash(file_hash)
+            if entry is not None:
+                self.cache.put(entry)
+        return entry
+
+    def get_entry_by_id(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        self._catch_up()
+        entry = self.cache.get(entry_id=entry_id)
+        if entry is None:
+            self.db_lookups += 1
+            entry = self.store.get_entry_by_id(entry_id)
+            if entry is not None:
+                self.cache.put(entry)
+        return entry
+
+    # -------------------------
+    # Writes
+    # -------------------------
+    def record(self, file_hash: str) -> None:
+        """Registers the hash of an entry that was just inserted."""
+        self._add_hash(file_hash)
+        self._recorded.add(file_hash)
+
+    def invalidate(self, entry_id: int) -> None:
+        """Drops a cached entry after it was updated or deleted."""
+        self.cache.invalidate(entry_id)
+
+    # -------------------------
+    # Snapshot
+    # -------------------------
+    def _watermark_hash(self) -> str:
+        entry = self.store.get_entry_by_id(self._watermark) if self._watermark else None
+        return entry["hash"] if entry else ""
+
+    def save_snapshot(self) -> bool:
+        """Writes the filter if it changed since it was loaded; returns True if written."""
+        if self.snapshot_path is None or not self._dirty:
+            return False
+        with self._lock:
+            mark_hash = self._watermark_hash().encode()
+            header = _SNAPSHOT_HEADER.pack(
+                self.bloom.k,
+                self.bloom.nbits,
+                self.bloom.count,
+                self._watermark,
+                len(mark_hash),
+            )
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.snapshot_path.with_name(
+                f".{self.snapshot_path.name}.{os.getpid()}.tmp"
+            )
+            with tmp.open("wb") as f:
+                f.write(SNAPSHOT_MAGIC + header + mark_hash)
+                f.write(self.bloom.bits)
+            os.replace(tmp, self.snapshot_path)
+            self._dirty = False
+        return True
+
+    def _load_snapshot(self) -> bool:
+        path = self.snapshot_path
+        if path is None or not path.exists():
+            return False
+        try:
+            with path.open("rb") as f:
+                if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    raise ValueError("bad magic")
+                k, nbits, count, watermark, hash_len = _SNAPSHOT_HEADER.unpack(
+                    f.read(_SNAPSHOT_HEADER.size)
+                )
+                mark_hash = f.read(hash_len).decode()
+                bits = bytearray(f.read())
+            if len(bits) != (nbits + 7) // 8:
+                raise ValueError("truncated")
+        except (OSError, ValueError, struct.error) as exc:
+            if self.logger:
+                self.logger.warning(f"Ignoring dedup snapshot {path}: {exc}")
+            return False
+
+        # снимок от другой (пересозданной) БД дал бы ложные отрицания
+        self._watermark = watermark
+        if self._watermark_hash() != mark_hash:
+            self._watermark = 0
+            if self.logger:
+                self.logger.info(
+                    "Dedup snapshot does not match the catalog; rebuilding"
+                )
+            return False
+
+        self.bloom.k, self.bloom.nbits, self.bloom.count = k, nbits, count
+        self.bloom.bits = bits
+        self.capacity = max(1, round(nbits / k * math.log(2)))
+        return True
+
+
+class ShardedDedupIndex:
+    """One ``DedupIndex`` per shard of a ``ShardedMetadataStore``.
+
+    Ids are monotonic only within a shard, so each shard keeps its own
+    filter and watermark (snapshots: ``<snapshot>.<shard>``).
+    """
+
+    def __init__(self, store, snapshot_path: Optional[Path] = None, **kwargs):
+        self.store = store
+        self.indexes = [
+            DedupIndex(
+                shard,
+                snapshot_path=(
+                    Path(f"{snapshot_path}.{i:02d}") if snapshot_path else None
+                ),
+                **kwargs,
+            )
+            for i, shard in enumerate(store.shards)
+        ]
+
+    @property
+    def db_lookups(self) -> int:
+        return sum(index.db_lookups for index in self.indexes)
+
+    def _for_hash(self, file_hash: str) -> DedupIndex:
+        return self.indexes[
+            self.store.shards.index(self.store.shard_for_hash(file_hash))
+        ]
+
+    def refresh(self) -> int:
+        return sum(index.refresh() for index in self.indexes)
+
+    def get_entry_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        return self._for_hash(file_hash).get_entry_by_hash(file_hash)
+
+    def get_entry_by_id(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        home = self.indexes[entry_id % len(self.indexes)]
+        return home.get_entry_by_id(entry_id) or self.store.get_entry_by_id(entry_id)
+
+    def record(self, file_hash: str) -> None:
+        self._for_hash(file_hash).record(file_hash)
+
+    def invalidate(self, entry_id: int) -> None:
+        for index in self.indexes:
+            index.invalidate(entry_id)
+
+    def save_snapshot(self) -> bool:
+        return any([index.save_snapshot() for index in self.indexes])
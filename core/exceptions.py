@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Exception hierarchy for Glyph operations."""
+
+
+class GlyphError(Exception):
+    """Base class for all Glyph errors."""
+
+
+class DuplicateEntryError(GlyphError):
+    """Content with the same hash is already in the catalog."""
+
+    def __init__(self, file_hash: str, existing_id=None):
+        super().__init__(f"Duplicate file detected: {file_hash}")
+        self.file_hash = file_hash
+        self.existing_id = existing_id
+
+
+class IngestError(GlyphError):
+    """A file could not be archived or registered."""
+
+
+class EntryNotFoundError(GlyphError):
+    """No catalog entry (or no archived file) matches the request."""
+
+
+class EncryptionKeyError(GlyphError):
+    """The master key is missing or does not match the stored data keys."""
+
+
+class ConfigError(GlyphError):
+    """Settings are missing or invalid."""
+
+
+class NearDuplicateError(DuplicateEntryError):
+    """Content is too similar to an entry already in the catalog (``near_dup``)."""
+
+    def __init__(
+        self, file_hash: str, similar_hash: str, similarity: float, existing_id=None
+    ):
+        GlyphError.__init__(
+            self,
+            f"Near duplicate ({similarity:.0%} similar to "
+            f"{'entry ' + str(existing_id) if existing_id else similar_hash}): {file_hash}",
+        )
+        self.file_hash = file_hash
+        self.existing_id = existing_id
+        self.similar_hash = similar_hash
+        self.similarity = similarity
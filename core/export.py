@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Streaming catalog writers (NDJSON, CSV) for ``glyph list --format``.
+
+Both writers consume rows one at a time from ``MetadataStore.iter_entries``
+with ``decode_metadata=False``: the stored metadata JSON is copied into the
+output as text and never parsed.
+"""
+
+import csv
+import json
+from typing import Any, Dict, Iterable, List, TextIO
+
+FORMATS = ("table", "ndjson", "csv")
+
+
+def ndjson_line(row: Dict[str, Any]) -> str:
+    """One JSON object per row; raw ``metadata`` text is spliced in as-is."""
+    if "metadata" not in row or not isinstance(row["metadata"], str):
+        return json.dumps(row, ensure_ascii=False)
+    parts = [
+        f"{json.dumps(k)}: {v if k == 'metadata' else json.dumps(v, ensure_ascii=False)}"
+        for k, v in row.items()
+    ]
+    return "{" + ", ".join(parts) + "}"
+
+
+def write_ndjson(rows: Iterable[Dict[str, Any]], out: TextIO) -> int:
+    """Writes rows as NDJSON; returns the number of rows."""
+    count = 0
+    for row in rows:
+        out.write(ndjson_line(row))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def write_csv(rows: Iterable[Dict[str, Any]], out: TextIO, fields: List[str]) -> int:
+    """Writes a header and one CSV record per row; ``metadata`` stays JSON text."""
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(fields)
+    count = 0
+    for row in rows:
+        writer.writerow([row[f] for f in fields])
+        count += 1
+    return count
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import hashlib
+import os
 import shutil
 from pathlib import Path
-from typing import Union
+from typing import BinaryIO, Callable, Optional, Union
+
+from core.treehash import BLAKE3, new_hash
 
 # Импортируем логгер (он будет передан из orchestrator'а)
 # Мы не создаем логгер здесь, чтобы не плодить сущности
@@ -15,22 +17,28 @@ def calculate_hash(
 ) -> str:
     """
     Вычисляет хеш файла, читая его блоками (эффективно для больших файлов).
+    BLAKE3 считается параллельно на всех ядрах (см. core.treehash).
     """
     file_path = Path(file_path)
     if not file_path.is_file():
         raise FileNotFoundError(f"Файл не найден: {file_path}")
 
-    hash_func = hashlib.new(algorithm)
     try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(65536), b""):  # 64KB блоки
-                hash_func.update(chunk)
+        if algorithm == BLAKE3:
+            from core.treehash import hash_file
+
+            digest = hash_file(file_path, algorithm)
+        else:
+            hash_func = new_hash(algorithm)
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(65536), b""):  # 64KB блоки
+                    hash_func.update(chunk)
+            digest = hash_func.hexdigest()
     except Exception as e:
         if logger:
             logger.error(f"Ошибка чтения файла {file_path} для хеширования: {e}")
         raise
 
-    digest = hash_func.hexdigest()
     if logger:
         logger.debug(f"Хеш ({algorithm}) для {file_path.name}: {digest}")
     return digest
@@ -79,6 +87,60 @@ def copy_file_with_verify(
     return dst
 
 
+def hash_stream(chunks, algorithm: str = "sha256") -> str:
+    """Считает хеш по итератору блоков (например, расшифрованных сегментов)."""
+    hash_func = new_hash(algorithm)
+    for chunk in chunks:
+        hash_func.update(chunk)
+    return hash_func.hexdigest()
+
+
+def archive_file(
+    src: Union[str, Path],
+    dst: Union[str, Path],
+    algorithm: str = "sha256",
+    writer_factory: Optional[Callable[[BinaryIO], BinaryIO]] = None,
+    logger=None,
+) -> str:
+    """
+    Копирует файл в архив за один проход, считая хеш исходного содержимого.
+
+    writer_factory(raw) оборачивает целевой файл (например, StreamEncryptor),
+    поэтому в архив попадают только преобразованные данные. Запись идёт во
+    временный файл, который атомарно переименовывается в dst.
+    Возвращает хеш исходного (логического) содержимого.
+    """
+    src = Path(src)
+    dst = Path(dst)
+
+    if not src.is_file():
+        raise FileNotFoundError(f"Исходный файл не найден: {src}")
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.part")
+
+    if logger:
+        logger.info(f"Архивирование {src} -> {dst}")
+
+    hash_func = new_hash(algorithm)
+    try:
+        with open(src, "rb") as fin, open(tmp, "wb") as raw:
+            out = writer_factory(raw) if writer_factory else raw
+            for chunk in iter(lambda: fin.read(1024 * 1024), b""):
+                hash_func.update(chunk)
+                out.write(chunk)
+            if out is not raw:
+                out.close()
+        os.replace(tmp, dst)
+    except Exception as e:
+        tmp.unlink(missing_ok=True)
+        if logger:
+            logger.error(f"Ошибка архивирования {src} -> {dst}: {e}")
+        raise
+
+    return hash_func.hexdigest()
+
+
 def move_file_with_verify(
     src: Union[str, Path], dst: Union[str, Path], verify: bool = True, logger=None
 ) -> Path:
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Archive/catalog reconciliation (``glyph fsck``).
+
+The archive directory is walked with ``os.scandir`` (sub-directory listings
+are prefetched by a thread pool) in sorted path order, and merge-joined with
+``MetadataStore.iter_paths`` — a cursor over the ``file_path`` index. Only
+the listing of the directory being walked is held in memory; neither side
+is loaded into a dict.
+
+Findings:
+
+* **orphan** — a file in the archive without a catalog row (e.g. left
+  behind by an ``add`` that failed after the copy);
+* **missing** — a catalog row whose file is gone.
+
+With ``action="quarantine"`` orphans are moved under ``quarantine_dir``
+and missing rows are marked unverified; with ``action="purge"`` orphans
+are deleted and missing rows removed. Every fix is written to the audit
+log. Candidates are re-checked right before a fix, and orphans younger
+than ``grace`` seconds are left alone (they may belong to an ``add`` in
+progress).
+"""
+
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+ORPHAN = "orphan"
+MISSING = "missing"
+ACTIONS = ("quarantine", "purge")
+
+_DELETE_BATCH = 500
+
+
+@dataclass
+class FsckIssue:
+    kind: str
+    path: str
+    entry_id: Optional[int] = None
+
+
+@dataclass
+class FsckReport:
+    archive_dir: str
+    action: Optional[str] = None
+    files: int = 0
+    entries: int = 0
+    orphans: int = 0
+    missing: int = 0
+    skipped_recent: int = 0
+    quarantined: int = 0
+    purged: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def clean(self) -> bool:
+        return not (self.orphans or self.missing or self.errors)
+
+
+# -------------------------------------------------
+# Walk
+# -------------------------------------------------
+def _scan(path: str) -> List[Tuple[str, str, bool]]:
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            # ключ "имя/" у каталога: обход в глубину даёт полные пути по возрастанию
+            key = entry.name + os.sep if is_dir else entry.name
+            entries.append((key, entry.path, is_dir))
+    entries.sort()
+    return entries
+
+
+def _walk(
+    pool: ThreadPoolExecutor,
+    listing: "Future[List[Tuple[str, str, bool]]]",
+    path: str,
+    window: int,
+    exclude: frozenset,
+    errors: List[str],
+) -> Iterator[str]:
+    try:
+        entries = listing.result()
+    except OSError as exc:
+        errors.append(f"{path}: {exc}")
+        return
+    subdirs = deque(p for _, p, is_dir in entries if is_dir and p not in exclude)
+    ahead: Dict[str, Future] = {}
+    for _, entry_path, is_dir in entries:
+        if not is_dir:
+            yield entry_path
+            continue
+        if entry_path in exclude:
+            continue
+        while subdirs and len(ahead) < window:
+            sub = subdirs.popleft()
+            ahead[sub] = pool.submit(_scan, sub)
+        yield from _walk(
+            pool, ahead.pop(entry_path), entry_path, window, exclude, errors
+        )
+
+
+def iter_archive(
+    root: str,
+    workers: int = 8,
+    exclude: Iterable[str] = (),
+    errors: Optional[List[str]] = None,
+) -> Iterator[str]:
+    """Yields paths of all files under ``root`` in sorted order.
+
+    Directories that cannot be listed are reported in ``errors`` and skipped.
+    Symlinks are listed as files and not followed.
+    """
+    errors = errors if errors is not None else []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        yield from _walk(
+            pool,
+            pool.submit(_scan, root),
+            root,
+            max(1, workers) * 4,
+            frozenset(exclude),
+            errors,
+        )
+
+
+def _merge(
+    files: Iterator[str], rows: Iterator[Tuple[str, int]]
+) -> Iterator[Tuple[str, str, Optional[int]]]:
+    """Merge-joins two path-sorted streams; yields (kind, path, id) mismatches."""
+    row = next(rows, None)
+    for path in files:
+        while row is not None and row[0] < path:
+            yield MISSING, row[0], row[1]
+            row = next(rows, None)
+        if row is not None and row[0] == path:
+            row = next(rows, None)
+        else:
+            yield ORPHAN, path, None
+    while row is not None:
+        yield MISSING, row[0], row[1]
+        row = next(rows, None)
+
+
+# -------------------------------------------------
+# Fixes
+# -------------------------------------------------
+def _quarantine_file(path: str, root: str, target: Path) -> Path:
+    dst = target / os.path.relpath(path, root)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(path, dst)
+    except OSError:
+        shutil.move(path, dst)  # другая файловая система
+    return dst
+
+
+def fsck(
+    store,
+    archive_dir: Path,
+    action: Optional[str] = None,
+    quarantine_dir: Optional[Path] = None,
+    grace: float = 3600,
+    workers: int = 8,
+    audit=None,
+    on_issue: Optional[Callable[[FsckIssue], None]] = None,
+    logger=None,
+) -> FsckReport:
+    """Reconciles ``archive_dir`` with the catalog.
+
+    Args:
+        store (MetadataStore): Catalog (single or sharded).
+        archive_dir (Path): Archive root.
+        action (str, optional): None (report only), "quarantine" or "purge".
+        quarantine_dir (Path, optional): Where quarantined orphans go
+            (default: ``quarantine`` next to ``archive_dir``).
+        grace (float): Orphans modified less than this many seconds ago are
+            skipped.
+        workers (int): Directory listing threads.
+        audit (AuditLogger, optional): Receives one record per fix.
+        on_issue (callable, optional): Called for every finding.
+        logger (logging.Logger, optional): Logger instance.
+
+    Returns:
+        FsckReport: Counters for this run.
+    """
+    if action not in (None,) + ACTIONS:
+        raise ValueError(f"Unknown fsck action: {action}")
+    root = str(archive_dir)
+    report = FsckReport(archive_dir=root, action=action)
+    if not os.path.isdir(root):
+        raise ValueError(f"Archive directory does not exist: {root}")
+
+    quarantine_dir = Path(quarantine_dir or Path(root).parent / "quarantine")
+    batch_dir = quarantine_dir / datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    cutoff = time.time() - grace
+    # файлы каталога под archive_dir: диапазон [root/, root0) по индексу file_path
+    start = os.path.join(root, "")
+    stop = start[:-1] + chr(ord(start[-1]) + 1)
+    # изменения БД откладываем до конца обхода: курсор держит блокировку чтения
+    missing: List[Tuple[str, int]] = []
+
+    def record(kind: str, path: str, entry_id: Optional[int]) -> None:
+        if kind == MISSING:
+            report.missing += 1
+            missing.append((path, entry_id))
+        else:
+            report.orphans += 1
+        if on_issue:
+            on_issue(FsckIssue(kind, path, entry_id))
+
+    def counted_files() -> Iterator[str]:
+        for path in iter_archive(
+            root, workers, exclude=[str(quarantine_dir)], errors=report.errors
+        ):
+            report.files += 1
+            yield path
+
+    def counted_rows(rows: Iterator[Tuple[str, int]]) -> Iterator[Tuple[str, int]]:
+        for row in rows:
+            report.entries += 1
+            yield row
+
+    for kind, path, entry_id in _merge(
+        counted_files(), counted_rows(store.iter_paths(start, stop))
+    ):
+        if kind == MISSING:
+            # каталог мог не прочитаться при обходе — проверяем сам файл
+            if not os.path.lexists(path):
+                record(kind, path, entry_id)
+            continue
+        try:
+            if os.lstat(path).st_mtime > cutoff:
+                report.skipped_recent += 1
+                continue
+        except FileNotFoundError:
+            continue
+        if store.get_entry_by_path(path) is not None:
+            continue  # зарегистрирован после старта курсора
+        record(kind, path, entry_id)
+        if action is None:
+            continue
+        try:
+            if action == "quarantine":
+                dst = _quarantine_file(path, root, batch_dir)
+                report.quarantined += 1
+                payload = {"kind": ORPHAN, "path": path, "to": str(dst)}
+            else:
+                os.unlink(path)
+                report.purged += 1
+                payload = {"kind": ORPHAN, "path": path}
+        except OSError as exc:
+            report.errors.append(f"{path}: {exc}")
+            continue
+        if audit:
+            audit.log(f"fsck_{action}", payload)
+
+    # записи вне archive_dir (например, из старых версий) проверяем по одной
+    for rows in (store.iter_paths(None, start), store.iter_paths(stop, None)):
+        for path, entry_id in rows:
+            report.entries += 1
+            if not os.path.lexists(path):
+                record(MISSING, path, entry_id)
+
+    if action and missing:
+        _fix_missing(store, missing, action, report, audit)
+
+    if logger:
+        logger.info(
+            f"fsck {root}: {report.files} files, {report.entries} entries, "
+            f"{report.orphans} orphans, {report.missing} missing, "
+            f"{report.skipped_recent} recent skipped, {len(report.errors)} errors"
+        )
+    return report
+
+
+def _fix_missing(
+    store, missing: List[Tuple[str, int]], action: str, report: FsckReport, audit
+) -> None:
+    if action == "quarantine":
+        for path, entry_id in missing:
+            store.update_verification(path, False)
+            report.quarantined += 1
+            if audit:
+                audit.log(
+                    "fsck_quarantine", {"kind": MISSING, "path": path, "id": entry_id}
+                )
+        return
+    for i in range(0, len(missing), _DELETE_BATCH):
+        chunk = missing[i : i + _DELETE_BATCH]
+        report.purged += store.delete_entries(entry_id for _, entry_id in chunk)
+        if audit:
+            for path, entry_id in chunk:
+                audit.log("fsck_purge", {"kind": MISSING, "path": path, "id": entry_id})
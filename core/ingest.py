@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Ingest path shared by the CLI and embedders, built on ``core.pipeline``.
+
+Stages::
+
+    hash (CPU)  ->  dedup (DB read)  ->  [near_dup (CPU, DB read)]  ->  archive (I/O, compress, encrypt)  ->  register (DB write)
+
+``near_dup`` runs when ``near_dup.enabled``: it computes the MinHash
+signature of the source and flags or rejects content similar to an entry
+already indexed (see ``core.neardup``).
+``register`` runs one worker per writer the store supports: a single SQLite
+file sees one writer, a sharded catalog one per shard.
+"""
+
+import functools
+import os
+import shutil
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from core.crypto import StreamEncryptor, iter_decrypt
+from core.exceptions import DuplicateEntryError, IngestError, NearDuplicateError
+from core.file_handler import archive_file, calculate_hash, hash_stream
+from core.ipc import ModuleIPC
+from core.neardup import DEFAULT_THRESHOLD, NearDuplicate, PendingIndex, best_match
+from core.pipeline import Pipeline, PipelineResult, Stage
+from core.reader import iter_content, open_stored
+
+
+@dataclass
+class IngestItem:
+    source: Path
+    title: Optional[str] = None
+    author: Optional[str] = None
+    tags: List[str] = field(default_factory=list)
+    verify: bool = True
+    file_hash: Optional[str] = None
+    size_bytes: int = 0
+    archive_path: Optional[Path] = None
+    data_key: Optional[Tuple[str, bytes]] = None
+    entry_id: Optional[int] = None
+    compression: Optional[str] = None
+    compression_dict: Optional[int] = None
+    stored_size: Optional[int] = None
+    minhash: Optional[Tuple[bytes, List[int]]] = None
+    near_duplicate: Optional[NearDuplicate] = None
+    near_duplicate_id: Optional[int] = None
+    claimed: bool = False  # хеш занят этим элементом в IngestStages.seen
+
+    def metadata(self) -> dict:
+        meta = {
+            "title": self.title or self.source.stem,
+            "author": self.author or "Unknown",
+            "tags": list(self.tags),
+            "original_filename": self.source.name,
+            "size_bytes": self.size_bytes,
+        }
+        if self.compression:
+            meta["compression"] = self.compression
+            meta["stored_size_bytes"] = self.stored_size
+            if self.compression_dict is not None:
+                meta["compression_dict"] = self.compression_dict
+        if self.near_duplicate is not None:
+            meta["near_duplicate"] = {
+                "id": self.near_duplicate_id,
+                "hash": self.near_duplicate.hash,
+                "similarity": round(self.near_duplicate.similarity, 3),
+            }
+        return meta
+
+
+class IngestContext:
+    """Long-lived resources the ingest stages share.
+
+    Args:
+        config (dict): Full settings.
+        store (MetadataStore): Catalog.
+        audit (AuditLogger): Audit log.
+        remote (RemoteStorage): Remote replica.
+        logger (logging.Logger, optional): Logger instance.
+        crypto_ipc (ModuleIPC, optional): External crypto module for hashing.
+        keys (KeyManager, optional): Required when encryption is enabled.
+        dedup (DedupIndex, optional): Answers duplicate checks before SQLite.
+        dictionaries (Dictionaries, optional): zstd dictionaries; used when
+            ``compression.enabled``.
+        minhasher (MinHasher, optional): Enables the ``near_dup`` stage.
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        store,
+        audit,
+        remote,
+        logger=None,
+        crypto_ipc: Optional[ModuleIPC] = None,
+        keys=None,
+        dedup=None,
+        dictionaries=None,
+        minhasher=None,
+    ):
+        self.config = config
+        self.store = store
+        self.audit = audit
+        self.remote = remote
+        self.logger = logger
+        self.crypto_ipc = crypto_ipc
+        self.keys = keys
+        self.dedup = dedup
+        self.hash_algo = config["security"]["hash_algo"]
+        self.encrypt = config["security"]["encryption"]["enabled"]
+        self.archive_dir = Path(config["storage"]["archive_dir"])
+        self.dictionaries = dictionaries
+        comp = config.get("compression", {})
+        self.compress = comp.get("enabled", False)
+        self.compress_level = comp.get("level", 3)
+        self.dict_threshold = comp.get("dictionary_threshold", 64 * 1024)
+        self.compress_skip = {s.lower() for s in comp.get("skip_suffixes", [])}
+        # новые записи ставятся в очередь анализа в той же транзакции
+        self.analyze = config.get("analysis", {}).get("enabled", False)
+        self.minhasher = minhasher
+        near = config.get("near_dup", {})
+        self.near_dup_threshold = near.get("threshold", DEFAULT_THRESHOLD)
+        self.near_dup_reject = near.get("action", "flag") == "reject"
+
+
+def hash_file(
+    path: Path,
+    algorithm: str,
+    crypto_ipc: Optional[ModuleIPC] = None,
+    logger=None,
+) -> str:
+    """Hashes a file locally or through the crypto module.
+
+    The module reads the file itself (``path`` request); BLAKE3 is hashed
+    there on all cores over a memory map.
+    """
+    if crypto_ipc:
+        resp = crypto_ipc.call(
+            {"cmd": "hash", "path": str(path.resolve()), "algorithm": algorithm}
+        )
+        if "error" in resp:
+            raise IngestError(resp["error"])
+        return resp["result"]
+    return calculate_hash(path, algorithm=algorithm, logger=logger)
+
+
+def reserve_archive_path(archive_dir: Path, source: Path, suffix: str = "") -> Path:
+    """Atomically claims a free name in ``archive_dir`` (safe across workers)."""
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    candidate = archive_dir / f"{source.name}{suffix}"
+    counter = 1
+    while True:
+        try:
+            os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return candidate
+        except FileExistsError:
+            candidate = archive_dir / f"{source.stem}_{counter}{source.suffix}{suffix}"
+            counter += 1
+
+
+def hash_item(algorithm: str, item: IngestItem) -> IngestItem:
+    # отдельная функция уровня модуля — пригодна для ProcessPoolExecutor
+    if not item.source.is_file():
+        raise FileNotFoundError(f"File not found: {item.source}")
+    item.size_bytes = item.source.stat().st_size
+    item.file_hash = calculate_hash(item.source, algorithm=algorithm)
+    return item
+
+
+class IngestStages:
+    """Stage functions bound to one ingest run (or one long-lived client)."""
+
+    def __init__(self, ctx: IngestContext):
+        self.ctx = ctx
+        self.seen: Set[str] = set()
+        self._seen_lock = threading.Lock()
+        self.pending = PendingIndex()
+        self._pending_lock = threading.Lock()
+
+    def hash_via_module(self, item: IngestItem) -> IngestItem:
+        if not item.source.is_file():
+            raise FileNotFoundError(f"File not found: {item.source}")
+        item.size_bytes = item.source.stat().st_size
+        item.file_hash = hash_file(
+            item.source, self.ctx.hash_algo, self.ctx.crypto_ipc, self.ctx.logger
+        )
+        return item
+
+    def dedup(self, item: IngestItem) -> IngestItem:
+        # self.seen ловит дубликаты, ещё не дошедшие до БД; хеш снимается
+        # после записи в БД, поэтому проверка БД — под той же блокировкой
+        lookup = self.ctx.dedup or self.ctx.store
+        with self._seen_lock:
+            existing = lookup.get_entry_by_hash(item.file_hash)
+            if existing or item.file_hash in self.seen:
+                raise DuplicateEntryError(
+                    item.file_hash, existing["id"] if existing else None
+                )
+            self.seen.add(item.file_hash)
+            item.claimed = True
+        return item
+
+    def near_dup(self, item: IngestItem) -> IngestItem:
+        ctx = self.ctx
+        hasher = ctx.minhasher
+        with item.source.open("rb") as f:
+            signature = hasher.signature(f.read(hasher.max_bytes))
+        blob, buckets = hasher.pack(signature), hasher.buckets(signature)
+        candidates = ctx.store.lsh_candidates(buckets)
+        # self.pending — подписи этой же пачки, ещё не записанные в БД
+        with self._pending_lock:
+            candidates += self.pending.candidates(buckets)
+            match = best_match(hasher, signature, candidates, ctx.near_dup_threshold)
+            if match is not None and ctx.near_dup_reject:
+                existing = ctx.store.get_entry_by_hash(match.hash)
+                raise NearDuplicateError(
+                    item.file_hash,
+                    match.hash,
+                    match.similarity,
+                    existing["id"] if existing else None,
+                )
+            self.pending.add(item.file_hash, blob, buckets)
+        item.minhash = (blob, buckets)
+        item.near_duplicate = match
+        return item
+
+    def _compression_dict(self, item: IngestItem):
+        if self.ctx.dictionaries is None or item.size_bytes >= self.ctx.dict_threshold:
+            return None
+        from core.compression import suffix_key
+
+        return self.ctx.dictionaries.for_suffix(suffix_key(item.source.name))
+
+    def archive(self, item: IngestItem) -> IngestItem:
+        ctx = self.ctx
+        if ctx.logger:
+            ctx.logger.info(f"Adding file: {item.source}")
+        compress = ctx.compress and item.source.suffix.lower() not in ctx.compress_skip
+        suffix = (".zst" if compress else "") + (".enc" if ctx.encrypt else "")
+        item.archive_path = reserve_archive_path(ctx.archive_dir, item.source, suffix)
+
+        key = None
+        if ctx.encrypt:
+            if ctx.keys is None:
+                raise IngestError("Encryption is enabled but no master key is set")
+            # envelope: случайный ключ данных, обёрнутый мастер-ключом
+            key, item.data_key = ctx.keys.new_data_key()
+
+        zdict = None
+        writer_factory = None
+        if compress:
+            from core.compression import ZSTD, compressing_writer
+
+            zdict = self._compression_dict(item)
+            item.compression = ZSTD
+            item.compression_dict = zdict.dict_id() if zdict is not None else None
+
+            # сжатие до шифрования: шифртекст не сжимается
+            def writer_factory(raw):
+                inner = StreamEncryptor(raw, key=key) if key is not None else raw
+                return compressing_writer(inner, ctx.compress_level, zdict)
+
+        elif key is not None:
+            writer_factory = functools.partial(StreamEncryptor, key=key)
+
+        copied_hash = archive_file(
+            item.source,
+            item.archive_path,
+            algorithm=ctx.hash_algo,
+            writer_factory=writer_factory,
+            logger=ctx.logger,
+        )
+        if copied_hash != item.file_hash:
+            raise IngestError(f"Source changed while archiving: {item.source}")
+        if not ctx.encrypt:
+            shutil.copystat(item.source, item.archive_path)
+        item.stored_size = item.archive_path.stat().st_size
+
+        if item.verify:
+            if compress:
+                with open_stored(item.archive_path, key, True, zdict) as f:
+                    stored_hash = hash_stream(iter_content(f), ctx.hash_algo)
+            elif ctx.encrypt:
+                with item.archive_path.open("rb") as f:
+                    stored_hash = hash_stream(iter_decrypt(f, key), ctx.hash_algo)
+            else:
+                stored_hash = calculate_hash(item.archive_path, ctx.hash_algo)
+            if stored_hash != item.file_hash:
+                raise IngestError(f"Archived copy does not verify: {item.archive_path}")
+        return item
+
+    def register(self, item: IngestItem) -> IngestItem:
+        ctx = self.ctx
+        ctx.remote.send_file(item.archive_path)
+        near = item.near_duplicate
+        if near is not None:
+            # совпадение из той же пачки может быть ещё не зарегистрировано
+            existing = ctx.store.get_entry_by_hash(near.hash)
+            item.near_duplicate_id = existing["id"] if existing else None
+        item.entry_id = ctx.store.add_entry(
+            str(item.archive_path),
+            item.file_hash,
+            item.metadata(),
+            data_key=item.data_key,
+            hash_algo=ctx.hash_algo,
+            enqueue_analysis=ctx.analyze,
+            minhash=item.minhash,
+        )
+        if item.minhash is not None:
+            with self._pending_lock:
+                self.pending.discard(item.file_hash)
+        if ctx.dedup is not None:
+            ctx.dedup.record(item.file_hash)
+        # запись в БД видна проверке дубликатов — seen больше не нужен
+        with self._seen_lock:
+            self.seen.discard(item.file_hash)
+            item.claimed = False
+        event = {
+            "file": str(item.archive_path),
+            "hash": item.file_hash,
+            "id": item.entry_id,
+        }
+        if near is not None:
+            event["near_duplicate_of"] = near.hash
+            if ctx.logger:
+                ctx.logger.warning(
+                    f"Near duplicate ({near.similarity:.0%} similar to "
+                    f"{item.near_duplicate_id or near.hash}): {item.source}"
+                )
+        ctx.audit.log("file_added", event)
+        return item
+
+    def cleanup(self, item: IngestItem, exc: Optional[BaseException] = None) -> None:
+        # не оставляем в архиве файлы без записи в БД
+        if item.archive_path is not None and item.entry_id is None:
+            item.archive_path.unlink(missing_ok=True)
+        # хеш снимаем, только если его занял этот элемент, а не дубликат
+        if item.claimed and item.entry_id is None:
+            with self._seen_lock:
+                self.seen.discard(item.file_hash)
+                item.claimed = False
+            with self._pending_lock:
+                self.pending.discard(item.file_hash)
+
+
+def build_ingest_pipeline(
+    ctx: IngestContext, workers: Optional[int] = None
+) -> Pipeline:
+    """Builds the staged ingest pipeline from ``config['ingest']``.
+
+    Args:
+        ctx (IngestContext): Shared resources.
+        workers (int, optional): Overrides hash and archive concurrency.
+    """
+    cfg = ctx.config.get("ingest", {})
+    hash_workers = workers or cfg.get("hash_workers", os.cpu_count() or 1)
+    archive_workers = workers or cfg.get("archive_workers", 4)
+    queue_size = cfg.get("queue_size", 64)
+    stages = IngestStages(ctx)
+
+    if ctx.crypto_ipc:
+        hash_stage = Stage(
+            "hash", stages.hash_via_module, hash_workers, "thread", queue_size
+        )
+    else:
+        hash_stage = Stage(
+            "hash",
+            functools.partial(hash_item, ctx.hash_algo),
+            hash_workers,
+            cfg.get("hash_kind", "thread"),
+            queue_size,
+        )
+
+    near_dup = []
+    if ctx.minhasher is not None:
+        near_dup = [
+            Stage(
+                "near_dup",
+                stages.near_dup,
+                ctx.config.get("near_dup", {}).get("workers", 2),
+                "thread",
+                queue_size,
+                on_error=stages.cleanup,
+            )
+        ]
+
+    return Pipeline(
+        [
+            hash_stage,
+            Stage("dedup", stages.dedup, 1, "thread", queue_size),
+            *near_dup,
+            Stage(
+                "archive",
+                stages.archive,
+                archive_workers,
+                "thread",
+                queue_size,
+                on_error=stages.cleanup,
+            ),
+            Stage(
+                "register",
+                stages.register,
+                getattr(ctx.store, "writers", 1),
+                "thread",
+                queue_size,
+                on_error=stages.cleanup,
+            ),
+        ],
+        logger=ctx.logger,
+    )
+
+
+def ingest_files(
+    ctx: IngestContext,
+    items: Iterable[IngestItem],
+    workers: Optional[int] = None,
+    on_result: Optional[Callable[[IngestItem], None]] = None,
+) -> PipelineResult:
+    """Runs ``items`` through the ingest pipeline.
+
+    Returns:
+        PipelineResult: Added items (unless ``on_result`` is given), per-item
+        errors as (stage, item, exception) and per-stage throughput.
+    """
+    if ctx.dedup is not None:
+        ctx.dedup.refresh()
+    return build_ingest_pipeline(ctx, workers).run(items, on_result=on_result)
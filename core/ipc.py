@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import itertools
 import json
 import subprocess
+import sys
+import threading
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 
 class ModuleIPC:
@@ -56,3 +60,187 @@ class ModuleIPC:
         if self.logger:
             self.logger.debug(f"IPC response: {response}")
         return response
+
+
+class AsyncModuleIPC:
+    """asyncio variant of ``ModuleIPC`` built on subprocess streams.
+
+    Cancelling the awaiting task (or hitting ``timeout``) kills the module
+    process, so no orphaned workers are left behind.
+
+    Args:
+        module_path (Path): Path to the executable.
+        logger (logging.Logger, optional): Logger instance.
+    """
+
+    MAX_IPC_SIZE = ModuleIPC.MAX_IPC_SIZE
+
+    def __init__(self, module_path: Path, logger=None):
+        self.module_path = module_path.resolve()
+        if not self.module_path.exists():
+            raise FileNotFoundError(f"Module executable not found: {module_path}")
+        self.logger = logger
+
+    async def call(
+        self, request: Dict[str, Any], timeout: float = 30
+    ) -> Dict[str, Any]:
+        import asyncio  # только для async-пути: CLI не платит за импорт asyncio
+
+        data = json.dumps(request).encode()
+        if len(data) > self.MAX_IPC_SIZE:
+            raise ValueError(
+                f"IPC payload too large: {len(data)} > {self.MAX_IPC_SIZE}"
+            )
+        proc = await asyncio.create_subprocess_exec(
+            str(self.module_path),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                proc.communicate(data), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise RuntimeError(f"Module {self.module_path} timed out after {timeout}s")
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            raise
+        if proc.returncode != 0:
+            error_msg = (
+                f"Module {self.module_path} exited with code {proc.returncode}\n"
+                f"stderr: {stderr.decode(errors='replace')}"
+            )
+            if self.logger:
+                self.logger.error(error_msg)
+            raise RuntimeError(error_msg)
+        try:
+            return json.loads(stdout)
+        except json.JSONDecodeError as e:
+            raise RuntimeError(f"Invalid JSON from module: {stdout!r}") from e
+
+
+def module_command(module_path: Path) -> List[str]:
+    """argv for a module: Python scripts run under the current interpreter."""
+    if module_path.suffix == ".py":
+        return [sys.executable, str(module_path)]
+    return [str(module_path)]
+
+
+class PersistentModuleIPC:
+    """Long-running module speaking line-delimited JSON.
+
+    The process is started on first use and kept alive; every request gets
+    an ``id`` that the module echoes, so many requests (from many threads)
+    can be in flight at once. If the process dies, pending calls fail and
+    the next call starts a new one.
+
+    Args:
+        module_path (Path): Executable or ``.py`` script.
+        args (list, optional): Extra command-line arguments.
+        logger (logging.Logger, optional): Logger instance.
+    """
+
+    MAX_IPC_SIZE = ModuleIPC.MAX_IPC_SIZE
+
+    def __init__(
+        self, module_path: Path, args: Optional[List[str]] = None, logger=None
+    ):
+        self.module_path = module_path.resolve()
+        if not self.module_path.exists():
+            raise FileNotFoundError(f"Module executable not found: {module_path}")
+        self.command = module_command(self.module_path) + list(args or [])
+        self.logger = logger
+        self._proc: Optional[subprocess.Popen] = None
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _start(self) -> subprocess.Popen:
+        proc = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        threading.Thread(
+            target=self._read_loop, args=(proc,), name="module-ipc-reader", daemon=True
+        ).start()
+        if self.logger:
+            self.logger.debug(f"Started module {self.module_path} (pid {proc.pid})")
+        return proc
+
+    def _read_loop(self, proc: subprocess.Popen) -> None:
+        for line in proc.stdout:
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                if self.logger:
+                    self.logger.error(f"Invalid JSON from module: {line!r}")
+                continue
+            with self._lock:
+                future = self._pending.pop(response.pop("id", None), None)
+            if future is not None:
+                future.set_result(response)
+        # процесс завершился: ожидающие вызовы не получат ответа
+        with self._lock:
+            if self._proc is proc:
+                self._proc = None
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(
+                RuntimeError(f"Module {self.module_path} exited (code {proc.wait()})")
+            )
+
+    def submit(self, request: Dict[str, Any]) -> Future:
+        """Sends ``request``; the future resolves to the module's response."""
+        future: Future = Future()
+        with self._lock:
+            req_id = next(self._ids)
+            data = json.dumps({**request, "id": req_id}, ensure_ascii=False)
+            if len(data.encode()) > self.MAX_IPC_SIZE:
+                raise ValueError(
+                    f"IPC payload too large: {len(data)} > {self.MAX_IPC_SIZE}"
+                )
+            if self._proc is None:
+                self._proc = self._start()
+            self._pending[req_id] = future
+            future.request_id = req_id
+            try:
+                self._proc.stdin.write(data + "\n")
+                self._proc.stdin.flush()
+            except OSError as exc:
+                self._pending.pop(req_id, None)
+                raise RuntimeError(f"Module {self.module_path} is not running") from exc
+        return future
+
+    def call(self, request: Dict[str, Any], timeout: float = 30) -> Dict[str, Any]:
+        """Sends ``request`` and waits for its response."""
+        from concurrent.futures import TimeoutError as FutureTimeout
+
+        future = self.submit(request)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._pending.pop(future.request_id, None)
+            raise RuntimeError(f"Module {self.module_path} timed out after {timeout}s")
+
+    def close(self, timeout: float = 10) -> None:
+        """Closes stdin (the module exits after finishing queued requests)."""
+        with self._lock:
+            proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
@@ -1,20 +1,48 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Literal
+"""Pydantic schemas of the crypto module IPC messages.
 
+pydantic is imported on first attribute access (``core.ipc_schema.HashRequest``),
+not when the module is imported.
+"""
 
-class HashRequest(BaseModel):
-    cmd: Literal["hash"] = "hash"
-    data: str = Field(..., description="Hex-encoded bytes")
-    algorithm: str = "sha256"
+from typing import Any, Dict, Optional
 
+__all__ = ["HashRequest", "EncryptRequest", "IPCResponse"]  # noqa: F822
 
-class EncryptRequest(BaseModel):
-    cmd: Literal["encrypt"] = "encrypt"
-    data: str = Field(..., description="Hex-encoded bytes")
-    key: str = Field(..., description="Base64-encoded key")
-    algorithm: str = "aes-256-gcm"
+_models: Optional[Dict[str, Any]] = None
 
 
-class IPCResponse(BaseModel):
-    result: Optional[str] = None
-    error: Optional[str] = None
+def _build_models() -> Dict[str, Any]:
+    from typing import Literal
+
+    from pydantic import BaseModel, Field
+
+    class HashRequest(BaseModel):
+        cmd: Literal["hash"] = "hash"
+        data: Optional[str] = Field(None, description="Hex-encoded bytes")
+        path: Optional[str] = Field(None, description="File to hash (instead of data)")
+        algorithm: str = "sha256"
+
+    class EncryptRequest(BaseModel):
+        cmd: Literal["encrypt"] = "encrypt"
+        data: str = Field(..., description="Hex-encoded bytes")
+        key: str = Field(..., description="Base64-encoded key")
+        algorithm: str = "aes-256-gcm"
+
+    class IPCResponse(BaseModel):
+        result: Optional[str] = None
+        error: Optional[str] = None
+
+    return {
+        "HashRequest": HashRequest,
+        "EncryptRequest": EncryptRequest,
+        "IPCResponse": IPCResponse,
+    }
+
+
+def __getattr__(name: str):
+    global _models
+    if name in __all__:
+        if _models is None:
+            _models = _build_models()
+        return _models[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Envelope encryption: per-file data keys wrapped by a master key.
+
+Every encrypted file gets a random 32-byte data key (DEK). The DEK is
+wrapped with AES-256-GCM under the master key (KEK) and stored in
+``MetadataStore.data_keys``; the payload is never encrypted with the master
+key itself. Rotating the master key therefore only rewraps the DEKs.
+
+The master secret comes from ``security.encryption.key_env_var``: a base64
+32-byte key is used as is, anything else is treated as a passphrase and
+stretched with scrypt (salt kept in ``store_meta``). The derived key is
+cached for the lifetime of the process.
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from core.crypto import load_key
+from core.metadata_store import MetadataStore
+
+SCRYPT_N = 2**15
+SCRYPT_R = 8
+SCRYPT_P = 1
+WRAP_NONCE_SIZE = 12
+
+_master_cache: Dict[Tuple[bytes, bytes], bytes] = {}
+_cache_lock = threading.Lock()
+
+
+def derive_master_key(secret: str, salt: bytes) -> bytes:
+    """Derives (and caches for the session) the master key for ``secret``."""
+    try:
+        return load_key(secret)
+    except ValueError:
+        pass
+    cache_key = (hashlib.sha256(secret.encode("utf-8")).digest(), salt)
+    with _cache_lock:
+        cached = _master_cache.get(cache_key)
+        if cached is None:
+            cached = hashlib.scrypt(
+                secret.encode("utf-8"),
+                salt=salt,
+                n=SCRYPT_N,
+                r=SCRYPT_R,
+                p=SCRYPT_P,
+                maxmem=64 * 1024 * 1024,
+                dklen=32,
+            )
+            _master_cache[cache_key] = cached
+        return cached
+
+
+class KeyManager:
+    """Wraps and unwraps per-file data keys with one master key.
+
+    Args:
+        store (MetadataStore): Store holding wrapped keys and the KDF salt.
+        secret (str): Base64 32-byte key or passphrase.
+        logger (logging.Logger, optional): Logger instance.
+    """
+
+    def __init__(self, store: MetadataStore, secret: str, logger=None):
+        self.store = store
+        self.logger = logger
+        salt = bytes.fromhex(store.get_or_set_meta("kdf_salt", os.urandom(16).hex()))
+        self._master = derive_master_key(secret, salt)
+        self._aead = AESGCM(self._master)
+        self.key_id = hmac.new(
+            self._master, b"glyph-master-key-id", hashlib.sha256
+        ).hexdigest()[:16]
+
+    @classmethod
+    def from_env(
+        cls,
+        store: MetadataStore,
+        enc_cfg: dict,
+        env_var: Optional[str] = None,
+        logger=None,
+    ) -> Optional["KeyManager"]:
+        """Builds a manager from ``env_var`` (default ``enc_cfg['key_env_var']``)."""
+        secret = os.environ.get(env_var or enc_cfg["key_env_var"])
+        return cls(store, secret, logger=logger) if secret else None
+
+    def _aad(self) -> bytes:
+        return b"glyph-dek:" + self.key_id.encode("ascii")
+
+    def wrap(self, data_key: bytes) -> bytes:
+        nonce = os.urandom(WRAP_NONCE_SIZE)
+        return nonce + self._aead.encrypt(nonce, data_key, self._aad())
+
+    def unwrap(self, wrapped: bytes) -> bytes:
+        nonce, ct = wrapped[:WRAP_NONCE_SIZE], wrapped[WRAP_NONCE_SIZE:]
+        return self._aead.decrypt(nonce, ct, self._aad())
+
+    def new_data_key(self) -> Tuple[bytes, Tuple[str, bytes]]:
+        """Returns (data_key, (key_id, wrapped)) for a new file."""
+        data_key = os.urandom(32)
+        return data_key, (self.key_id, self.wrap(data_key))
+
+    def data_key_for(self, entry: Dict[str, Any]) -> bytes:
+        """Returns the key that decrypts ``entry``.
+
+        Entries written before envelope encryption have no data key row and
+        were encrypted with the master key directly.
+        """
+        record = self.store.get_data_key(entry["id"])
+        if record is None:
+            return self._master
+        key_id, wrapped = record
+        if key_id != self.key_id:
+            raise ValueError(
+                f"Entry {entry['id']} is wrapped with master key {key_id}, "
+                f"current master key is {self.key_id}"
+            )
+        return self.unwrap(wrapped)
+
+
+def rotate_master_key(
+    store: MetadataStore,
+    old: KeyManager,
+    new: KeyManager,
+    batch_size: int = 1000,
+    logger=None,
+) -> int:
+    """Rewraps all data keys from ``old`` to ``new``; payloads are untouched.
+
+    Legacy entries encrypted directly with the old master key get the old
+    master key as their (now wrapped) data key.
+
+    Returns:
+        int: Number of data keys written.
+    """
+    if old.key_id == new.key_id:
+        raise ValueError("New master key is identical to the current one")
+
+    total = 0
+    # переобёрнутые ключи уходят из выборки, поэтому просто берём пачки до пустой
+    while True:
+        batch = store.list_data_keys(old.key_id, limit=batch_size)
+        if not batch:
+            break
+        store.put_data_keys(
+            (entry_id, new.key_id, new.wrap(old.unwrap(wrapped)))
+            for entry_id, wrapped in batch
+        )
+        total += len(batch)
+
+    while True:
+        legacy = store.list_unkeyed_encrypted_entries(limit=batch_size)
+        if not legacy:
+            break
+        store.put_data_keys(
+            (entry_id, new.key_id, new.wrap(old._master)) for entry_id in legacy
+        )
+        total += len(legacy)
+
+    if logger:
+        logger.info(f"Master key rotated {old.key_id} -> {new.key_id}: {total} keys")
+    return total
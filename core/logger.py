@@ -5,6 +5,7 @@ import json
 import logging
 import logging.handlers
 import sys
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any
@@ -39,8 +40,15 @@ class AuditLogger:
         self.audit_file.parent.mkdir(parents=True, exist_ok=True)
         if not self.audit_file.exists():
             self.audit_file.write_text("", encoding="utf-8")
+        self._lock = threading.Lock()
+        # кэш хвоста цепочки: перечитываем файл, только если его дописал кто-то ещё
+        self._cached_hash = None
+        self._cached_size = -1
 
     def _last_hash(self) -> str:
+        size = self.audit_file.stat().st_size
+        if self._cached_hash is not None and size == self._cached_size:
+            return self._cached_hash
         last = ""
         for line in self.audit_file.read_text(encoding="utf-8").splitlines():
             if line.strip():
@@ -49,27 +57,40 @@ class AuditLogger:
         return last or "GENESIS"
 
     def log(self, event: str, payload: Dict[str, Any]) -> str:
-        prev = self._last_hash()
-        entry = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
-            "event": event,
-            "payload": payload,
-            "prev": prev,
-        }
-        blob = json.dumps(entry, sort_keys=True, ensure_ascii=False).encode("utf-8")
-        entry["hash"] = hashlib.sha256(blob + prev.encode("utf-8")).hexdigest()
-        with self.audit_file.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-        return entry["hash"]
-
-
-def setup_logger(config: dict) -> logging.Logger:
+        with self._lock:
+            prev = self._last_hash()
+            entry = {
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "event": event,
+                "payload": payload,
+                "prev": prev,
+            }
+            blob = json.dumps(entry, sort_keys=True, ensure_ascii=False).encode("utf-8")
+            entry["hash"] = hashlib.sha256(blob + prev.encode("utf-8")).hexdigest()
+            with self.audit_file.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._cached_hash = entry["hash"]
+            self._cached_size = self.audit_file.stat().st_size
+            return entry["hash"]
+
+
+class _LazyRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Creates the log directory and file on the first emitted record."""
+
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+def setup_logger(config: dict, console_stream=None) -> logging.Logger:
     log_file = Path(config["logging"]["file"])
     log_level_name = config["logging"]["level"].upper()
     log_level = getattr(logging, log_level_name, logging.INFO)
     use_json = config["logging"].get("json_format", False)
 
-    log_file.parent.mkdir(parents=True, exist_ok=True)
     logger = logging.getLogger("glyph")
     logger.setLevel(log_level)
 
@@ -86,18 +107,19 @@ def setup_logger(config: dict) -> logging.Logger:
             "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
         )
 
-    file_handler = logging.handlers.RotatingFileHandler(
+    file_handler = _LazyRotatingFileHandler(
         log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8"
     )
     file_handler.setLevel(log_level)
     file_handler.setFormatter(file_formatter)
 
-    console_handler = logging.StreamHandler(sys.stdout)
+    # stdout занят данными (get, машинный вывод list) -> консольный лог в stderr
+    console_handler = logging.StreamHandler(console_stream or sys.stdout)
     console_handler.setLevel(log_level)
     console_handler.setFormatter(console_formatter)
 
     logger.addHandler(file_handler)
     logger.addHandler(console_handler)
 
-    logger.info(f"Logger initialized. Level: {log_level_name}, File: {log_file}")
+    logger.debug(f"Logger initialized. Level: {log_level_name}, File: {log_file}")
     return logger
@@ -2,10 +2,58 @@
 # -*- coding: utf-8 -*-
 
 import json
+import re
 import sqlite3
+import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Sequence, Tuple
+
+# Версия схемы в PRAGMA user_version: при совпадении DDL не выполняется,
+# открытие хранилища стоит одного чтения заголовка БД.
+SCHEMA_VERSION = 6
+
+ENTRY_FIELDS = (
+    "id",
+    "file_path",
+    "hash",
+    "metadata",
+    "added",
+    "verified",
+    "last_checked",
+    "hash_algo",
+)
+_SELECT_ENTRY = f"SELECT {', '.join(ENTRY_FIELDS)} FROM books"
+
+# Ключи metadata, вынесенные в генерируемые колонки meta_<key> с индексом
+DEFAULT_PROMOTED_KEYS = ("title", "author", "size_bytes", "original_filename")
+FILTER_ALIASES = {"size": "size_bytes"}
+_COMPARATORS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+_KEY_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def make_cursor(added: str, entry_id: int) -> str:
+    """Keyset cursor of a row: ``<added>,<id>``."""
+    return f"{added},{entry_id}"
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _check_key(key: str) -> str:
+    # ключ подставляется в SQL как идентификатор и JSON-путь
+    if not _KEY_RE.match(key):
+        raise ValueError(f"Invalid metadata key: {key!r}")
+    return key
+
+
+def parse_cursor(cursor: str) -> Tuple[str, int]:
+    added, sep, entry_id = cursor.rpartition(",")
+    if not sep or not added or not entry_id.isdigit():
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return added, int(entry_id)
 
 
 class MetadataStore:
@@ -15,11 +63,40 @@ class MetadataStore:
     Схема:
       id, file_path, hash, metadata (JSON),
       added, verified, last_checked
+
+    Ключи metadata из ``promoted_keys`` доступны как виртуальные колонки
+    meta_<key> (json_extract) с индексами; теги — в таблице book_tags,
+    которую поддерживают триггеры. Фильтры ``query()`` выполняет SQLite.
+
+    Таблица replication: состояние репликации объекта (hash) на remote.
+    Таблица data_keys: обёрнутые мастер-ключом ключи данных (envelope).
+    Таблица store_meta: служебные значения (например, соль KDF).
+
+    ``writers`` — сколько писателей хранилище выдерживает параллельно
+    (см. ``core.sharding.ShardedMetadataStore``).
     """
 
-    def __init__(self, db_path: str = "./data/metadata.db", logger=None):
+    writers = 1
+
+    def __init__(
+        self,
+        db_path: str = "./data/metadata.db",
+        logger=None,
+        promoted_keys: Optional[Iterable[str]] = None,
+        id_stride: int = 1,
+        id_offset: int = 0,
+    ):
         self.db_path = Path(db_path)
         self.logger = logger
+        # шард i из N выдаёт id ≡ i (mod N): id однозначно указывает на шард
+        self.id_stride = max(1, id_stride)
+        self.id_offset = id_offset
+        self._id_floor: Optional[int] = None
+        self.promoted_keys = tuple(
+            DEFAULT_PROMOTED_KEYS if promoted_keys is None else promoted_keys
+        )
+        for key in self.promoted_keys:
+            _check_key(key)
         self._init_db()
 
     # -------------------------
@@ -31,6 +108,14 @@ class MetadataStore:
         return conn
 
     def _init_db(self) -> None:
+        if self.db_path.exists():
+            conn = self._get_conn()
+            try:
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                    self._promote_keys(conn)
+                    return
+            finally:
+                conn.close()
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         conn = self._get_conn()
         try:
@@ -43,16 +128,180 @@ class MetadataStore:
                     metadata TEXT NOT NULL,
                     added TEXT NOT NULL,
                     verified INTEGER DEFAULT 1,
-                    last_checked TEXT
+                    last_checked TEXT,
+                    hash_algo TEXT NOT NULL DEFAULT 'sha256'
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_books_hash ON books (hash)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_books_added_id ON books (added, id)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS replication (
+                    hash TEXT NOT NULL,
+                    remote TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    updated TEXT NOT NULL,
+                    error TEXT,
+                    PRIMARY KEY (hash, remote)
                 )
                 """
             )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS data_keys (
+                    entry_id INTEGER PRIMARY KEY,
+                    key_id TEXT NOT NULL,
+                    wrapped BLOB NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_data_keys_key_id ON data_keys (key_id)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS store_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS book_tags (
+                    tag TEXT NOT NULL,
+                    entry_id INTEGER NOT NULL,
+                    PRIMARY KEY (tag, entry_id)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_book_tags_entry ON book_tags (entry_id)"
+            )
+            insert_tags = """
+                INSERT OR IGNORE INTO book_tags (tag, entry_id)
+                SELECT value, NEW.id FROM json_each(NEW.metadata, '$.tags')
+                WHERE type = 'text';
+            """
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS books_tags_insert
+                AFTER INSERT ON books BEGIN {insert_tags} END
+                """
+            )
+            conn.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS books_tags_update
+                AFTER UPDATE OF metadata ON books BEGIN
+                    DELETE FROM book_tags WHERE entry_id = OLD.id;
+                    {insert_tags}
+                END
+                """
+            )
+            conn.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS books_tags_delete
+                AFTER DELETE ON books BEGIN
+                    DELETE FROM book_tags WHERE entry_id = OLD.id;
+                END
+                """
+            )
+            # перенос тегов существующих записей (миграция со схемы < 3)
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO book_tags (tag, entry_id)
+                SELECT j.value, b.id FROM books b, json_each(b.metadata, '$.tags') j
+                WHERE j.type = 'text'
+                """
+            )
+            # результаты анализа по хешу содержимого и очередь на анализ (схема 5)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analysis (
+                    hash TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    analyzer TEXT NOT NULL,
+                    analyzed TEXT NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analysis_queue (
+                    hash TEXT PRIMARY KEY,
+                    queued TEXT NOT NULL,
+                    not_before TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analysis_queue_queued "
+                "ON analysis_queue (queued)"
+            )
+            # MinHash-подписи и LSH-корзины по хешу содержимого (схема 6)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS minhash (
+                    hash TEXT PRIMARY KEY,
+                    signature BLOB NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS lsh_bands (
+                    band INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    PRIMARY KEY (band, bucket, hash)
+                ) WITHOUT ROWID
+                """
+            )
+            # алгоритм хеша записи (схема < 4: все записи — sha256)
+            columns = {row[1] for row in conn.execute("PRAGMA table_xinfo(books)")}
+            if "hash_algo" not in columns:
+                conn.execute(
+                    "ALTER TABLE books ADD COLUMN "
+                    "hash_algo TEXT NOT NULL DEFAULT 'sha256'"
+                )
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             conn.commit()
+            self._promote_keys(conn)
             if self.logger:
                 self.logger.debug("Metadata DB initialized")
         finally:
             conn.close()
 
+    def _promote_keys(self, conn: sqlite3.Connection) -> None:
+        """Adds a generated column and an index for each new promoted key.
+
+        Columns of keys later removed from the config are left in place.
+        """
+        existing = {row[1] for row in conn.execute("PRAGMA table_xinfo(books)")}
+        missing = [k for k in self.promoted_keys if f"meta_{k}" not in existing]
+        for key in missing:
+            try:
+                conn.execute(
+                    f"ALTER TABLE books ADD COLUMN meta_{key} GENERATED ALWAYS AS "
+                    f"(json_extract(metadata, '$.{key}')) VIRTUAL"
+                )
+            except sqlite3.OperationalError as exc:
+                # другой процесс успел добавить колонку первым
+                if "duplicate column" not in str(exc):
+                    raise
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_books_meta_{key} ON books (meta_{key})"
+            )
+            if self.logger:
+                self.logger.debug(f"Promoted metadata key: {key}")
+        if missing:
+            conn.commit()
+
     # -------------------------
     # Create
     # -------------------------
@@ -61,28 +310,118 @@ class MetadataStore:
         file_path: str,
         file_hash: str,
         metadata: Dict[str, Any],
+        data_key: Optional[Tuple[str, bytes]] = None,
+        hash_algo: str = "sha256",
+        enqueue_analysis: bool = False,
+        minhash: Optional[Tuple[bytes, Sequence[int]]] = None,
     ) -> int:
+        """Inserts an entry; ``data_key`` = (key_id, wrapped) is stored atomically.
+
+        ``hash_algo`` records how ``file_hash`` was computed, so ``verify``
+        re-hashes with the same algorithm after ``security.hash_algo`` changes.
+        With ``enqueue_analysis`` the content is queued for analysis in the
+        same transaction, unless a result for ``file_hash`` is already cached.
+        ``minhash`` = (signature, band buckets) is indexed in the same
+        transaction too (see ``core.neardup``).
+        """
         metadata_json = json.dumps(metadata, ensure_ascii=False)
         now_iso = datetime.now(timezone.utc).isoformat()
 
         conn = self._get_conn()
         try:
+            entry_id = None
+            if self.id_stride > 1:
+                conn.execute("BEGIN IMMEDIATE")
+                entry_id = self._next_id(conn)
             cur = conn.execute(
                 """
                 INSERT INTO books
-                (file_path, hash, metadata, added, verified, last_checked)
-                VALUES (?, ?, ?, ?, 1, ?)
+                (id, file_path, hash, metadata, added, verified, last_checked,
+                 hash_algo)
+                VALUES (?, ?, ?, ?, ?, 1, ?, ?)
                 """,
-                (file_path, file_hash, metadata_json, now_iso, now_iso),
+                (
+                    entry_id,
+                    file_path,
+                    file_hash,
+                    metadata_json,
+                    now_iso,
+                    now_iso,
+                    hash_algo,
+                ),
             )
-            conn.commit()
             entry_id = cur.lastrowid
+            if data_key:
+                conn.execute(
+                    "INSERT INTO data_keys (entry_id, key_id, wrapped) VALUES (?, ?, ?)",
+                    (entry_id, data_key[0], data_key[1]),
+                )
+            if enqueue_analysis:
+                self._enqueue_analysis(conn, [file_hash], now_iso)
+            if minhash is not None:
+                self._put_minhashes(conn, [(file_hash, minhash[0], minhash[1])])
+            conn.commit()
             if self.logger:
                 self.logger.info(f"Added entry ID {entry_id} -> {file_path}")
             return entry_id
         finally:
             conn.close()
 
+    @contextmanager
+    def bulk_load(self) -> Iterator[sqlite3.Connection]:
+        """Connection for loading many rows in one transaction.
+
+        Secondary indexes and the tag triggers are dropped first and rebuilt
+        once at the end (``book_tags`` is filled by a single INSERT ... SELECT);
+        the journal is kept in memory and fsync is off. On error the
+        transaction is rolled back.
+        """
+        conn = sqlite3.connect(str(self.db_path), isolation_level=None)
+        try:
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA journal_mode = MEMORY")
+            saved = conn.execute(
+                """
+                SELECT type, name, sql FROM sqlite_master
+                WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+                  AND tbl_name IN ('books', 'data_keys', 'book_tags')
+                ORDER BY type
+                """
+            ).fetchall()
+            conn.execute("BEGIN")
+            try:
+                for kind, name, _ in saved:
+                    conn.execute(f"DROP {kind.upper()} {name}")
+                yield conn
+                for _, _, sql in saved:  # сначала индексы, потом триггеры
+                    conn.execute(sql)
+                conn.execute(
+                    """
+                    INSERT OR IGNORE INTO book_tags (tag, entry_id)
+                    SELECT j.value, b.id FROM books b, json_each(b.metadata, '$.tags') j
+                    WHERE j.type = 'text'
+                    """
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("ANALYZE")
+        finally:
+            conn.close()
+
+    def _next_id(self, conn: sqlite3.Connection) -> int:
+        # вызывается внутри BEGIN IMMEDIATE: MAX(id) не изменится до COMMIT
+        if self._id_floor is None:
+            row = conn.execute(
+                "SELECT value FROM store_meta WHERE key = 'id_floor'"
+            ).fetchone()
+            self._id_floor = int(row[0]) if row else 0
+        last = conn.execute("SELECT MAX(id) FROM books").fetchone()[0] or 0
+        base = max(last, self._id_floor)
+        next_id = base + (self.id_offset - base) % self.id_stride
+        return next_id if next_id > base else next_id + self.id_stride
+
     # -------------------------
     # Read
     # -------------------------
@@ -95,7 +434,7 @@ class MetadataStore:
         conn = self._get_conn()
         try:
             row = conn.execute(
-                "SELECT * FROM books WHERE file_path = ?",
+                f"{_SELECT_ENTRY} WHERE file_path = ?",
                 (file_path,),
             ).fetchone()
             return self._row_to_entry(row) if row else None
@@ -106,7 +445,7 @@ class MetadataStore:
         conn = self._get_conn()
         try:
             row = conn.execute(
-                "SELECT * FROM books WHERE hash = ?",
+                f"{_SELECT_ENTRY} WHERE hash = ?",
                 (file_hash,),
             ).fetchone()
             return self._row_to_entry(row) if row else None
@@ -117,7 +456,7 @@ class MetadataStore:
         conn = self._get_conn()
         try:
             row = conn.execute(
-                "SELECT * FROM books WHERE id = ?",
+                f"{_SELECT_ENTRY} WHERE id = ?",
                 (entry_id,),
             ).fetchone()
             return self._row_to_entry(row) if row else None
@@ -145,16 +484,739 @@ class MetadataStore:
         finally:
             conn.close()
 
+    # -------------------------
+    # Delete
+    # -------------------------
+    def delete_entries(self, entry_ids: Iterable[int]) -> int:
+        """Deletes entries and their data keys; returns rows deleted."""
+        ids = list(entry_ids)
+        deleted = 0
+        conn = self._get_conn()
+        try:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                marks = ", ".join("?" * len(chunk))
+                conn.execute(
+                    f"DELETE FROM data_keys WHERE entry_id IN ({marks})", chunk
+                )
+                deleted += conn.execute(
+                    f"DELETE FROM books WHERE id IN ({marks})", chunk
+                ).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return deleted
+
     # -------------------------
     # List
     # -------------------------
     def list_entries(self, limit: int = 100) -> List[Dict[str, Any]]:
+        return list(self.iter_entries(limit=limit))
+
+    def iter_entries(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        after: Optional[str] = None,
+        order: str = "desc",
+        limit: Optional[int] = None,
+        batch_size: int = 1000,
+        decode_metadata: bool = True,
+        with_cursor: bool = False,
+    ) -> Iterator[Any]:
+        """Streams entries ordered by (added, id) with keyset pagination.
+
+        Every page is a separate indexed query that resumes after the last
+        row seen, so memory stays constant and no read transaction is held
+        across the whole scan.
+
+        Args:
+            fields (Iterable[str], optional): Columns to return (default: all
+                of ``ENTRY_FIELDS``). ``metadata`` is only read if requested.
+            after (str, optional): Cursor (``make_cursor``) to resume after.
+            order (str): ``"desc"`` (newest first) or ``"asc"``.
+            limit (int, optional): Maximum rows to yield.
+            batch_size (int): Rows fetched per query.
+            decode_metadata (bool): ``json.loads`` the metadata column; when
+                False it is yielded as the stored JSON text.
+            with_cursor (bool): Yield ``(cursor, entry)`` pairs.
+
+        Yields:
+            dict: One entry per row with the requested fields.
+        """
+        return self.query(
+            fields=fields,
+            after=after,
+            order=order,
+            limit=limit,
+            batch_size=batch_size,
+            decode_metadata=decode_metadata,
+            with_cursor=with_cursor,
+        )
+
+    def query(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        after: Optional[str] = None,
+        order: str = "desc",
+        limit: Optional[int] = None,
+        batch_size: int = 1000,
+        decode_metadata: bool = True,
+        with_cursor: bool = False,
+        **filters: Any,
+    ) -> Iterator[Any]:
+        """``iter_entries`` with predicates evaluated by SQLite.
+
+        Filters (``None`` values are ignored):
+
+        * ``<key>=value``, ``<key>_gt/_gte/_lt/_lte=value`` on a metadata key
+          (``size`` is an alias of ``size_bytes``); promoted keys use their
+          index, other keys fall back to ``json_extract``;
+        * ``tag="x"`` or ``tag=["x", "y"]`` (all must match);
+        * ``hash``, ``verified``, ``added_after``, ``added_before``.
+
+        Example::
+
+            store.query(author="Doe", size_gt=10_000_000, tag="physics")
+        """
+        fields = list(fields or ENTRY_FIELDS)
+        unknown = set(fields) - set(ENTRY_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Unknown order: {order}")
+        where, params = self._where(filters)
+        key = parse_cursor(after) if after else None
+        # проверки выше выполняются сразу, а не при первом next()
+        return self._iter_entries(
+            fields,
+            where,
+            params,
+            key,
+            order,
+            limit,
+            batch_size,
+            decode_metadata,
+            with_cursor,
+        )
+
+    def count(self, **filters: Any) -> int:
+        """Number of entries matching ``query()`` filters."""
+        where, params = self._where(filters)
+        sql = "SELECT COUNT(*) FROM books" + (f" WHERE {where}" if where else "")
+        conn = self._get_conn()
+        try:
+            return conn.execute(sql, params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def _meta_column(self, key: str) -> str:
+        _check_key(key)
+        if key in self.promoted_keys:
+            return f"meta_{key}"
+        return f"json_extract(metadata, '$.{key}')"
+
+    def _where(self, filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name == "tag":
+                for tag in [value] if isinstance(value, str) else value:
+                    clauses.append(
+                        "id IN (SELECT entry_id FROM book_tags WHERE tag = ?)"
+                    )
+                    params.append(tag)
+                continue
+            if name == "hash":
+                clauses.append("hash = ?")
+            elif name == "verified":
+                clauses.append("verified = ?")
+                value = 1 if value else 0
+            elif name == "added_after":
+                clauses.append("added > ?")
+            elif name == "added_before":
+                clauses.append("added < ?")
+            else:
+                key, _, suffix = name.rpartition("_")
+                if key and suffix in _COMPARATORS:
+                    op = _COMPARATORS[suffix]
+                else:
+                    key, op = name, "="
+                key = FILTER_ALIASES.get(key, key)
+                clauses.append(f"{self._meta_column(key)} {op} ?")
+            params.append(value)
+        return " AND ".join(clauses), params
+
+    def _iter_entries(
+        self,
+        fields: List[str],
+        where: str,
+        params: List[Any],
+        key: Optional[Tuple[str, int]],
+        order: str,
+        limit: Optional[int],
+        batch_size: int,
+        decode_metadata: bool,
+        with_cursor: bool,
+    ) -> Iterator[Any]:
+        # added и id нужны для курсора, даже если их не запрашивали
+        columns = ["added", "id"] + [f for f in fields if f not in ("added", "id")]
+        decode = decode_metadata and "metadata" in fields
+        op = "<" if order == "desc" else ">"
+        select = f"SELECT {', '.join(columns)} FROM books"
+        tail = f"ORDER BY added {order}, id {order} LIMIT ?"
+        filtered = f"({where}) AND " if where else ""
+        sql_first = f"{select} {'WHERE ' + where if where else ''} {tail}"
+        sql_next = f"{select} WHERE {filtered}(added, id) {op} (?, ?) {tail}"
+        remaining = limit
+
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            while remaining is None or remaining > 0:
+                page = batch_size if remaining is None else min(batch_size, remaining)
+                if key is None:
+                    rows = conn.execute(sql_first, (*params, page)).fetchall()
+                else:
+                    rows = conn.execute(sql_next, (*params, *key, page)).fetchall()
+                for row in rows:
+                    entry = dict(zip(columns, row))
+                    if decode:
+                        entry["metadata"] = json.loads(entry["metadata"])
+                    out = {f: entry[f] for f in fields}
+                    yield (make_cursor(row[0], row[1]), out) if with_cursor else out
+                if len(rows) < page:
+                    break
+                key = (rows[-1][0], rows[-1][1])
+                if remaining is not None:
+                    remaining -= len(rows)
+        finally:
+            conn.close()
+
+    def max_id(self) -> int:
+        """Highest entry id (0 for an empty catalog); one primary-key probe."""
+        conn = self._get_conn()
+        try:
+            return conn.execute("SELECT MAX(id) FROM books").fetchone()[0] or 0
+        finally:
+            conn.close()
+
+    def iter_hashes(self, after_id: int = 0) -> Iterator[Tuple[int, str]]:
+        """Yields (id, hash) for entries with ``id > after_id`` in id order."""
+        conn = self._get_conn()
+        try:
+            cur = conn.execute(
+                "SELECT id, hash FROM books WHERE id > ? ORDER BY id", (after_id,)
+            )
+            for row in cur:
+                yield row[0], row[1]
+        finally:
+            conn.close()
+
+    def iter_paths(
+        self, start: Optional[str] = None, stop: Optional[str] = None
+    ) -> Iterator[Tuple[str, int]]:
+        """Yields (file_path, id) with ``start <= file_path < stop``, path-sorted.
+
+        Paths compare as in Python (SQLite BINARY collation on UTF-8 gives
+        the same order), so the stream can be merge-joined with a sorted walk.
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("file_path >= ?")
+            params.append(start)
+        if stop is not None:
+            clauses.append("file_path < ?")
+            params.append(stop)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = self._get_conn()
+        try:
+            cur = conn.execute(
+                f"SELECT file_path, id FROM books {where} ORDER BY file_path", params
+            )
+            for row in cur:
+                yield row[0], row[1]
+        finally:
+            conn.close()
+
+    def search(self, text: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Substring search over metadata (title, author, tags...) and path."""
+        escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
         conn = self._get_conn()
         try:
             rows = conn.execute(
-                "SELECT * FROM books ORDER BY added DESC LIMIT ?",
-                (limit,),
+                f"""
+                {_SELECT_ENTRY}
+                WHERE metadata LIKE ? ESCAPE '\\' OR file_path LIKE ? ESCAPE '\\'
+                ORDER BY added DESC LIMIT ?
+                """,
+                (pattern, pattern, limit),
             ).fetchall()
             return [self._row_to_entry(r) for r in rows]
         finally:
             conn.close()
+
+    # -------------------------
+    # Replication
+    # -------------------------
+    def iter_replication_candidates(
+        self, remote: str, page_size: int = 1000
+    ) -> Iterator[Tuple[str, str, Optional[str]]]:
+        """Yields (hash, file_path, state) for every distinct hash, sorted by hash.
+
+        Rows are read in keyset pages (``hash > last``) and every page's
+        connection is closed before its rows are yielded, so the caller may
+        write replication states while iterating.
+        """
+        after = ""
+        while True:
+            conn = self._get_conn()
+            try:
+                rows = conn.execute(
+                    """
+                    SELECT b.hash, MIN(b.file_path), r.state
+                    FROM books b
+                    LEFT JOIN replication r ON r.hash = b.hash AND r.remote = ?
+                    WHERE b.hash > ?
+                    GROUP BY b.hash
+                    ORDER BY b.hash LIMIT ?
+                    """,
+                    (remote, after, page_size),
+                ).fetchall()
+            finally:
+                conn.close()
+            for row in rows:
+                yield row[0], row[1], row[2]
+            if len(rows) < page_size:
+                return
+            after = rows[-1][0]
+
+    def set_replication_states(
+        self,
+        remote: str,
+        states: Iterable[Tuple[str, str, Optional[str]]],
+    ) -> None:
+        """Upserts (hash, state, error) records for ``remote`` in one transaction."""
+        now_iso = datetime.now(timezone.utc).isoformat()
+        conn = self._get_conn()
+        try:
+            conn.executemany(
+                """
+                INSERT INTO replication (hash, remote, state, updated, error)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (hash, remote) DO UPDATE SET
+                    state = excluded.state,
+                    updated = excluded.updated,
+                    error = excluded.error
+                """,
+                ((h, remote, state, now_iso, error) for h, state, error in states),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_replication_state(self, file_hash: str, remote: str) -> Optional[str]:
+        conn = self._get_conn()
+        try:
+            row = conn.execute(
+                "SELECT state FROM replication WHERE hash = ? AND remote = ?",
+                (file_hash, remote),
+            ).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def replication_summary(self, remote: str) -> Dict[str, int]:
+        conn = self._get_conn()
+        try:
+            rows = conn.execute(
+                "SELECT state, COUNT(*) FROM replication WHERE remote = ? GROUP BY state",
+                (remote,),
+            ).fetchall()
+            return {state: count for state, count in rows}
+        finally:
+            conn.close()
+
+    # -------------------------
+    # Content analysis (cache + queue, keyed by content hash)
+    # -------------------------
+    @staticmethod
+    def _enqueue_analysis(
+        conn: sqlite3.Connection, hashes: Iterable[str], now_iso: str
+    ) -> int:
+        cur = conn.executemany(
+            """
+            INSERT OR IGNORE INTO analysis_queue (hash, queued)
+            SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM analysis WHERE hash = ?)
+            """,
+            ((h, now_iso, h) for h in hashes),
+        )
+        return cur.rowcount
+
+    def enqueue_analysis(self, hashes: Iterable[str]) -> int:
+        """Queues content hashes that have no cached result; returns rows added."""
+        now_iso = datetime.now(timezone.utc).isoformat()
+        conn = self._get_conn()
+        try:
+            added = self._enqueue_analysis(conn, hashes, now_iso)
+            conn.commit()
+            return added
+        finally:
+            conn.close()
+
+    def enqueue_unanalyzed(self) -> int:
+        """Queues every catalogued hash without a cached result (backfill)."""
+        now_iso = datetime.now(timezone.utc).isoformat()
+        conn = self._get_conn()
+        try:
+            cur = conn.execute(
+                """
+                INSERT OR IGNORE INTO analysis_queue (hash, queued)
+                SELECT DISTINCT b.hash, ? FROM books b
+                WHERE NOT EXISTS (SELECT 1 FROM analysis a WHERE a.hash = b.hash)
+                """,
+                (now_iso,),
+            )
+            conn.commit()
+            return cur.rowcount
+        finally:
+            conn.close()
+
+    def claim_analysis(
+        self, limit: int, lease: float = 300, max_attempts: int = 3
+    ) -> List[str]:
+        """Leases up to ``limit`` queued hashes for analysis.
+
+        ``not_before`` holds both the lease (a crashed worker's batch is
+        picked up again after ``lease`` seconds) and the retry backoff set
+        by ``fail_analysis``; hashes that failed ``max_attempts`` times are
+        left in the queue with their last error.
+        """
+        now = time.time()
+        conn = self._get_conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                """
+                SELECT hash FROM analysis_queue
+                WHERE attempts < ? AND (not_before IS NULL OR not_before <= ?)
+                ORDER BY queued LIMIT ?
+                """,
+                (max_attempts, _iso(now), limit),
+            ).fetchall()
+            hashes = [row[0] for row in rows]
+            conn.executemany(
+                "UPDATE analysis_queue SET not_before = ? WHERE hash = ?",
+                ((_iso(now + lease), h) for h in hashes),
+            )
+            conn.commit()
+            return hashes
+        finally:
+            conn.close()
+
+    def put_analysis(self, results: Iterable[Tuple[str, Dict[str, Any], str]]) -> None:
+        """Stores (hash, result, analyzer) rows and removes them from the queue."""
+        now_iso = datetime.now(timezone.utc).isoformat()
+        rows = [
+            (h, json.dumps(result, ensure_ascii=False), analyzer, now_iso)
+            for h, result, analyzer in results
+        ]
+        conn = self._get_conn()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO analysis (hash, result, analyzer, analyzed) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.executemany(
+                "DELETE FROM analysis_queue WHERE hash = ?", ((r[0],) for r in rows)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def fail_analysis(
+        self, failures: Iterable[Tuple[str, str]], retry_delay: float = 60
+    ) -> None:
+        """Records failed (hash, error) rows; retry after ``retry_delay`` seconds."""
+        not_before = _iso(time.time() + retry_delay)
+        conn = self._get_conn()
+        try:
+            conn.executemany(
+                """
+                UPDATE analysis_queue
+                SET not_before = ?, attempts = attempts + 1, error = ?
+                WHERE hash = ?
+                """,
+                ((not_before, error, h) for h, error in failures),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_analysis(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Cached analysis of ``file_hash`` as {result, analyzer, analyzed}, or None."""
+        conn = self._get_conn()
+        try:
+            row = conn.execute(
+                "SELECT result, analyzer, analyzed FROM analysis WHERE hash = ?",
+                (file_hash,),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {
+            "result": json.loads(row[0]),
+            "analyzer": row[1],
+            "analyzed": row[2],
+        }
+
+    def analysis_summary(self, max_attempts: int = 3) -> Dict[str, int]:
+        """Counts of cached results, queued hashes and given-up hashes."""
+        conn = self._get_conn()
+        try:
+            done = conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+            queued, failed = conn.execute(
+                """
+                SELECT COALESCE(SUM(attempts < ?), 0), COALESCE(SUM(attempts >= ?), 0)
+                FROM analysis_queue
+                """,
+                (max_attempts, max_attempts),
+            ).fetchone()
+            return {"analyzed": done, "queued": queued, "failed": failed}
+        finally:
+            conn.close()
+
+    # -------------------------
+    # Near-duplicate index (MinHash / LSH)
+    # -------------------------
+    @staticmethod
+    def _put_minhashes(
+        conn: sqlite3.Connection, rows: Iterable[Tuple[str, bytes, Sequence[int]]]
+    ) -> None:
+        for file_hash, signature, buckets in rows:
+            conn.execute(
+                "INSERT OR REPLACE INTO minhash (hash, signature) VALUES (?, ?)",
+                (file_hash, signature),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO lsh_bands (band, bucket, hash) VALUES (?, ?, ?)",
+                ((band, bucket, file_hash) for band, bucket in enumerate(buckets)),
+            )
+
+    def put_minhashes(self, rows: Iterable[Tuple[str, bytes, Sequence[int]]]) -> None:
+        """Indexes (hash, signature, band buckets) rows in one transaction."""
+        conn = self._get_conn()
+        try:
+            self._put_minhashes(conn, rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def lsh_candidates(self, buckets: Sequence[int]) -> List[Tuple[str, bytes]]:
+        """(hash, signature) of catalogued content sharing any band bucket.
+
+        One primary-key lookup per band; content whose entries were all
+        deleted is skipped.
+        """
+        if not buckets:
+            return []
+        values = ", ".join("(?, ?)" for _ in buckets)
+        params = [v for band, bucket in enumerate(buckets) for v in (band, bucket)]
+        conn = self._get_conn()
+        try:
+            rows = conn.execute(
+                f"""
+                WITH q (band, bucket) AS (VALUES {values})
+                SELECT DISTINCT m.hash, m.signature FROM q
+                JOIN lsh_bands l ON l.band = q.band AND l.bucket = q.bucket
+                JOIN minhash m ON m.hash = l.hash
+                WHERE EXISTS (SELECT 1 FROM books b WHERE b.hash = l.hash)
+                """,
+                params,
+            ).fetchall()
+            return [(row[0], row[1]) for row in rows]
+        finally:
+            conn.close()
+
+    def get_minhashes(self, hashes: Iterable[str]) -> Dict[str, bytes]:
+        """{hash: signature} for the indexed hashes among ``hashes``."""
+        hashes = list(hashes)
+        found: Dict[str, bytes] = {}
+        conn = self._get_conn()
+        try:
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i : i + 500]
+                rows = conn.execute(
+                    "SELECT hash, signature FROM minhash "
+                    f"WHERE hash IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+                found.update((r[0], r[1]) for r in rows)
+            return found
+        finally:
+            conn.close()
+
+    def iter_lsh_buckets(self) -> Iterator[Tuple[int, int, str]]:
+        """Yields (band, bucket, hash) of catalogued content in key order."""
+        conn = self._get_conn()
+        try:
+            cur = conn.execute(
+                """
+                SELECT l.band, l.bucket, l.hash FROM lsh_bands l
+                WHERE EXISTS (SELECT 1 FROM books b WHERE b.hash = l.hash)
+                ORDER BY l.band, l.bucket, l.hash
+                """
+            )
+            for row in cur:
+                yield row[0], row[1], row[2]
+        finally:
+            conn.close()
+
+    def unindexed_minhashes(
+        self, after_id: int = 0, limit: int = 1000
+    ) -> List[Tuple[int, str]]:
+        """Up to ``limit`` (id, hash) with ``id > after_id`` and no signature."""
+        conn = self._get_conn()
+        try:
+            rows = conn.execute(
+                """
+                SELECT b.id, b.hash FROM books b
+                WHERE b.id > ?
+                  AND NOT EXISTS (SELECT 1 FROM minhash m WHERE m.hash = b.hash)
+                ORDER BY b.id LIMIT ?
+                """,
+                (after_id, limit),
+            ).fetchall()
+            return [(row[0], row[1]) for row in rows]
+        finally:
+            conn.close()
+
+    # -------------------------
+    # Data keys (envelope encryption)
+    # -------------------------
+    def get_data_key(self, entry_id: int) -> Optional[Tuple[str, bytes]]:
+        conn = self._get_conn()
+        try:
+            row = conn.execute(
+                "SELECT key_id, wrapped FROM data_keys WHERE entry_id = ?",
+                (entry_id,),
+            ).fetchone()
+            return (row[0], row[1]) if row else None
+        finally:
+            conn.close()
+
+    def get_data_keys(self, entry_ids: Iterable[int]) -> Dict[int, Tuple[str, bytes]]:
+        """Batch ``get_data_key``: {entry_id: (key_id, wrapped)} for keyed ids."""
+        ids = list(entry_ids)
+        found: Dict[int, Tuple[str, bytes]] = {}
+        conn = self._get_conn()
+        try:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i : i + 500]
+                rows = conn.execute(
+                    "SELECT entry_id, key_id, wrapped FROM data_keys "
+                    f"WHERE entry_id IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+                found.update((r[0], (r[1], r[2])) for r in rows)
+            return found
+        finally:
+            conn.close()
+
+    def list_data_keys(self, key_id: str, limit: int = 1000) -> List[Tuple[int, bytes]]:
+        """Returns up to ``limit`` (entry_id, wrapped) wrapped by master ``key_id``."""
+        conn = self._get_conn()
+        try:
+            rows = conn.execute(
+                """
+                SELECT entry_id, wrapped FROM data_keys
+                WHERE key_id = ? ORDER BY entry_id LIMIT ?
+                """,
+                (key_id, limit),
+            ).fetchall()
+            return [(r[0], r[1]) for r in rows]
+        finally:
+            conn.close()
+
+    def list_unkeyed_encrypted_entries(self, limit: int = 1000) -> List[int]:
+        """Returns ids of ``.enc`` entries encrypted directly with the master key."""
+        conn = self._get_conn()
+        try:
+            rows = conn.execute(
+                """
+                SELECT b.id FROM books b
+                LEFT JOIN data_keys k ON k.entry_id = b.id
+                WHERE k.entry_id IS NULL AND b.file_path LIKE '%.enc'
+                ORDER BY b.id LIMIT ?
+                """,
+                (limit,),
+            ).fetchall()
+            return [r[0] for r in rows]
+        finally:
+            conn.close()
+
+    def put_data_keys(self, rows: Iterable[Tuple[int, str, bytes]]) -> None:
+        """Upserts (entry_id, key_id, wrapped) rows in one transaction."""
+        conn = self._get_conn()
+        try:
+            conn.executemany(
+                """
+                INSERT INTO data_keys (entry_id, key_id, wrapped) VALUES (?, ?, ?)
+                ON CONFLICT (entry_id) DO UPDATE SET
+                    key_id = excluded.key_id,
+                    wrapped = excluded.wrapped
+                """,
+                rows,
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    # -------------------------
+    # Store meta
+    # -------------------------
+    def list_meta(self) -> Dict[str, str]:
+        conn = self._get_conn()
+        try:
+            return dict(conn.execute("SELECT key, value FROM store_meta").fetchall())
+        finally:
+            conn.close()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        conn = self._get_conn()
+        try:
+            row = conn.execute(
+                "SELECT value FROM store_meta WHERE key = ?", (key,)
+            ).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def set_meta(self, key: str, value: str) -> None:
+        conn = self._get_conn()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)",
+                (key, value),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_or_set_meta(self, key: str, default: str) -> str:
+        """Returns the stored value, persisting ``default`` on first use."""
+        conn = self._get_conn()
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO store_meta (key, value) VALUES (?, ?)",
+                (key, default),
+            )
+            conn.commit()
+            return conn.execute(
+                "SELECT value FROM store_meta WHERE key = ?", (key,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Near-duplicate detection with MinHash signatures and an LSH band index.
+
+The exact dedup check only catches byte-identical content. Here every
+entry gets a MinHash signature over word shingles of its text (the first
+``max_bytes`` decoded as UTF-8, lowercased), so re-exported or re-encoded
+copies that differ in a few bytes still look alike:
+
+* shingles: ``shingle_size`` consecutive words, each hashed to 64 bits;
+* signature: ``num_perm`` values from one-permutation hashing — every
+  shingle hash is routed to one bin, each bin keeps its minimum, empty bins
+  borrow from the next non-empty bin (rotation densification). One hash
+  per shingle instead of ``num_perm``, so large files stay cheap in pure
+  Python;
+* LSH: the signature is cut into ``bands`` bands; each band hashes to a
+  64-bit bucket stored in ``lsh_bands (band, bucket, hash)``. Candidates
+  are the entries sharing at least one bucket — an index lookup per band,
+  independent of catalog size — and are confirmed by comparing
+  signatures (fraction of equal bins estimates Jaccard similarity).
+
+With 128 bins in 32 bands of 4, pairs above ~0.6 similarity collide in
+some band with high probability, so the default threshold of 0.8 loses
+almost nothing to LSH. Signatures are only comparable with the same
+parameters; the store pins them (``MinHasher.params``) on first use.
+"""
+
+import hashlib
+import re
+import struct
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_MAX_BYTES = 256 * 1024
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_EMPTY = (1 << 64) - 1
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class MinHasher:
+    """Computes signatures and LSH band buckets for one parameter set.
+
+    Args:
+        num_perm (int): Signature length (bins).
+        bands (int): LSH bands; must divide ``num_perm``.
+        shingle_size (int): Words per shingle.
+        max_bytes (int): Content prefix that is shingled.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        if num_perm <= 0 or bands <= 0 or num_perm % bands:
+            raise ValueError(f"bands ({bands}) must divide num_perm ({num_perm})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_bytes = max_bytes
+        self._format = f">{num_perm}Q"
+
+    @property
+    def params(self) -> str:
+        """Identifies the parameters that make signatures comparable."""
+        return f"oph/{self.num_perm}/{self.bands}/{self.shingle_size}/{self.max_bytes}"
+
+    def shingles(self, data: bytes) -> Set[int]:
+        """64-bit hashes of word shingles (whole content if it has no words)."""
+        words = _TOKEN.findall(data.decode("utf-8", errors="replace").lower())
+        k = min(self.shingle_size, len(words))
+        if not k:
+            return {_hash64(data)}
+        return {
+            _hash64(" ".join(words[i : i + k]).encode())
+            for i in range(len(words) - k + 1)
+        }
+
+    def signature(self, data: bytes) -> Tuple[int, ...]:
+        """One-permutation MinHash of ``data[:max_bytes]``."""
+        n = self.num_perm
+        bins = [_EMPTY] * n
+        for h in self.shingles(data[: self.max_bytes]):
+            index, value = h % n, h // n
+            if value < bins[index]:
+                bins[index] = value
+        # пустые ячейки берут значение следующей непустой (со сдвигом)
+        if _EMPTY in bins:
+            out = list(bins)
+            for i in range(n):
+                if bins[i] != _EMPTY:
+                    continue
+                for step in range(1, n):
+                    j = (i + step) % n
+                    if bins[j] != _EMPTY:
+                        out[i] = (bins[j] + step * 0x9E3779B97F4A7C15) & _EMPTY
+                        break
+            bins = out
+        return tuple(bins)
+
+    def buckets(self, signature: Sequence[int]) -> List[int]:
+        """Signed 64-bit bucket of each band (fits an SQLite INTEGER)."""
+        r = self.rows
+        return [
+            _hash64(struct.pack(f">{r}Q", *signature[b * r : (b + 1) * r])) - (1 << 63)
+            for b in range(self.bands)
+        ]
+
+    def pack(self, signature: Sequence[int]) -> bytes:
+        return struct.pack(self._format, *signature)
+
+    def unpack(self, blob: bytes) -> Tuple[int, ...]:
+        return struct.unpack(self._format, blob)
+
+    @staticmethod
+    def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+        """Estimated Jaccard similarity: fraction of equal bins."""
+        return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+@dataclass
+class NearDuplicate:
+    """An indexed entry whose estimated similarity passed the threshold."""
+
+    hash: str
+    similarity: float
+
+
+def best_match(
+    hasher: MinHasher,
+    signature: Sequence[int],
+    candidates: Iterable[Tuple[str, bytes]],
+    threshold: float,
+    exclude: Optional[str] = None,
+) -> Optional[NearDuplicate]:
+    """Most similar candidate (hash, packed signature) at or above ``threshold``."""
+    best = None
+    for file_hash, blob in candidates:
+        if file_hash == exclude:
+            continue
+        score = hasher.similarity(signature, hasher.unpack(blob))
+        if score >= threshold and (best is None or score > best.similarity):
+            best = NearDuplicate(file_hash, score)
+    return best
+
+
+class PendingIndex:
+    """In-memory band index for signatures not yet committed to the store.
+
+    Files of one ingest run are checked against each other here, the way
+    ``IngestStages.seen`` catches exact duplicates within a batch.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[int, int], Set[str]] = {}
+        self._entries: Dict[str, Tuple[bytes, List[int]]] = {}
+
+    def candidates(self, buckets: Sequence[int]) -> List[Tuple[str, bytes]]:
+        hashes: Set[str] = set()
+        for band, bucket in enumerate(buckets):
+            hashes |= self._buckets.get((band, bucket), set())
+        return [(h, self._entries[h][0]) for h in hashes]
+
+    def add(self, file_hash: str, blob: bytes, buckets: Sequence[int]) -> None:
+        self._entries[file_hash] = (blob, list(buckets))
+        for band, bucket in enumerate(buckets):
+            self._buckets.setdefault((band, bucket), set()).add(file_hash)
+
+    def discard(self, file_hash: str) -> None:
+        entry = self._entries.pop(file_hash, None)
+        if entry is None:
+            return
+        for band, bucket in enumerate(entry[1]):
+            members = self._buckets.get((band, bucket))
+            if members is not None:
+                members.discard(file_hash)
+                if not members:
+                    del self._buckets[(band, bucket)]
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent: Dict[str, str] = {}
+
+    def find(self, x: str) -> str:
+        parent = self.parent
+        root = parent.setdefault(x, x)
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a: str, b: str) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def cluster(
+    hasher: MinHasher,
+    band_rows: Iterator[Tuple[int, int, str]],
+    signatures,
+    threshold: float,
+) -> List[Tuple[List[str], float]]:
+    """Groups indexed content into near-duplicate clusters.
+
+    Args:
+        hasher (MinHasher): Parameters the index was built with.
+        band_rows (iterator): (band, bucket, hash) sorted by band and bucket,
+            e.g. ``store.iter_lsh_buckets()``; streamed, one bucket at a time.
+        signatures (callable): ``hashes -> {hash: packed signature}``.
+        threshold (float): Minimum estimated similarity of a linked pair.
+
+    Returns:
+        list: (hashes, lowest linked similarity) per cluster of two or more,
+        largest first.
+    """
+    uf = _UnionFind()
+    weakest: Dict[str, float] = {}
+
+    def link(members: List[str]) -> None:
+        # подписи читаем на каждую корзину: память не растёт с каталогом
+        sigs = {h: hasher.unpack(blob) for h, blob in signatures(members).items()}
+        members = [h for h in members if h in sigs]
+        for i, a in enumerate(members):
+            for b in members[i + 1 :]:
+                ra, rb = uf.find(a), uf.find(b)
+                # уже в одном кластере — подписи не сравниваем
+                if ra == rb:
+                    continue
+                score = hasher.similarity(sigs[a], sigs[b])
+                if score >= threshold:
+                    low = min(score, weakest.get(ra, 1.0), weakest.get(rb, 1.0))
+                    uf.union(a, b)
+                    weakest[uf.find(a)] = low
+
+    current, members = None, []
+    for band, bucket, file_hash in band_rows:
+        if (band, bucket) != current:
+            if len(members) > 1:
+                link(members)
+            current, members = (band, bucket), []
+        members.append(file_hash)
+    if len(members) > 1:
+        link(members)
+
+    groups: Dict[str, List[str]] = {}
+    for h in list(uf.parent):
+        groups.setdefault(uf.find(h), []).append(h)
+    clusters = [
+        (sorted(hashes), weakest.get(root, 1.0))
+        for root, hashes in groups.items()
+        if len(hashes) > 1
+    ]
+    clusters.sort(key=lambda c: (-len(c[0]), c[0][0]))
+    return clusters
@@ -8,11 +8,14 @@ import sqlite3
 import sys
 from pathlib import Path
 
-from core.file_handler import calculate_hash, copy_file_with_verify
-from core.ipc import ModuleIPC
-from core.logger import AuditLogger, setup_logger
-from core.metadata_store import MetadataStore
-from core.remote import RemoteStorage
+from core.client import Client
+from core.exceptions import DuplicateEntryError, GlyphError, NearDuplicateError
+from core.export import FORMATS
+from core.logger import setup_logger
+from core.metadata_store import ENTRY_FIELDS
+
+# Модули конкретных подкоманд (ingest, reader, ...) импортируются внутри
+# cmd_*: каждый вызов `glyph` платит только за то, что ему нужно.
 
 # -------------------------------------------------
 # Project root
@@ -43,12 +46,18 @@ def build_parser() -> argparse.ArgumentParser:
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # -------- ADD --------
-    add_parser = subparsers.add_parser("add", help="Add a file")
-    add_parser.add_argument("file", help="Path to file")
+    add_parser = subparsers.add_parser("add", help="Add one or more files")
+    add_parser.add_argument("file", nargs="+", help="Path to file")
     add_parser.add_argument("--title", help="Title")
     add_parser.add_argument("--author", help="Author")
     add_parser.add_argument("--tags", help="Comma-separated tags")
     add_parser.add_argument("--no-verify", action="store_true")
+    add_parser.add_argument(
+        "--workers", type=int, help="Hash/archive concurrency (default: config)"
+    )
+    add_parser.add_argument(
+        "--stats", action="store_true", help="Print per-stage throughput"
+    )
 
     # -------- VERIFY (VERIFY++) --------
     verify_parser = subparsers.add_parser("verify", help="Verify file integrity")
@@ -66,241 +75,490 @@ def build_parser() -> argparse.ArgumentParser:
     )
 
     # -------- LIST --------
-    list_parser = subparsers.add_parser("list", help="List recent entries")
-    list_parser.add_argument("--limit", type=int, default=20)
+    list_parser = subparsers.add_parser("list", help="List or export entries")
+    list_parser.add_argument(
+        "--limit", type=int, help="Max rows (default: 20 for table, all otherwise)"
+    )
+    list_parser.add_argument("--format", choices=FORMATS, default="table")
+    list_parser.add_argument(
+        "--fields", help="Comma-separated columns for ndjson/csv (default: all)"
+    )
+    list_parser.add_argument("--after", help="Resume after this cursor")
+    list_parser.add_argument("--order", choices=("desc", "asc"), default="desc")
+
+    # -------- GET --------
+    get_parser = subparsers.add_parser(
+        "get", help="Write entry content (decrypted) to stdout or a file"
+    )
+    get_parser.add_argument("id", type=int)
+    get_parser.add_argument("--range", help="Byte range A-B (inclusive) or A-")
+    get_parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+
+    # -------- ROTATE-KEY --------
+    rotate_parser = subparsers.add_parser(
+        "rotate-key", help="Rewrap data keys under a new master key"
+    )
+    rotate_parser.add_argument(
+        "--new-key-env",
+        required=True,
+        help="Env var holding the new master key or passphrase",
+    )
+
+    # -------- SYNC --------
+    sync_parser = subparsers.add_parser(
+        "sync", help="Upload objects missing on the remote replica"
+    )
+    sync_parser.add_argument("--workers", type=int, default=8)
+    sync_parser.add_argument("--dry-run", action="store_true")
+
+    # -------- RESHARD --------
+    reshard_parser = subparsers.add_parser(
+        "reshard", help="Redistribute the catalog over N shard files"
+    )
+    reshard_parser.add_argument("--shards", type=int, required=True)
+
+    # -------- FSCK --------
+    fsck_parser = subparsers.add_parser(
+        "fsck", help="Find archive files without entries and entries without files"
+    )
+    fix = fsck_parser.add_mutually_exclusive_group()
+    fix.add_argument(
+        "--quarantine",
+        action="store_true",
+        help="Move orphan files to storage.quarantine_dir, mark missing entries",
+    )
+    fix.add_argument(
+        "--purge",
+        action="store_true",
+        help="Delete orphan files and remove missing entries",
+    )
+    fsck_parser.add_argument(
+        "--grace",
+        type=float,
+        default=3600,
+        help="Ignore orphans modified within this many seconds (default: 3600)",
+    )
+    fsck_parser.add_argument("--workers", type=int, default=8)
+
+    # -------- TRAIN-DICT --------
+    dict_parser = subparsers.add_parser(
+        "train-dict", help="Train a zstd dictionary for small files of one type"
+    )
+    dict_parser.add_argument("--suffix", required=True, help="File suffix, e.g. txt")
+    dict_parser.add_argument("--samples", type=int, default=1000)
+    dict_parser.add_argument("--size", type=int, help="Dictionary size in bytes")
+
+    # -------- WATCH --------
+    watch_parser = subparsers.add_parser(
+        "watch", help="Ingest files as they appear in storage.incoming_dir"
+    )
+    watch_parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Process the files already there, then exit",
+    )
+    watch_parser.add_argument(
+        "--poll", action="store_true", help="Poll instead of using inotify"
+    )
+    watch_parser.add_argument(
+        "--move-to", help="Move processed files here (default: watch.processed_dir)"
+    )
+
+    # -------- ANALYZE --------
+    analyze_parser = subparsers.add_parser(
+        "analyze", help="Run queued content analysis or show a cached result"
+    )
+    analyze_parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Queue entries that were never analyzed first",
+    )
+    analyze_parser.add_argument(
+        "--show", type=int, metavar="ID", help="Print the cached analysis of an entry"
+    )
+
+    # -------- SIMILAR --------
+    similar_parser = subparsers.add_parser(
+        "similar", help="Find entries with similar content"
+    )
+    similar_parser.add_argument(
+        "ids", type=int, nargs="+", metavar="ID", help="Entry IDs"
+    )
+    similar_parser.add_argument(
+        "-k", type=int, default=10, help="Results per entry (default: 10)"
+    )
+
+    # -------- NEAR-DUPS --------
+    near_dups_parser = subparsers.add_parser(
+        "near-dups", help="Report clusters of near-duplicate content"
+    )
+    near_dups_parser.add_argument(
+        "--threshold",
+        type=float,
+        help="Minimum estimated similarity (default: near_dup.threshold)",
+    )
+    near_dups_parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Index entries added before near_dup was enabled first",
+    )
+
+    # -------- CATALOG --------
+    catalog_parser = subparsers.add_parser(
+        "catalog", help="Export or import a columnar catalog snapshot"
+    )
+    catalog_sub = catalog_parser.add_subparsers(dest="catalog_command", required=True)
+    catalog_export = catalog_sub.add_parser("export", help="Write a snapshot")
+    catalog_export.add_argument("-o", "--output", help="Output file (default: stdout)")
+    catalog_import = catalog_sub.add_parser(
+        "import", help="Load a snapshot into an empty catalog"
+    )
+    catalog_import.add_argument("file", help="Snapshot file")
 
     return parser
 
 
 # -------------------------------------------------
-# Main
+# Commands
 # -------------------------------------------------
-def main() -> None:
-    # ---- config ----
-    try:
-        config = load_config()
-    except Exception as exc:  # noqa: BLE001
-        print(f"FATAL: Cannot load config: {exc}")
-        sys.exit(1)
+def cmd_add(client: Client, args, logger) -> int:
+    from core.ingest import IngestItem
+
+    items = (
+        IngestItem(
+            Path(f).expanduser().resolve(),
+            title=args.title,
+            author=args.author,
+            tags=args.tags.split(",") if args.tags else [],
+            verify=not args.no_verify,
+        )
+        for f in args.file
+    )
+    result = client.add_many(
+        items,
+        workers=args.workers,
+        on_added=lambda added: logger.info(f"✅ Entry added with ID {added.entry_id}"),
+    )
 
-    # ---- logging ----
-    logger = setup_logger(config)
-    audit = AuditLogger(Path("logs/audit.jsonl"))
+    for source, stage, exc in result.errors:
+        if isinstance(exc, NearDuplicateError):
+            logger.warning(f"{exc} ({source})")
+        elif isinstance(exc, DuplicateEntryError):
+            logger.warning(f"Duplicate file detected: {source}")
+        elif isinstance(exc, sqlite3.IntegrityError):
+            logger.error(f"Database integrity error: {source}")
+        else:
+            logger.error(f"{stage} failed for {source}: {exc}")
 
-    # ---- metadata store ----
+    if args.stats:
+        for s in result.stats.values():
+            print(
+                f"{s.name}: {s.processed} ok, {s.failed} failed, "
+                f"{s.throughput:.1f}/s, utilization {s.utilization:.0%}"
+            )
+    return 0 if result.ok else 1
+
+
+def cmd_verify(client: Client, args, logger) -> int:
+    result = client.verify(id=args.id, hash=args.hash, path=args.path)
+    if result.error:
+        logger.error(result.error)
+    if result.ok:
+        logger.info("✅ Integrity verified")
+        return 0
+    logger.error("❌ Integrity failed")
+    return 1
+
+
+def cmd_list(client: Client, args, logger) -> int:
+    table = args.format == "table"
+    limit = args.limit if args.limit is not None else (20 if table else None)
+    fields = args.fields.split(",") if args.fields and not table else None
     try:
-        store = MetadataStore(
-            db_path=config["metadata"]["database"],
-            logger=logger,
+        rows = client.iter_entries(
+            fields=fields,
+            after=args.after,
+            order=args.order,
+            limit=limit,
+            decode_metadata=table,
+            with_cursor=True,
         )
-    except Exception as exc:  # noqa: BLE001
-        logger.error(f"Metadata store init failed: {exc}")
-        sys.exit(1)
+    except ValueError as exc:
+        logger.error(str(exc))
+        return 1
+
+    last = [None, 0]  # курсор последней строки, число строк
+
+    def tracked():
+        for cursor, row in rows:
+            last[0] = cursor
+            last[1] += 1
+            yield row
+
+    if table:
+        for row in tracked():
+            status = "✅" if row["verified"] else "❌"
+            title = row["metadata"].get("title", "")
+            print(f"{status} ID={row['id']} {title} ({row['file_path']})")
+    else:
+        from core.export import write_csv, write_ndjson
+
+        if args.format == "ndjson":
+            write_ndjson(tracked(), sys.stdout)
+        else:
+            write_csv(tracked(), sys.stdout, fields or list(ENTRY_FIELDS))
+        sys.stdout.flush()
 
-    # ---- remote storage ----
-    remote = RemoteStorage(config["storage"], logger=logger)
+    if limit is not None and last[1] == limit:
+        print(f"Next cursor: {last[0]}", file=sys.stderr)
+    return 0
 
-    # ---- crypto module (optional) ----
-    crypto_ipc: ModuleIPC | None = None
-    crypto_cfg = config.get("modules", {}).get("crypto", {})
-    if crypto_cfg.get("enabled"):
-        crypto_path = PROJECT_ROOT / crypto_cfg["path"]
-        try:
-            crypto_ipc = ModuleIPC(crypto_path, logger=logger)
-        except Exception as exc:  # noqa: BLE001
-            logger.error(f"Crypto module init failed: {exc}")
-            sys.exit(1)
 
-    # ---- parse args ----
-    parser = build_parser()
-    args = parser.parse_args()
+def cmd_get(client: Client, args, logger) -> int:
+    from core.reader import parse_range
 
-    # =================================================
-    # ADD
-    # =================================================
-    if args.command == "add":
-        file_path = Path(args.file).expanduser().resolve()
-        if not file_path.is_file():
-            logger.error(f"File not found: {file_path}")
-            sys.exit(1)
-
-        logger.info(f"Adding file: {file_path}")
-
-        # ---- hash ----
-        if crypto_ipc:
-            data = file_path.read_bytes()
-            resp = crypto_ipc.call(
-                {
-                    "cmd": "hash",
-                    "data": data.hex(),
-                    "algorithm": config["security"]["hash_algo"],
-                }
-            )
-            if "error" in resp:
-                logger.error(resp["error"])
-                sys.exit(1)
-            file_hash = resp["result"]
-        else:
-            file_hash = calculate_hash(
-                file_path,
-                algorithm=config["security"]["hash_algo"],
-                logger=logger,
-            )
+    try:
+        start, end = parse_range(args.range) if args.range else (0, None)
+    except ValueError as exc:
+        logger.error(str(exc))
+        return 1
+
+    if args.output:
+        with open(args.output, "wb") as dst:
+            written = client.export(args.id, dst, start, end)
+    else:
+        written = client.export(args.id, sys.stdout.buffer, start, end)
+        sys.stdout.buffer.flush()
+    logger.debug(f"Read {written} bytes from entry {args.id}")
+    return 0
+
+
+def cmd_rotate_key(client: Client, args, logger) -> int:
+    new_secret = os.environ.get(args.new_key_env)
+    if not new_secret:
+        logger.error(f"Encryption key env var not set: {args.new_key_env}")
+        return 1
+    old_id, new_id, count = client.rotate_key(new_secret)
+    print(f"Rewrapped {count} data keys: {old_id} -> {new_id}")
+    print(
+        f"Now set {client.enc_cfg['key_env_var']} "
+        f"to the value of {args.new_key_env}"
+    )
+    return 0
 
-        if store.get_entry_by_hash(file_hash):
-            logger.warning("Duplicate file detected")
-            sys.exit(1)
 
-        metadata = {
-            "title": args.title or file_path.stem,
-            "author": args.author or "Unknown",
-            "tags": args.tags.split(",") if args.tags else [],
-            "original_filename": file_path.name,
-            "size_bytes": file_path.stat().st_size,
-        }
+def cmd_sync(client: Client, args, logger) -> int:
+    report = client.sync(workers=args.workers, dry_run=args.dry_run)
+    print(
+        f"remote={report.remote} local={report.local_objects} "
+        f"missing={report.missing} uploaded={report.uploaded} "
+        f"failed={report.failed} bytes={report.bytes_sent}"
+    )
+    return 1 if report.failed else 0
 
-        archive_dir = Path(config["storage"]["archive_dir"])
-        archive_dir.mkdir(parents=True, exist_ok=True)
 
-        archive_path = archive_dir / file_path.name
-        counter = 1
-        while archive_path.exists():
-            archive_path = archive_dir / f"{file_path.stem}_{counter}{file_path.suffix}"
-            counter += 1
+def cmd_reshard(client: Client, args, logger) -> int:
+    if args.shards < 1:
+        logger.error("--shards must be >= 1")
+        return 1
+    copied = client.reshard(args.shards)
+    print(f"Copied {copied} entries into {args.shards} shard(s)")
+    print(f"Now set metadata.shards to {args.shards} in config/settings.json")
+    return 0
 
-        try:
-            copy_file_with_verify(
-                file_path,
-                archive_path,
-                verify=not args.no_verify,
-                logger=logger,
-            )
-        except Exception as exc:  # noqa: BLE001
-            logger.error(f"Copy failed: {exc}")
-            sys.exit(1)
-
-        # ---- encryption (optional) ----
-        enc_cfg = config["security"]["encryption"]
-        if enc_cfg["enabled"] and crypto_ipc:
-            key = os.environ.get(enc_cfg["key_env_var"])
-            if not key:
-                logger.error("Encryption key env var not set")
-                sys.exit(1)
-
-            data = archive_path.read_bytes()
-            resp = crypto_ipc.call(
-                {
-                    "cmd": "encrypt",
-                    "data": data.hex(),
-                    "key": key,
-                    "algorithm": enc_cfg["algorithm"],
-                }
-            )
-            if "error" in resp:
-                logger.error(resp["error"])
-                sys.exit(1)
 
-            encrypted_path = archive_path.with_suffix(archive_path.suffix + ".enc")
-            encrypted_path.write_bytes(bytes.fromhex(resp["result"]))
-            archive_path.unlink()
-            archive_path = encrypted_path
+def cmd_fsck(client: Client, args, logger) -> int:
+    action = "quarantine" if args.quarantine else "purge" if args.purge else None
 
-        remote.send_file(archive_path)
+    def show(issue) -> None:
+        suffix = f" (id {issue.entry_id})" if issue.entry_id is not None else ""
+        print(f"{issue.kind:<8} {issue.path}{suffix}")
 
-        try:
-            entry_id = store.add_entry(
-                str(archive_path),
-                file_hash,
-                metadata,
-            )
-        except sqlite3.IntegrityError:
-            logger.error("Database integrity error")
-            sys.exit(1)
+    report = client.fsck(
+        action=action, grace=args.grace, workers=args.workers, on_issue=show
+    )
+    for error in report.errors:
+        logger.error(f"fsck: {error}")
+    print(
+        f"files={report.files} entries={report.entries} orphans={report.orphans} "
+        f"missing={report.missing} recent={report.skipped_recent} "
+        f"quarantined={report.quarantined} purged={report.purged} "
+        f"errors={len(report.errors)}"
+    )
+    if report.errors:
+        return 1
+    return 0 if report.clean or action else 1
+
+
+def cmd_train_dict(client: Client, args, logger) -> int:
+    dict_id, used = client.train_dictionary(args.suffix, args.samples, args.size)
+    print(f"Dictionary {dict_id} trained on {used} samples, active for .{args.suffix}")
+    return 0
+
+
+def cmd_watch(client: Client, args, logger) -> int:
+    import signal
+    import threading
+
+    stop = threading.Event()
+    # SIGTERM (systemd, docker stop) завершает текущую пачку и выходит
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    failed = 0
 
-        audit.log(
-            "file_added",
-            {"file": str(archive_path), "hash": file_hash, "id": entry_id},
+    def show(batch) -> None:
+        nonlocal failed
+        for source, entry_id in batch.added:
+            print(f"{entry_id}\t{source}", flush=True)
+        for source in batch.duplicates:
+            print(f"dup\t{source}", flush=True)
+        for source, error in batch.failed:
+            logger.error(f"watch: {source}: {error}")
+        failed += len(batch.failed)
+
+    try:
+        client.watch(
+            stop=stop,
+            once=args.once,
+            backend="poll" if args.poll else None,
+            processed_dir=args.move_to,
+            on_batch=show,
         )
-        logger.info(f"✅ Entry added with ID {entry_id}")
-
-    # =================================================
-    # VERIFY (VERIFY++)
-    # =================================================
-    elif args.command == "verify":
-        # backward compatibility
-        if not (args.id or args.hash or args.path):
-            if args.target:
-                args.path = args.target
-            else:
-                parser.error("one of the arguments --id --hash --path is required")
-
-        entry = None
-        file_path: Path | None = None
-
-        if args.id:
-            entry = store.get_entry_by_id(args.id)
-            if entry:
-                file_path = Path(entry["file_path"])
-        elif args.hash:
-            entry = store.get_entry_by_hash(args.hash)
-            if entry:
-                file_path = Path(entry["file_path"])
-        elif args.path:
-            file_path = Path(args.path).expanduser().resolve()
-            entry = store.get_entry_by_path(str(file_path))
-
-        if not entry or not file_path or not file_path.exists():
-            logger.error("Entry not found")
-            sys.exit(1)
-
-        if crypto_ipc:
-            data = file_path.read_bytes()
-            resp = crypto_ipc.call(
-                {
-                    "cmd": "hash",
-                    "data": data.hex(),
-                    "algorithm": config["security"]["hash_algo"],
-                }
-            )
-            current_hash = resp["result"]
+    except KeyboardInterrupt:
+        pass
+    return 1 if failed and args.once else 0
+
+
+def cmd_analyze(client: Client, args, logger) -> int:
+    if args.show is not None:
+        cached = client.analysis(args.show)
+        if cached is None:
+            logger.error(f"Entry {args.show} has not been analyzed yet")
+            return 1
+        print(json.dumps(cached, ensure_ascii=False, indent=2))
+        return 0
+    report = client.analyze_pending(backfill=args.backfill)
+    summary = client.analysis_summary()
+    print(
+        f"analyzed={report.analyzed} failed={report.failed} "
+        f"cached={summary['analyzed']} queued={summary['queued']} "
+        f"given_up={summary['failed']}"
+    )
+    return 1 if report.failed else 0
+
+
+def cmd_similar(client: Client, args, logger) -> int:
+    results = client.similar_many(args.ids, k=args.k)
+    for entry_id in args.ids:
+        for entry, score in results[entry_id]:
+            title = entry.metadata.get("title", "")
+            prefix = f"{entry_id}\t" if len(args.ids) > 1 else ""
+            print(f"{prefix}{score:.4f}\t{entry.id}\t{title}\t{entry.file_path}")
+    return 0
+
+
+def cmd_near_dups(client: Client, args, logger) -> int:
+    clusters = client.near_duplicates(threshold=args.threshold, backfill=args.backfill)
+    for number, group in enumerate(clusters, 1):
+        for entry in group.entries:
+            print(f"{number}\t{group.similarity:.3f}\t{entry.id}\t{entry.file_path}")
+    logger.info(
+        f"{len(clusters)} near-duplicate cluster(s), "
+        f"{sum(len(c.entries) for c in clusters)} entries"
+    )
+    return 0
+
+
+def cmd_catalog(client: Client, args, logger) -> int:
+    if args.catalog_command == "export":
+        if args.output:
+            with open(args.output, "wb") as f:
+                count = client.export_catalog(f)
         else:
-            current_hash = calculate_hash(
-                file_path,
-                algorithm=config["security"]["hash_algo"],
-                logger=logger,
-            )
+            count = client.export_catalog(sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+        logger.info(f"Exported {count} entries")
+        return 0
+    with open(args.file, "rb") as f:
+        count = client.import_catalog(f)
+    print(f"Imported {count} entries")
+    return 0
+
+
+COMMANDS = {
+    "add": cmd_add,
+    "verify": cmd_verify,
+    "list": cmd_list,
+    "get": cmd_get,
+    "rotate-key": cmd_rotate_key,
+    "sync": cmd_sync,
+    "reshard": cmd_reshard,
+    "fsck": cmd_fsck,
+    "train-dict": cmd_train_dict,
+    "catalog": cmd_catalog,
+    "watch": cmd_watch,
+    "analyze": cmd_analyze,
+    "similar": cmd_similar,
+    "near-dups": cmd_near_dups,
+}
 
-        ok = current_hash == entry["hash"]
-        store.update_verification(str(file_path), ok)
-
-        audit.log(
-            "verify",
-            {
-                "file": str(file_path),
-                "expected": entry["hash"],
-                "actual": current_hash,
-                "ok": ok,
-            },
-        )
 
-        if ok:
-            logger.info("✅ Integrity verified")
+# -------------------------------------------------
+# Main
+# -------------------------------------------------
+def _machine_output(args) -> bool:
+    # stdout занят данными -> консольный лог в stderr
+    if args.command == "catalog":
+        return args.catalog_command == "export" and not args.output
+    if args.command == "analyze":
+        return args.show is not None
+    if args.command in ("get", "watch", "similar", "near-dups"):
+        return True
+    return args.command == "list" and args.format != "table"
+
+
+def main() -> None:
+    # ---- parse args ----
+    parser = build_parser()
+    args = parser.parse_args()
+
+    # backward compatibility: verify <path>
+    if args.command == "verify" and not (args.id or args.hash or args.path):
+        if args.target:
+            args.path = args.target
         else:
-            logger.error("❌ Integrity failed")
-            sys.exit(1)
-
-    # =================================================
-    # LIST
-    # =================================================
-    elif args.command == "list":
-        entries = store.list_entries(limit=args.limit)
-        for e in entries:
-            status = "✅" if e["verified"] else "❌"
-            print(
-                f"{status} ID={e['id']} "
-                f"{e['metadata'].get('title', '')} "
-                f"({e['file_path']})"
-            )
+            parser.error("one of the arguments --id --hash --path is required")
+
+    # ---- config ----
+    try:
+        config = load_config()
+    except Exception as exc:  # noqa: BLE001
+        print(f"FATAL: Cannot load config: {exc}")
+        sys.exit(1)
+
+    # ---- logging ----
+    logger = setup_logger(
+        config,
+        console_stream=sys.stderr if _machine_output(args) else None,
+    )
+
+    # ---- client ----
+    try:
+        client = Client(config, logger=logger, base_dir=PROJECT_ROOT)
+    except Exception as exc:  # noqa: BLE001
+        logger.error(f"Init failed: {exc}")
+        sys.exit(1)
+
+    with client:
+        try:
+            code = COMMANDS[args.command](client, args, logger)
+        except GlyphError as exc:
+            logger.error(str(exc))
+            code = 1
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"{args.command} failed: {exc.__class__.__name__} {exc}")
+            code = 1
+    if code:
+        sys.exit(code)
 
 
 if __name__ == "__main__":
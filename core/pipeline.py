@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Staged processing pipeline with bounded queues.
+
+Each ``Stage`` runs its own pool of worker threads that pull from a bounded
+input queue and push into the next stage's queue, so a slow stage applies
+backpressure upstream instead of buffering the whole batch. CPU-bound stages
+may set ``kind="process"``: the stage threads then hand items to a process
+pool (the stage function and items must be picklable).
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int
+    processed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    wall_seconds: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Items per second of wall time while the stage was running."""
+        return self.processed / self.wall_seconds if self.wall_seconds else 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Share of worker time spent inside the stage function."""
+        capacity = self.wall_seconds * self.workers
+        return self.busy_seconds / capacity if capacity else 0.0
+
+
+@dataclass
+class PipelineResult:
+    results: List[Any] = field(default_factory=list)
+    errors: List[Tuple[str, Any, BaseException]] = field(default_factory=list)
+    stats: Dict[str, StageStats] = field(default_factory=dict)
+
+
+class Stage:
+    """One pipeline step.
+
+    Args:
+        name (str): Stage name (used in stats and errors).
+        func (callable): ``func(item) -> item``; raising drops the item.
+        workers (int): Concurrent workers for this stage.
+        kind (str): ``"thread"`` (I/O) or ``"process"`` (CPU-bound).
+        queue_size (int): Capacity of the stage's input queue.
+        on_error (callable, optional): ``on_error(item, exc)``; called in the
+            worker thread before the item is recorded as failed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        workers: int = 1,
+        kind: str = "thread",
+        queue_size: int = 64,
+        on_error: Optional[Callable[[Any, BaseException], None]] = None,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown stage kind: {kind}")
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.kind = kind
+        self.queue_size = max(1, queue_size)
+        self.on_error = on_error
+
+
+class Pipeline:
+    """Runs items through a chain of stages.
+
+    Args:
+        stages (list[Stage]): Stages in order.
+        logger (logging.Logger, optional): Logger instance.
+    """
+
+    def __init__(self, stages: List[Stage], logger=None):
+        if not stages:
+            raise ValueError("Pipeline needs at least one stage")
+        self.stages = stages
+        self.logger = logger
+        self._queues: List[queue.Queue] = []
+        self._stats: Dict[str, StageStats] = {}
+
+    def stats(self) -> Dict[str, StageStats]:
+        return self._stats
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {s.name: q.qsize() for s, q in zip(self.stages, self._queues)}
+
+    def run(
+        self,
+        items: Iterable[Any],
+        on_result: Optional[Callable[[Any], None]] = None,
+    ) -> PipelineResult:
+        """Processes ``items``; blocks until every item has left the pipeline.
+
+        Args:
+            items (Iterable): Input items (consumed lazily).
+            on_result (callable, optional): Called in the caller's thread for
+                every item that passed all stages. When omitted, outputs are
+                collected in ``PipelineResult.results``.
+
+        Returns:
+            PipelineResult: Outputs, per-item errors and per-stage stats.
+        """
+        result = PipelineResult()
+        errors_lock = threading.Lock()
+        self._queues = [queue.Queue(maxsize=s.queue_size) for s in self.stages]
+        out_q: queue.Queue = queue.Queue(maxsize=self.stages[-1].queue_size)
+        self._stats = {s.name: StageStats(s.name, s.workers) for s in self.stages}
+        result.stats = self._stats
+
+        pools = {
+            s.name: ProcessPoolExecutor(max_workers=s.workers)
+            for s in self.stages
+            if s.kind == "process"
+        }
+        threads: List[threading.Thread] = []
+
+        for index, stage in enumerate(self.stages):
+            in_q = self._queues[index]
+            next_q = self._queues[index + 1] if index + 1 < len(self.stages) else out_q
+            stats = self._stats[stage.name]
+            alive = [stage.workers]
+            alive_lock = threading.Lock()
+            started = time.perf_counter()
+
+            def worker(
+                stage=stage,
+                in_q=in_q,
+                next_q=next_q,
+                stats=stats,
+                alive=alive,
+                alive_lock=alive_lock,
+                started=started,
+            ):
+                pool = pools.get(stage.name)
+                while True:
+                    item = in_q.get()
+                    if item is _DONE:
+                        in_q.put(_DONE)  # разбудить соседние воркеры стадии
+                        break
+                    t0 = time.perf_counter()
+                    try:
+                        if pool is not None:
+                            out = pool.submit(stage.func, item).result()
+                        else:
+                            out = stage.func(item)
+                    except Exception as exc:  # noqa: BLE001
+                        with alive_lock:
+                            stats.busy_seconds += time.perf_counter() - t0
+                            stats.failed += 1
+                        if stage.on_error:
+                            try:
+                                stage.on_error(item, exc)
+                            except Exception:  # noqa: BLE001
+                                pass
+                        with errors_lock:
+                            result.errors.append((stage.name, item, exc))
+                        if self.logger:
+                            self.logger.debug(f"Stage {stage.name} failed: {exc}")
+                        continue
+                    with alive_lock:
+                        stats.busy_seconds += time.perf_counter() - t0
+                        stats.processed += 1
+                    next_q.put(out)
+                with alive_lock:
+                    alive[0] -= 1
+                    last = alive[0] == 0
+                if last:
+                    stats.wall_seconds = time.perf_counter() - started
+                    next_q.put(_DONE)
+
+            for n in range(stage.workers):
+                t = threading.Thread(
+                    target=worker, name=f"glyph-{stage.name}-{n}", daemon=True
+                )
+                t.start()
+                threads.append(t)
+
+        feed_error: List[BaseException] = []
+
+        def feed():
+            try:
+                for item in items:
+                    self._queues[0].put(item)
+            except BaseException as exc:  # noqa: BLE001
+                feed_error.append(exc)
+            finally:
+                self._queues[0].put(_DONE)
+
+        feeder = threading.Thread(target=feed, name="glyph-pipeline-feed", daemon=True)
+        feeder.start()
+
+        callback_error: Optional[BaseException] = None
+        try:
+            while True:
+                out = out_q.get()
+                if out is _DONE:
+                    break
+                if callback_error is not None:
+                    continue  # дренируем очередь, чтобы воркеры не зависли
+                if on_result:
+                    try:
+                        on_result(out)
+                    except Exception as exc:  # noqa: BLE001
+                        callback_error = exc
+                else:
+                    result.results.append(out)
+        finally:
+            feeder.join()
+            for t in threads:
+                t.join()
+            for pool in pools.values():
+                pool.shutdown()
+
+        if feed_error:
+            raise feed_error[0]
+        if callback_error is not None:
+            raise callback_error
+
+        if self.logger:
+            for s in self._stats.values():
+                self.logger.debug(
+                    f"Stage {s.name}: {s.processed} ok, {s.failed} failed, "
+                    f"{s.throughput:.1f}/s, utilization {s.utilization:.0%}"
+                )
+        return result
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Read-back of archived entries (plain, compressed and/or encrypted) with byte ranges."""
+
+import io
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+from core.crypto import EncryptedFileReader, is_encrypted_file
+
+COPY_CHUNK = 1024 * 1024
+
+
+def parse_range(spec: str) -> Tuple[int, Optional[int]]:
+    """Parses ``A-B`` (inclusive, like HTTP Range) or ``A-`` into (start, end).
+
+    ``end`` is exclusive; ``None`` means "to the end of the entry".
+    """
+    start_s, sep, end_s = spec.partition("-")
+    if not sep or not start_s.isdigit() or (end_s and not end_s.isdigit()):
+        raise ValueError(f"Invalid range: {spec!r} (expected A-B or A-)")
+    start = int(start_s)
+    if not end_s:
+        return start, None
+    end = int(end_s) + 1
+    if end <= start:
+        raise ValueError(f"Invalid range: {spec!r} (end before start)")
+    return start, end
+
+
+def is_entry_encrypted(entry: Dict[str, Any]) -> bool:
+    path = Path(entry["file_path"])
+    return path.suffix == ".enc" and is_encrypted_file(path)
+
+
+def is_entry_compressed(entry: Dict[str, Any]) -> bool:
+    metadata = entry.get("metadata")
+    return isinstance(metadata, dict) and "compression" in metadata
+
+
+def open_stored(
+    path: Path,
+    key: Optional[bytes] = None,
+    compressed: bool = False,
+    zdict=None,
+) -> BinaryIO:
+    """Opens an archived file, undoing encryption (``key``) and compression."""
+    f = EncryptedFileReader(path, key) if key is not None else path.open("rb")
+    if not compressed:
+        return f
+    from core.compression import DecompressedReader
+
+    return DecompressedReader(f, zdict)
+
+
+def open_entry(
+    entry: Dict[str, Any], key: Optional[bytes] = None, dictionaries=None
+) -> BinaryIO:
+    """Opens the logical (decrypted, decompressed) content of an entry.
+
+    Args:
+        entry (dict): Row from ``MetadataStore``.
+        key (bytes, optional): Encryption key, required for ``.enc`` entries.
+        dictionaries (Dictionaries, optional): zstd dictionaries, required
+            for entries compressed with one.
+
+    Returns:
+        BinaryIO: Readable, seekable binary stream.
+    """
+    path = Path(entry["file_path"])
+    if not path.is_file():
+        raise FileNotFoundError(f"Archived file not found: {path}")
+    if is_entry_encrypted(entry) and key is None:
+        raise ValueError("Entry is encrypted but no key was provided")
+    zdict = None
+    compressed = is_entry_compressed(entry)
+    if compressed and entry["metadata"].get("compression_dict") is not None:
+        if dictionaries is None:
+            raise ValueError("Entry was compressed with a dictionary; none available")
+        zdict = dictionaries.get(entry["metadata"]["compression_dict"])
+    return open_stored(
+        path, key if is_entry_encrypted(entry) else None, compressed, zdict
+    )
+
+
+def iter_content(f: BinaryIO) -> Iterator[bytes]:
+    """Reads a stream to the end in bounded chunks."""
+    return iter(lambda: f.read(COPY_CHUNK), b"")
+
+
+def copy_range(
+    src: BinaryIO,
+    dst: BinaryIO,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> int:
+    """Copies ``src[start:end]`` to ``dst`` in bounded chunks; returns bytes written."""
+    src.seek(start)
+    remaining = None if end is None else max(0, end - start)
+    written = 0
+    while remaining is None or remaining > 0:
+        size = COPY_CHUNK if remaining is None else min(COPY_CHUNK, remaining)
+        chunk = src.read(size)
+        if not chunk:
+            break
+        dst.write(chunk)
+        written += len(chunk)
+        if remaining is not None:
+            remaining -= len(chunk)
+    return written
+
+
+def read_entry(
+    entry: Dict[str, Any],
+    start: int = 0,
+    end: Optional[int] = None,
+    key: Optional[bytes] = None,
+) -> bytes:
+    """Returns ``entry[start:end]`` as bytes (decrypting only needed segments)."""
+    with open_entry(entry, key) as f:
+        return read_range(f, start, end)
+
+
+def read_range(src: BinaryIO, start: int = 0, end: Optional[int] = None) -> bytes:
+    """Returns ``src[start:end]``, reading until the range or the stream ends.
+
+    A single ``read`` on ``EncryptedFileReader`` stops at a segment boundary.
+    """
+    out = io.BytesIO()
+    copy_range(src, out, start, end)
+    return out.getvalue()
@@ -1,15 +1,38 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
+import shutil
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, List, Optional
+
+MANIFEST_MAGIC = b"GLYMAN1\n"
 
 
 class RemoteStorage:
+    """Remote replica of the archive.
+
+    Objects are content-addressed by hash (``objects/ab/abcdef...``). The
+    replica keeps a compact manifest (``manifest.bin``): magic header, then
+    ``<len:u8><digest bytes>`` records sorted by hex digest, so both sides
+    of a sync can be compared with a streaming merge-join.
+
+    Args:
+        config (dict): ``storage`` section of the settings.
+        logger (logging.Logger, optional): Logger instance.
+    """
+
     def __init__(self, config: dict, logger=None):
         self.config = config
         self.logger = logger
-        self.enabled = config.get("use_remote", False)
+        remote_cfg = config.get("remote", {})
+        self.enabled = config.get("use_remote", False) or remote_cfg.get(
+            "enabled", False
+        )
+        self.type = remote_cfg.get("type", "none")
+        self.root = Path(remote_cfg["path"]) if remote_cfg.get("path") else None
+        self.name = remote_cfg.get("name") or (str(self.root) if self.root else "")
 
     def send_file(self, local_path: Path, remote_path: Optional[str] = None) -> bool:
         if not self.enabled:
@@ -20,3 +43,108 @@ class RemoteStorage:
         if self.logger:
             self.logger.warning("Remote storage not implemented yet")
         return False
+
+    # -------------------------
+    # Content-addressed objects
+    # -------------------------
+    def is_available(self) -> bool:
+        return self.enabled and self.type == "dir" and self.root is not None
+
+    def _require_available(self) -> Path:
+        if not self.is_available():
+            raise RuntimeError(
+                "Remote storage is not configured "
+                "(storage.remote.enabled / type='dir' / path)"
+            )
+        return self.root
+
+    def object_path(self, file_hash: str) -> Path:
+        root = self._require_available()
+        return root / "objects" / file_hash[:2] / file_hash
+
+    def has_object(self, file_hash: str, size: Optional[int] = None) -> bool:
+        try:
+            st = self.object_path(file_hash).stat()
+        except FileNotFoundError:
+            return False
+        return size is None or st.st_size == size
+
+    def put_object(self, file_hash: str, local_path: Path) -> int:
+        """Uploads one object; returns bytes sent (0 if it was already there)."""
+        local_path = Path(local_path)
+        size = local_path.stat().st_size
+        if self.has_object(file_hash, size):
+            return 0
+        dst = self.object_path(file_hash)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            shutil.copyfile(local_path, tmp)
+            os.replace(tmp, dst)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        if self.logger:
+            self.logger.debug(f"Remote object stored: {file_hash} ({size} bytes)")
+        return size
+
+    # -------------------------
+    # Manifest
+    # -------------------------
+    def _manifest_path(self) -> Path:
+        return self._require_available() / "manifest.bin"
+
+    def iter_manifest(self) -> Iterator[str]:
+        """Yields remote object hashes in sorted order."""
+        path = self._manifest_path()
+        if not path.exists():
+            # нет манифеста (первый sync или чужая реплика) — сканируем объекты
+            yield from self._scan_objects()
+            return
+        with path.open("rb") as f:
+            if f.read(len(MANIFEST_MAGIC)) != MANIFEST_MAGIC:
+                raise RuntimeError(f"Invalid remote manifest: {path}")
+            while True:
+                size = f.read(1)
+                if not size:
+                    return
+                digest = f.read(size[0])
+                if len(digest) != size[0]:
+                    raise RuntimeError(f"Truncated remote manifest: {path}")
+                yield digest.hex()
+
+    def write_manifest(self, hashes: Iterable[str]) -> int:
+        """Atomically replaces the manifest; ``hashes`` must be sorted."""
+        path = self._manifest_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        count = 0
+        with tmp.open("wb") as f:
+            f.write(MANIFEST_MAGIC)
+            for file_hash in hashes:
+                digest = bytes.fromhex(file_hash)
+                f.write(bytes([len(digest)]) + digest)
+                count += 1
+        os.replace(tmp, path)
+        return count
+
+    def _scan_objects(self) -> List[str]:
+        objects = self._require_available() / "objects"
+        hashes = []
+        if objects.exists():
+            for prefix in os.scandir(objects):
+                if prefix.is_dir():
+                    hashes.extend(
+                        e.name
+                        for e in os.scandir(prefix.path)
+                        if not e.name.startswith(".")
+                    )
+        hashes.sort()
+        return hashes
+
+    def rebuild_manifest(self) -> int:
+        """Rebuilds the manifest from the object tree."""
+        hashes = self._scan_objects()
+        if self.logger:
+            self.logger.info(f"Remote manifest rebuilt: {len(hashes)} objects")
+        return self.write_manifest(hashes)
@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Metadata catalog partitioned by hash prefix across N SQLite files.
+
+``ShardedMetadataStore`` has the same interface as ``MetadataStore``.
+Writes go to the shard that owns the entry's hash, so up to N writers
+(``writers``) commit in parallel instead of queueing on one database lock.
+
+Routing:
+
+* by hash: ``int(hash[:8], 16) % N``;
+* by id: shard ``i`` allocates ids ``≡ i (mod N)`` above the catalog-wide
+  ``id_floor``, so ``id % N`` finds the shard. Ids copied by ``reshard``
+  keep their values; when the routed shard misses, all shards are asked;
+* by path, ``list``, ``search``, ``query``: fan-out; ordered results are
+  merge-sorted with ``heapq.merge``.
+
+Catalog-wide values (``store_meta``, e.g. the KDF salt) live in shard 0.
+Each shard records its index and the shard count; opening a layout with a
+different ``metadata.shards`` raises ``ValueError`` (use ``reshard``).
+"""
+
+import heapq
+import itertools
+import os
+import time
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from core.metadata_store import ENTRY_FIELDS, MetadataStore, parse_cursor
+
+_SHARD_KEYS = ("shard_index", "shard_count", "id_floor")
+
+
+def shard_paths(db_path: Union[str, Path], count: int) -> List[Path]:
+    """Files of a layout: ``metadata.db`` or ``metadata.shard00.db``, ..."""
+    path = Path(db_path)
+    if count <= 1:
+        return [path]
+    return [
+        path.with_name(f"{path.stem}.shard{i:02d}{path.suffix}") for i in range(count)
+    ]
+
+
+def shard_for_hash(file_hash: str, count: int) -> int:
+    try:
+        return int(file_hash[:8], 16) % count
+    except ValueError:
+        return zlib.crc32(file_hash.encode()) % count
+
+
+def open_store(
+    db_path: Union[str, Path],
+    shards: int = 1,
+    logger=None,
+    promoted_keys: Optional[Iterable[str]] = None,
+):
+    """``MetadataStore`` for one shard, ``ShardedMetadataStore`` otherwise."""
+    if shards <= 1:
+        return MetadataStore(str(db_path), logger=logger, promoted_keys=promoted_keys)
+    return ShardedMetadataStore(db_path, shards, logger, promoted_keys)
+
+
+class ShardedMetadataStore:
+    """``MetadataStore`` interface over ``shards`` SQLite files.
+
+    Args:
+        db_path (str | Path): Base path (``metadata.database``).
+        shards (int): Number of shards (>= 2).
+        logger (logging.Logger, optional): Logger instance.
+        promoted_keys (Iterable[str], optional): See ``MetadataStore``.
+    """
+
+    def __init__(
+        self,
+        db_path: Union[str, Path],
+        shards: int,
+        logger=None,
+        promoted_keys: Optional[Iterable[str]] = None,
+    ):
+        if shards < 2:
+            raise ValueError("ShardedMetadataStore needs at least 2 shards")
+        self.db_path = Path(db_path)
+        self.logger = logger
+        self.shards = [
+            MetadataStore(
+                str(path),
+                logger=logger,
+                promoted_keys=promoted_keys,
+                id_stride=shards,
+                id_offset=index,
+            )
+            for index, path in enumerate(shard_paths(db_path, shards))
+        ]
+        for index, shard in enumerate(self.shards):
+            self._check_layout(shard, index)
+
+    @property
+    def writers(self) -> int:
+        return len(self.shards)
+
+    @property
+    def promoted_keys(self) -> Tuple[str, ...]:
+        return self.shards[0].promoted_keys
+
+    def _check_layout(self, shard: MetadataStore, index: int) -> None:
+        count = str(len(self.shards))
+        stored = (shard.get_meta("shard_index"), shard.get_meta("shard_count"))
+        if stored == (None, None):
+            shard.set_meta("shard_index", str(index))
+            shard.set_meta("shard_count", count)
+        elif stored != (str(index), count):
+            raise ValueError(
+                f"{shard.db_path} is shard {stored[0]} of {stored[1]}, "
+                f"expected {index} of {count}; run `glyph reshard`"
+            )
+
+    # -------------------------
+    # Routing
+    # -------------------------
+    def shard_for_hash(self, file_hash: str) -> MetadataStore:
+        return self.shards[shard_for_hash(file_hash, len(self.shards))]
+
+    def _shard_of_id(self, entry_id: int) -> Optional[MetadataStore]:
+        home = self.shards[entry_id % len(self.shards)]
+        candidates = [home] + [s for s in self.shards if s is not home]
+        for shard in candidates:
+            if shard.get_entry_by_id(entry_id) is not None:
+                return shard
+        return None
+
+    # -------------------------
+    # Entries
+    # -------------------------
+    def add_entry(
+        self,
+        file_path: str,
+        file_hash: str,
+        metadata: Dict[str, Any],
+        data_key: Optional[Tuple[str, bytes]] = None,
+        hash_algo: str = "sha256",
+        enqueue_analysis: bool = False,
+        minhash: Optional[Tuple[bytes, Sequence[int]]] = None,
+    ) -> int:
+        return self.shard_for_hash(file_hash).add_entry(
+            file_path,
+            file_hash,
+            metadata,
+            data_key=data_key,
+            hash_algo=hash_algo,
+            enqueue_analysis=enqueue_analysis,
+            minhash=minhash,
+        )
+
+    def get_entry_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        return self.shard_for_hash(file_hash).get_entry_by_hash(file_hash)
+
+    def get_entry_by_id(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        shard = self._shard_of_id(entry_id)
+        return shard.get_entry_by_id(entry_id) if shard else None
+
+    def get_entry_by_path(self, file_path: str) -> Optional[Dict[str, Any]]:
+        for shard in self.shards:
+            entry = shard.get_entry_by_path(file_path)
+            if entry is not None:
+                return entry
+        return None
+
+    def update_verification(self, file_path: str, verified: bool) -> None:
+        for shard in self.shards:
+            shard.update_verification(file_path, verified)
+
+    def delete_entries(self, entry_ids: Iterable[int]) -> int:
+        ids = list(entry_ids)
+        return sum(shard.delete_entries(ids) for shard in self.shards)
+
+    def list_entries(self, limit: int = 100) -> List[Dict[str, Any]]:
+        return list(self.iter_entries(limit=limit))
+
+    def iter_entries(self, **kwargs) -> Iterator[Any]:
+        return self.query(**kwargs)
+
+    def query(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        after: Optional[str] = None,
+        order: str = "desc",
+        limit: Optional[int] = None,
+        batch_size: int = 1000,
+        decode_metadata: bool = True,
+        with_cursor: bool = False,
+        **filters: Any,
+    ) -> Iterator[Any]:
+        """Fan-out ``MetadataStore.query`` merged on (added, id)."""
+        fields = list(fields or ENTRY_FIELDS)
+        streams = [
+            shard.query(
+                fields=fields,
+                after=after,
+                order=order,
+                limit=limit,
+                batch_size=batch_size,
+                decode_metadata=decode_metadata,
+                with_cursor=True,
+                **filters,
+            )
+            for shard in self.shards
+        ]
+        merged = heapq.merge(
+            *streams, key=lambda pair: parse_cursor(pair[0]), reverse=order == "desc"
+        )
+        rows = itertools.islice(merged, limit)
+        return rows if with_cursor else (row for _, row in rows)
+
+    def count(self, **filters: Any) -> int:
+        return sum(shard.count(**filters) for shard in self.shards)
+
+    def iter_hashes(self, after_id: int = 0) -> Iterator[Tuple[int, str]]:
+        return heapq.merge(*(s.iter_hashes(after_id) for s in self.shards))
+
+    def iter_paths(
+        self, start: Optional[str] = None, stop: Optional[str] = None
+    ) -> Iterator[Tuple[str, int]]:
+        return heapq.merge(*(s.iter_paths(start, stop) for s in self.shards))
+
+    def search(self, text: str, limit: int = 100) -> List[Dict[str, Any]]:
+        merged = heapq.merge(
+            *(shard.search(text, limit=limit) for shard in self.shards),
+            key=lambda e: (e["added"], e["id"]),
+            reverse=True,
+        )
+        return list(itertools.islice(merged, limit))
+
+    # -------------------------
+    # Replication
+    # -------------------------
+    def iter_replication_candidates(
+        self, remote: str
+    ) -> Iterator[Tuple[str, str, Optional[str]]]:
+        return heapq.merge(
+            *(s.iter_replication_candidates(remote) for s in self.shards),
+            key=lambda row: row[0],
+        )
+
+    def set_replication_states(
+        self,
+        remote: str,
+        states: Iterable[Tuple[str, str, Optional[str]]],
+    ) -> None:
+        groups = defaultdict(list)
+        for state in states:
+            groups[shard_for_hash(state[0], len(self.shards))].append(state)
+        for index, rows in groups.items():
+            self.shards[index].set_replication_states(remote, rows)
+
+    def get_replication_state(self, file_hash: str, remote: str) -> Optional[str]:
+        return self.shard_for_hash(file_hash).get_replication_state(file_hash, remote)
+
+    def replication_summary(self, remote: str) -> Dict[str, int]:
+        total: Dict[str, int] = defaultdict(int)
+        for shard in self.shards:
+            for state, count in shard.replication_summary(remote).items():
+                total[state] += count
+        return dict(total)
+
+    # -------------------------
+    # Content analysis (routed by hash)
+    # -------------------------
+    def enqueue_analysis(self, hashes: Iterable[str]) -> int:
+        groups = defaultdict(list)
+        for h in hashes:
+            groups[shard_for_hash(h, len(self.shards))].append(h)
+        return sum(self.shards[i].enqueue_analysis(rows) for i, rows in groups.items())
+
+    def enqueue_unanalyzed(self) -> int:
+        return sum(shard.enqueue_unanalyzed() for shard in self.shards)
+
+    def claim_analysis(
+        self, limit: int, lease: float = 300, max_attempts: int = 3
+    ) -> List[str]:
+        hashes: List[str] = []
+        for shard in self.shards:
+            hashes.extend(
+                shard.claim_analysis(limit - len(hashes), lease, max_attempts)
+            )
+            if len(hashes) >= limit:
+                break
+        return hashes
+
+    def put_analysis(self, results: Iterable[Tuple[str, Dict[str, Any], str]]) -> None:
+        groups = defaultdict(list)
+        for row in results:
+            groups[shard_for_hash(row[0], len(self.shards))].append(row)
+        for index, rows in groups.items():
+            self.shards[index].put_analysis(rows)
+
+    def fail_analysis(
+        self, failures: Iterable[Tuple[str, str]], retry_delay: float = 60
+    ) -> None:
+        groups = defaultdict(list)
+        for row in failures:
+            groups[shard_for_hash(row[0], len(self.shards))].append(row)
+        for index, rows in groups.items():
+            self.shards[index].fail_analysis(rows, retry_delay)
+
+    def get_analysis(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        return self.shard_for_hash(file_hash).get_analysis(file_hash)
+
+    def analysis_summary(self, max_attempts: int = 3) -> Dict[str, int]:
+        total: Dict[str, int] = defaultdict(int)
+        for shard in self.shards:
+            for key, count in shard.analysis_summary(max_attempts).items():
+                total[key] += count
+        return dict(total)
+
+    # -------------------------
+    # Near-duplicate index (rows routed by hash, bucket lookups fan out)
+    # -------------------------
+    def put_minhashes(self, rows: Iterable[Tuple[str, bytes, Sequence[int]]]) -> None:
+        groups = defaultdict(list)
+        for row in rows:
+            groups[shard_for_hash(row[0], len(self.shards))].append(row)
+        for index, group in groups.items():
+            self.shards[index].put_minhashes(group)
+
+    def lsh_candidates(self, buckets: Sequence[int]) -> List[Tuple[str, bytes]]:
+        return [row for shard in self.shards for row in shard.lsh_candidates(buckets)]
+
+    def get_minhashes(self, hashes: Iterable[str]) -> Dict[str, bytes]:
+        groups = defaultdict(list)
+        for h in hashes:
+            groups[shard_for_hash(h, len(self.shards))].append(h)
+        found: Dict[str, bytes] = {}
+        for index, group in groups.items():
+            found.update(self.shards[index].get_minhashes(group))
+        return found
+
+    def iter_lsh_buckets(self) -> Iterator[Tuple[int, int, str]]:
+        return heapq.merge(*(s.iter_lsh_buckets() for s in self.shards))
+
+    def unindexed_minhashes(
+        self, after_id: int = 0, limit: int = 1000
+    ) -> List[Tuple[int, str]]:
+        merged = heapq.merge(
+            *(s.unindexed_minhashes(after_id, limit) for s in self.shards)
+        )
+        return list(itertools.islice(merged, limit))
+
+    # -------------------------
+    # Data keys
+    # -------------------------
+    def get_data_key(self, entry_id: int) -> Optional[Tuple[str, bytes]]:
+        shard = self._shard_of_id(entry_id)
+        return shard.get_data_key(entry_id) if shard else None
+
+    def get_data_keys(self, entry_ids: Iterable[int]) -> Dict[int, Tuple[str, bytes]]:
+        ids = list(entry_ids)
+        found: Dict[int, Tuple[str, bytes]] = {}
+        for shard in self.shards:
+            found.update(shard.get_data_keys(i for i in ids if i not in found))
+        return found
+
+    def list_data_keys(self, key_id: str, limit: int = 1000) -> List[Tuple[int, bytes]]:
+        rows: List[Tuple[int, bytes]] = []
+        for shard in self.shards:
+            rows.extend(shard.list_data_keys(key_id, limit=limit - len(rows)))
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def list_unkeyed_encrypted_entries(self, limit: int = 1000) -> List[int]:
+        ids: List[int] = []
+        for shard in self.shards:
+            ids.extend(shard.list_unkeyed_encrypted_entries(limit=limit - len(ids)))
+            if len(ids) >= limit:
+                break
+        return ids
+
+    def put_data_keys(self, rows: Iterable[Tuple[int, str, bytes]]) -> None:
+        groups = defaultdict(list)
+        for row in rows:
+            shard = self._shard_of_id(row[0])
+            if shard is None:
+                raise ValueError(f"Entry {row[0]} not found in any shard")
+            groups[id(shard)].append((shard, row))
+        for pairs in groups.values():
+            pairs[0][0].put_data_keys(row for _, row in pairs)
+
+    # -------------------------
+    # Store meta (shard 0)
+    # -------------------------
+    def list_meta(self) -> Dict[str, str]:
+        return self.shards[0].list_meta()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        return self.shards[0].get_meta(key)
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.shards[0].set_meta(key, value)
+
+    def get_or_set_meta(self, key: str, default: str) -> str:
+        return self.shards[0].get_or_set_meta(key, default)
+
+
+# -------------------------------------------------
+# Resharding
+# -------------------------------------------------
+def _source_shards(store) -> List[MetadataStore]:
+    return list(getattr(store, "shards", [store]))
+
+
+def reshard(
+    db_path: Union[str, Path],
+    old_count: int,
+    new_count: int,
+    promoted_keys: Optional[Iterable[str]] = None,
+    batch_size: int = 5000,
+    logger=None,
+) -> int:
+    """Redistributes a catalog over ``new_count`` shards; returns rows copied.
+
+    The new layout is built next to the old one and swapped in at the end;
+    the old files are kept with a ``.pre-reshard-<timestamp>`` suffix. Entry
+    ids are preserved. Run it while no other process writes to the catalog.
+    """
+    if old_count == new_count:
+        raise ValueError(f"Catalog already has {new_count} shard(s)")
+    source = open_store(db_path, old_count, logger, promoted_keys)
+    final_paths = shard_paths(db_path, new_count)
+    staged = [p.with_name(f".reshard-{p.name}") for p in final_paths]
+    for path in staged:
+        path.unlink(missing_ok=True)
+    targets = [
+        MetadataStore(
+            str(path),
+            promoted_keys=promoted_keys,
+            id_stride=new_count,
+            id_offset=index,
+        )
+        for index, path in enumerate(staged)
+    ]
+
+    copied = 0
+    max_id = 0
+    conns = [t._get_conn() for t in targets]
+    try:
+        for shard in _source_shards(source):
+            src = shard._get_conn()
+            try:
+                queries = (
+                    (
+                        f"SELECT {', '.join(ENTRY_FIELDS)}, hash FROM books ORDER BY id",
+                        f"INSERT INTO books ({', '.join(ENTRY_FIELDS)}) "
+                        f"VALUES ({', '.join('?' * len(ENTRY_FIELDS))})",
+                    ),
+                    (
+                        "SELECT k.entry_id, k.key_id, k.wrapped, b.hash "
+                        "FROM data_keys k JOIN books b ON b.id = k.entry_id",
+                        "INSERT INTO data_keys (entry_id, key_id, wrapped) "
+                        "VALUES (?, ?, ?)",
+                    ),
+                    (
+                        "SELECT hash, remote, state, updated, error, hash "
+                        "FROM replication",
+                        "INSERT OR REPLACE INTO replication "
+                        "(hash, remote, state, updated, error) VALUES (?, ?, ?, ?, ?)",
+                    ),
+                    (
+                        "SELECT hash, result, analyzer, analyzed, hash FROM analysis",
+                        "INSERT OR REPLACE INTO analysis "
+                        "(hash, result, analyzer, analyzed) VALUES (?, ?, ?, ?)",
+                    ),
+                    (
+                        "SELECT hash, queued, not_before, attempts, error, hash "
+                        "FROM analysis_queue",
+                        "INSERT OR REPLACE INTO analysis_queue "
+                        "(hash, queued, not_before, attempts, error) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                    ),
+                    (
+                        "SELECT hash, signature, hash FROM minhash",
+                        "INSERT OR REPLACE INTO minhash (hash, signature) "
+                        "VALUES (?, ?)",
+                    ),
+                    (
+                        "SELECT band, bucket, hash, hash FROM lsh_bands",
+                        "INSERT OR IGNORE INTO lsh_bands (band, bucket, hash) "
+                        "VALUES (?, ?, ?)",
+                    ),
+                )
+                for select, insert in queries:
+                    cur = src.execute(select)
+                    while True:
+                        rows = cur.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        groups = defaultdict(list)
+                        for row in rows:
+                            # последняя колонка — hash для маршрутизации
+                            groups[shard_for_hash(row[-1], new_count)].append(
+                                tuple(row)[:-1]
+                            )
+                        for index, group in groups.items():
+                            conns[index].executemany(insert, group)
+                            conns[index].commit()
+                        if insert.startswith("INSERT INTO books"):
+                            copied += len(rows)
+                            max_id = max(max_id, max(r[0] for r in rows))
+            finally:
+                src.close()
+
+        meta_conn = _source_shards(source)[0]._get_conn()
+        try:
+            meta = [
+                (key, value)
+                for key, value in meta_conn.execute("SELECT key, value FROM store_meta")
+                if key not in _SHARD_KEYS
+            ]
+        finally:
+            meta_conn.close()
+        for index, conn in enumerate(conns):
+            rows = [("id_floor", str(max_id))]
+            if new_count > 1:
+                rows += [("shard_index", str(index)), ("shard_count", str(new_count))]
+            if index == 0:
+                rows += meta
+            conn.executemany(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", rows
+            )
+            conn.commit()
+    finally:
+        for conn in conns:
+            conn.close()
+
+    suffix = f".pre-reshard-{time.strftime('%Y%m%d%H%M%S')}"
+    for path in shard_paths(db_path, old_count):
+        if path.exists():
+            os.replace(path, path.with_name(path.name + suffix))
+    for src_path, dst_path in zip(staged, final_paths):
+        os.replace(src_path, dst_path)
+    if logger:
+        logger.info(f"Resharded {copied} entries: {old_count} -> {new_count} shard(s)")
+    return copied
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Similarity index over archived content (``similarity`` config, ``glyph similar``).
+
+Every entry gets a fixed-size, L2-normalised embedding of its first
+``max_bytes`` of text. Rows are appended to a float32 matrix file that is
+searched through ``numpy.memmap``, so the index is never loaded or rebuilt
+as a whole:
+
+* ``vectors.f32`` — row-major ``count x dim`` float32;
+* ``ids.i64`` — entry id of each row;
+* ``index.json`` — dim, embedder, committed row count and the catalog
+  watermarks (highest entry id read, one per shard: sharded ids are only
+  monotonic within a shard), replaced atomically after appends.
+
+Rows past the committed count (an interrupted append) are ignored and
+truncated on the next append, so there must be one writer at a time.
+New entries are picked up incrementally from the watermarks, like the
+dedup index; after a reshard the catalog is walked once more and ids
+already in ``ids.i64`` are skipped.
+
+Search is a blocked matrix product: cosine scores for a batch of queries
+against ``block_rows`` rows at a time, with ``argpartition`` top-k per block
+and a final merge.
+
+Embedders are pluggable: ``"hashing"`` (built-in hashing trick, no model)
+or ``"package.module:factory"``, where ``factory(dim)`` returns an object
+with ``name``, ``dim`` and ``embed(texts) -> ndarray``.
+
+Requires the optional ``numpy`` package.
+"""
+
+import importlib
+import json
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_DIM = 256
+DEFAULT_MAX_BYTES = 64 * 1024
+BLOCK_ROWS = 65536
+
+_INDEX_FILE = "index.json"
+_VECTORS_FILE = "vectors.f32"
+_IDS_FILE = "ids.i64"
+_TOKEN = re.compile(r"\w{2,}", re.UNICODE)
+
+
+def require_numpy():
+    """Returns the ``numpy`` module; raises ``RuntimeError`` if missing."""
+    try:
+        import numpy
+    except ImportError as exc:
+        raise RuntimeError(
+            "The similarity index requires the 'numpy' package "
+            "(pip install glyph[similarity])"
+        ) from exc
+    return numpy
+
+
+class HashingEmbedder:
+    """Hashing-trick embedding of word unigrams and bigrams.
+
+    Each feature is hashed (CRC-32) to one of ``dim`` buckets with a sign
+    bit; counts are log-scaled and the vector is L2-normalised, so the dot
+    product of two embeddings is their cosine similarity.
+    """
+
+    def __init__(self, dim: int = DEFAULT_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[int]:
+        words = [w.lower() for w in _TOKEN.findall(text)]
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return [zlib.crc32(g.encode()) for g in grams]
+
+    def embed(self, texts: Sequence[str]):
+        np = require_numpy()
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.asarray(self._features(text), dtype=np.uint32)
+            if not hashes.size:
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], hashes % self.dim, signs)
+        out = np.sign(out) * np.log1p(np.abs(out))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return (out / norms).astype(np.float32)
+
+
+def load_embedder(spec: str, dim: int = DEFAULT_DIM):
+    """``"hashing"`` or ``"module:factory"`` -> embedder instance."""
+    if spec == "hashing":
+        return HashingEmbedder(dim)
+    module_name, sep, attr = spec.partition(":")
+    if not sep:
+        raise ValueError(f"Embedder must be 'hashing' or 'module:factory': {spec}")
+    embedder = getattr(importlib.import_module(module_name), attr)(dim)
+    if embedder.dim != dim:
+        raise ValueError(f"Embedder {spec} produces dim {embedder.dim}, not {dim}")
+    return embedder
+
+
+class SimilarityIndex:
+    """Append-only embedding matrix with blocked top-k search.
+
+    Args:
+        directory (Path): Index files location.
+        dim (int): Embedding size.
+        embedder_name (str): Recorded in ``index.json``; an existing index
+            built by another embedder (or dim) raises ``ValueError``.
+    """
+
+    def __init__(self, directory, dim: int, embedder_name: str):
+        self.np = require_numpy()
+        self.dir = Path(directory)
+        self.dim = dim
+        self.embedder_name = embedder_name
+        self._vectors = self.dir / _VECTORS_FILE
+        self._ids = self.dir / _IDS_FILE
+        self._matrix = None
+        self._row_ids = None
+        self._mapped = -1
+        state = self._read_state()
+        if state is None:
+            state = {"dim": dim, "embedder": embedder_name, "count": 0}
+        elif state["dim"] != dim or state["embedder"] != embedder_name:
+            raise ValueError(
+                f"Index at {self.dir} was built with {state['embedder']} "
+                f"(dim {state['dim']}); remove it to rebuild with {embedder_name}"
+            )
+        self.count = state["count"]
+        self.watermarks: List[int] = state.get("watermarks", [])
+
+    def refresh(self) -> None:
+        """Re-reads the committed row count (rows appended by another process)."""
+        state = self._read_state()
+        if state is not None:
+            self.count = state["count"]
+            self.watermarks = state.get("watermarks", [])
+
+    def _read_state(self):
+        path = self.dir / _INDEX_FILE
+        if not path.exists():
+            return None
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_state(self) -> None:
+        tmp = self.dir / f".{_INDEX_FILE}.tmp"
+        state = {
+            "dim": self.dim,
+            "embedder": self.embedder_name,
+            "count": self.count,
+            "watermarks": self.watermarks,
+        }
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.dir / _INDEX_FILE)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(
+        self,
+        entry_ids: Sequence[int],
+        vectors,
+        watermarks: Optional[Sequence[int]] = None,
+    ) -> None:
+        """Appends rows (no rebuild).
+
+        Args:
+            entry_ids (sequence): Entry id of each row.
+            vectors: ``len(entry_ids) x dim`` array.
+            watermarks (sequence, optional): Last catalog id read from each
+                shard; kept as is when omitted.
+        """
+        np = self.np
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.shape != (len(entry_ids), self.dim):
+            raise ValueError(f"Expected {len(entry_ids)} x {self.dim} vectors")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        row_bytes = self.dim * 4
+        # хвост прерванной записи за пределами count отбрасываем
+        for path, size in ((self._vectors, row_bytes), (self._ids, 8)):
+            if path.exists() and path.stat().st_size != self.count * size:
+                os.truncate(path, self.count * size)
+        with self._vectors.open("ab") as f:
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with self._ids.open("ab") as f:
+            f.write(np.asarray(entry_ids, dtype=np.int64).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.count += len(entry_ids)
+        if watermarks is not None:
+            self.watermarks = list(watermarks)
+        self._write_state()
+
+    def _map(self) -> Tuple[Any, Any]:
+        np = self.np
+        if self._mapped != self.count:
+            if self.count:
+                self._matrix = np.memmap(
+                    self._vectors,
+                    dtype=np.float32,
+                    mode="r",
+                    shape=(self.count, self.dim),
+                )
+                self._row_ids = np.fromfile(self._ids, dtype=np.int64, count=self.count)
+            else:
+                self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+                self._row_ids = np.zeros(0, dtype=np.int64)
+            self._mapped = self.count
+        return self._matrix, self._row_ids
+
+    def entry_ids(self):
+        """Entry id of every committed row."""
+        return self._map()[1]
+
+    def vector(self, entry_id: int):
+        """Stored embedding of ``entry_id`` (the latest row), or None."""
+        matrix, row_ids = self._map()
+        rows = self.np.flatnonzero(row_ids == entry_id)
+        return self.np.array(matrix[rows[-1]]) if rows.size else None
+
+    def search(
+        self,
+        queries,
+        k: int = 10,
+        exclude: Iterable[int] = (),
+        self_ids: Optional[Sequence[int]] = None,
+        block_rows: int = BLOCK_ROWS,
+    ) -> List[List[Tuple[int, float]]]:
+        """Top-``k`` (entry id, cosine) per query row, best first.
+
+        Args:
+            queries: ``m x dim`` (or one ``dim``) array of normalised vectors.
+            k (int): Results per query.
+            exclude (iterable): Entry ids never returned for any query.
+            self_ids (sequence): Entry id of each query row, left out of
+                that row's results only.
+            block_rows (int): Rows scored per matrix product.
+        """
+        np = self.np
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        matrix, row_ids = self._map()
+        excluded = np.fromiter(exclude, dtype=np.int64)
+        own = None if self_ids is None else np.asarray(self_ids, dtype=np.int64)
+        best_scores = np.full((q.shape[0], 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((q.shape[0], 0), dtype=np.int64)
+        for start in range(0, len(matrix), block_rows):
+            block = matrix[start : start + block_rows]
+            scores = q @ block.T  # (m, rows)
+            block_ids = row_ids[start : start + len(block)]
+            if excluded.size:
+                scores[:, np.isin(block_ids, excluded)] = -np.inf
+            if own is not None:
+                scores[own[:, None] == block_ids[None, :]] = -np.inf
+            take = min(k, scores.shape[1])
+            top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_scores = np.concatenate(
+                [best_scores, np.take_along_axis(scores, top, axis=1)], axis=1
+            )
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores, kind="stable")
+            results.append(
+                [
+                    (int(row_ids[rows[i]]), float(scores[i]))
+                    for i in order
+                    if np.isfinite(scores[i])
+                ]
+            )
+        return results
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Delta-aware replication of the archive to a remote replica.
+
+The local inventory (distinct hashes from ``MetadataStore``, sorted) and the
+remote manifest (also sorted) are merge-joined as streams, so only objects
+missing on the remote are uploaded and neither side is loaded into memory.
+"""
+
+import heapq
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from core.metadata_store import MetadataStore
+from core.remote import RemoteStorage
+
+STATE_REPLICATED = "replicated"
+STATE_FAILED = "failed"
+
+_STATE_BATCH = 1000
+
+
+@dataclass
+class SyncReport:
+    remote: str
+    local_objects: int = 0
+    missing: int = 0
+    uploaded: int = 0
+    already_present: int = 0
+    failed: int = 0
+    bytes_sent: int = 0
+
+
+def _merge_missing(
+    local: Iterable[Tuple[str, str, Optional[str]]],
+    remote: Iterator[str],
+) -> Iterator[Tuple[str, str, Optional[str], bool]]:
+    """Merge-joins two hash-sorted streams.
+
+    Yields (hash, file_path, state, present_on_remote) for every local object.
+    """
+    remote_hash = next(remote, None)
+    for file_hash, file_path, state in local:
+        while remote_hash is not None and remote_hash < file_hash:
+            remote_hash = next(remote, None)
+        yield file_hash, file_path, state, remote_hash == file_hash
+
+
+def _dedup_sorted(hashes: Iterable[str]) -> Iterator[str]:
+    last = None
+    for h in hashes:
+        if h != last:
+            yield h
+            last = h
+
+
+def sync_remote(
+    store: MetadataStore,
+    remote: RemoteStorage,
+    workers: int = 8,
+    dry_run: bool = False,
+    logger=None,
+) -> SyncReport:
+    """Uploads objects missing on ``remote`` and records replication state.
+
+    Args:
+        store (MetadataStore): Local catalog.
+        remote (RemoteStorage): Target replica.
+        workers (int): Parallel uploads.
+        dry_run (bool): Only count missing objects.
+        logger (logging.Logger, optional): Logger instance.
+
+    Returns:
+        SyncReport: Counters for this run.
+    """
+    if not remote.is_available():
+        raise RuntimeError("Remote storage is not configured for sync")
+
+    report = SyncReport(remote=remote.name)
+    states: List[Tuple[str, str, Optional[str]]] = []
+    uploaded: List[str] = []
+
+    def flush_states(force: bool = False) -> None:
+        if states and (force or len(states) >= _STATE_BATCH) and not dry_run:
+            store.set_replication_states(remote.name, states)
+            states.clear()
+
+    def collect(done) -> None:
+        for fut in done:
+            file_hash = pending.pop(fut)
+            try:
+                sent = fut.result()
+            except Exception as exc:  # noqa: BLE001
+                report.failed += 1
+                states.append((file_hash, STATE_FAILED, str(exc)))
+                if logger:
+                    logger.error(f"Sync failed for {file_hash}: {exc}")
+                continue
+            if sent:
+                report.uploaded += 1
+                report.bytes_sent += sent
+            else:
+                report.already_present += 1
+            uploaded.append(file_hash)
+            states.append((file_hash, STATE_REPLICATED, None))
+        flush_states()
+
+    candidates = store.iter_replication_candidates(remote.name)
+    pending = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for file_hash, file_path, state, present in _merge_missing(
+            candidates, remote.iter_manifest()
+        ):
+            report.local_objects += 1
+            if present:
+                if state != STATE_REPLICATED:
+                    states.append((file_hash, STATE_REPLICATED, None))
+                    flush_states()
+                continue
+
+            report.missing += 1
+            if dry_run:
+                continue
+            # bounded in-flight window: never queue the whole delta at once
+            if len(pending) >= workers * 4:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            fut = pool.submit(remote.put_object, file_hash, Path(file_path))
+            pending[fut] = file_hash
+
+        if pending:
+            done, _ = wait(pending)
+            collect(done)
+
+    flush_states(force=True)
+
+    if uploaded:
+        uploaded.sort()
+        remote.write_manifest(
+            _dedup_sorted(heapq.merge(remote.iter_manifest(), uploaded))
+        )
+
+    if logger:
+        logger.info(
+            f"Sync to {report.remote}: {report.local_objects} local, "
+            f"{report.missing} missing, {report.uploaded} uploaded, "
+            f"{report.failed} failed, {report.bytes_sent} bytes"
+        )
+    return report
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Hash algorithm registry with BLAKE3 support.
+
+``security.hash_algo`` may name any ``hashlib`` algorithm or ``"blake3"``.
+BLAKE3 is a tree hash: 1 KiB chunks are compressed independently and
+combined pairwise, so one large file can be hashed on every core.
+
+* If the optional ``blake3`` package is installed it is used (multithreaded,
+  memory-mapped for files).
+* Otherwise a pure-Python implementation is used. It is slow per core, so
+  ``hash_file`` splits large files into power-of-two subtrees hashed in
+  worker processes and merges their chaining values.
+
+Both paths produce the standard BLAKE3 digest (256-bit, unkeyed).
+"""
+
+import hashlib
+import os
+import struct
+from typing import Any, List, Optional, Union
+
+BLAKE3 = "blake3"
+DEFAULT_ALGORITHM = "sha256"
+
+CHUNK_LEN = 1024
+BLOCK_LEN = 64
+# меньше этого файл хешируется в одном процессе
+MIN_PARALLEL_SIZE = 4 * 1024 * 1024
+_MIN_SEGMENT_CHUNKS = 1024  # 1 MiB
+
+_CHUNK_START = 1
+_CHUNK_END = 2
+_PARENT = 4
+_ROOT = 8
+
+_IV = (
+    0x6A09E667,
+    0xBB67AE85,
+    0x3C6EF372,
+    0xA54FF53A,
+    0x510E527F,
+    0x9B05688C,
+    0x1F83D9AB,
+    0x5BE0CD19,
+)
+_PERMUTATION = (2, 6, 3, 10, 7, 0, 4, 13, 1, 11, 12, 5, 9, 14, 15, 8)
+_MASK = 0xFFFFFFFF
+_BLOCK_WORDS = struct.Struct("<16I")
+
+_native_module: Any = None
+_native_checked = False
+
+
+def _native():
+    """The optional ``blake3`` package (rayon-based), imported on first use."""
+    global _native_module, _native_checked
+    if not _native_checked:
+        try:
+            import blake3
+        except ImportError:
+            blake3 = None
+        _native_module, _native_checked = blake3, True
+    return _native_module
+
+
+def _g(s: List[int], a: int, b: int, c: int, d: int, x: int, y: int) -> None:
+    va, vb, vc, vd = s[a], s[b], s[c], s[d]
+    va = (va + vb + x) & _MASK
+    vd ^= va
+    vd = (vd >> 16) | ((vd << 16) & _MASK)
+    vc = (vc + vd) & _MASK
+    vb ^= vc
+    vb = (vb >> 12) | ((vb << 20) & _MASK)
+    va = (va + vb + y) & _MASK
+    vd ^= va
+    vd = (vd >> 8) | ((vd << 24) & _MASK)
+    vc = (vc + vd) & _MASK
+    vb ^= vc
+    vb = (vb >> 7) | ((vb << 25) & _MASK)
+    s[a], s[b], s[c], s[d] = va, vb, vc, vd
+
+
+def _compress(
+    cv: List[int], m: List[int], counter: int, block_len: int, flags: int
+) -> List[int]:
+    s = [
+        *cv,
+        _IV[0],
+        _IV[1],
+        _IV[2],
+        _IV[3],
+        counter & _MASK,
+        (counter >> 32) & _MASK,
+        block_len,
+        flags,
+    ]
+    for rnd in range(7):
+        _g(s, 0, 4, 8, 12, m[0], m[1])
+        _g(s, 1, 5, 9, 13, m[2], m[3])
+        _g(s, 2, 6, 10, 14, m[4], m[5])
+        _g(s, 3, 7, 11, 15, m[6], m[7])
+        _g(s, 0, 5, 10, 15, m[8], m[9])
+        _g(s, 1, 6, 11, 12, m[10], m[11])
+        _g(s, 2, 7, 8, 13, m[12], m[13])
+        _g(s, 3, 4, 9, 14, m[14], m[15])
+        if rnd < 6:
+            m = [m[i] for i in _PERMUTATION]
+    return [s[i] ^ s[i + 8] for i in range(8)]
+
+
+def _words(block: bytes) -> List[int]:
+    if len(block) < BLOCK_LEN:
+        block = block + bytes(BLOCK_LEN - len(block))
+    return list(_BLOCK_WORDS.unpack(block))
+
+
+class _Output:
+    __slots__ = ("cv", "block", "counter", "block_len", "flags")
+
+    def __init__(self, cv, block, counter, block_len, flags):
+        self.cv, self.block, self.counter = cv, block, counter
+        self.block_len, self.flags = block_len, flags
+
+    def chaining_value(self) -> List[int]:
+        return _compress(self.cv, self.block, self.counter, self.block_len, self.flags)
+
+    def root_digest(self) -> bytes:
+        out = _compress(self.cv, self.block, 0, self.block_len, self.flags | _ROOT)
+        return struct.pack("<8I", *out)
+
+
+def _parent_output(left: List[int], right: List[int]) -> _Output:
+    return _Output(list(_IV), left + right, 0, BLOCK_LEN, _PARENT)
+
+
+class Blake3:
+    """Incremental pure-Python BLAKE3 (``hashlib``-style ``update``/``digest``).
+
+    Args:
+        data (bytes): Initial input.
+        chunk_offset (int): Index of the first chunk; used to hash one
+            subtree of a larger input (see ``subtree_cv``).
+    """
+
+    name = BLAKE3
+    digest_size = 32
+    block_size = BLOCK_LEN
+
+    def __init__(self, data: bytes = b"", chunk_offset: int = 0):
+        self._offset = chunk_offset
+        self._chunks = 0  # завершённых чанков
+        self._stack: List[List[int]] = []
+        self._cv = list(_IV)
+        self._blocks = 0  # сжатых блоков текущего чанка
+        self._buf = b""
+        if data:
+            self.update(data)
+
+    def _chunk_output(self) -> _Output:
+        flags = _CHUNK_END | (_CHUNK_START if self._blocks == 0 else 0)
+        return _Output(
+            self._cv,
+            _words(self._buf),
+            self._offset + self._chunks,
+            len(self._buf),
+            flags,
+        )
+
+    def _finish_chunk(self) -> None:
+        cv = self._chunk_output().chaining_value()
+        self._chunks += 1
+        total = self._chunks
+        # слияние полных поддеревьев: по числу нулевых младших бит
+        while total & 1 == 0:
+            cv = _parent_output(self._stack.pop(), cv).chaining_value()
+            total >>= 1
+        self._stack.append(cv)
+        self._cv = list(_IV)
+        self._blocks = 0
+        self._buf = b""
+
+    def update(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        data = memoryview(data).cast("B")
+        pos = 0
+        while pos < len(data):
+            if len(self._buf) == BLOCK_LEN:
+                # последний блок чанка сжимается только когда известно, что он не последний
+                if self._blocks == CHUNK_LEN // BLOCK_LEN - 1:
+                    self._finish_chunk()
+                else:
+                    flags = _CHUNK_START if self._blocks == 0 else 0
+                    self._cv = _compress(
+                        self._cv,
+                        _words(self._buf),
+                        self._offset + self._chunks,
+                        BLOCK_LEN,
+                        flags,
+                    )
+                    self._blocks += 1
+                    self._buf = b""
+            take = min(BLOCK_LEN - len(self._buf), len(data) - pos)
+            self._buf += bytes(data[pos : pos + take])
+            pos += take
+
+    def _top(self) -> _Output:
+        output = self._chunk_output()
+        for cv in reversed(self._stack):
+            output = _parent_output(cv, output.chaining_value())
+        return output
+
+    def subtree_cv(self) -> List[int]:
+        """Chaining value of the (non-root) subtree hashed so far."""
+        return self._top().chaining_value()
+
+    def digest(self) -> bytes:
+        return self._top().root_digest()
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+    def copy(self) -> "Blake3":
+        other = Blake3.__new__(Blake3)
+        other._offset, other._chunks = self._offset, self._chunks
+        other._stack = list(self._stack)
+        other._cv, other._blocks, other._buf = list(self._cv), self._blocks, self._buf
+        return other
+
+
+# -------------------------------------------------
+# Parallel file hashing (pure Python)
+# -------------------------------------------------
+def _segment_cv(args) -> List[int]:
+    path, offset, length = args
+    hasher = Blake3(chunk_offset=offset // CHUNK_LEN)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        remaining = length
+        while remaining:
+            block = f.read(min(remaining, 1024 * 1024))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher.subtree_cv()
+
+
+def _merge(cvs: List[List[int]]) -> _Output:
+    # дерево BLAKE3 левополное: левое поддерево — наибольшая степень двойки
+    if len(cvs) == 2:
+        return _parent_output(cvs[0], cvs[1])
+    split = 1 << ((len(cvs) - 1).bit_length() - 1)
+    left = cvs[0] if split == 1 else _merge(cvs[:split]).chaining_value()
+    right = (
+        cvs[split] if len(cvs) - split == 1 else _merge(cvs[split:]).chaining_value()
+    )
+    return _parent_output(left, right)
+
+
+def blake3_file_python(path: str, workers: Optional[int] = None) -> str:
+    """BLAKE3 of a file with the pure-Python implementation, in parallel.
+
+    The file is cut into equal power-of-two runs of chunks; each run is a
+    complete subtree of the BLAKE3 tree, so their chaining values can be
+    computed independently and merged.
+    """
+    size = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or size < MIN_PARALLEL_SIZE:
+        hasher = Blake3()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(block)
+        return hasher.hexdigest()
+    chunks = -(-size // CHUNK_LEN)
+    per_segment = max(_MIN_SEGMENT_CHUNKS, -(-chunks // (workers * 4)))
+    segment = (1 << (per_segment - 1).bit_length()) * CHUNK_LEN
+    jobs = [(path, offset, segment) for offset in range(0, size, segment)]
+    if len(jobs) == 1:
+        return blake3_file_python(path, workers=1)
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        cvs = list(pool.map(_segment_cv, jobs))
+    return _merge(cvs).root_digest().hex()
+
+
+# -------------------------------------------------
+# Registry
+# -------------------------------------------------
+def has_native_blake3() -> bool:
+    return _native() is not None
+
+
+def new_hash(algorithm: str = DEFAULT_ALGORITHM) -> Any:
+    """Returns a hashlib-compatible object for ``algorithm``."""
+    if algorithm == BLAKE3:
+        native = _native()
+        if native is not None:
+            return native.blake3(max_threads=native.blake3.AUTO)
+        return Blake3()
+    return hashlib.new(algorithm)
+
+
+def check_algorithm(algorithm: str) -> None:
+    """Raises ``ValueError`` if ``algorithm`` is not available."""
+    if algorithm != BLAKE3 and algorithm not in hashlib.algorithms_available:
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+
+
+def hash_file(path: Union[str, os.PathLike], algorithm: str = DEFAULT_ALGORITHM) -> str:
+    """Hex digest of a file; BLAKE3 uses every core."""
+    if algorithm == BLAKE3:
+        native = _native()
+        if native is not None:
+            hasher = native.blake3(max_threads=native.blake3.AUTO)
+            hasher.update_mmap(os.fspath(path))
+            return hasher.hexdigest()
+        return blake3_file_python(os.fspath(path))
+    hasher = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Watch-mode ingestion of ``storage.incoming_dir`` (``glyph watch``).
+
+Change sources:
+
+* ``InotifyWatcher`` — Linux inotify through ``ctypes`` (no dependency):
+  only directories that changed are looked at, new sub-directories get
+  their own watch;
+* ``PollingWatcher`` — fallback that re-lists the tree every
+  ``poll_interval`` seconds and diffs (size, mtime).
+
+A candidate is ingested once its size and mtime have not changed for
+``settle_seconds`` (the writer is done). Ready files are grouped into
+batches (``batch_size`` files, or whatever is ready ``batch_delay`` seconds
+after the first one) and pushed through ``Client.add_many``. Processed
+files can be moved to ``processed_dir`` with ``move_file_with_verify``;
+otherwise they stay and are remembered so they are not offered again.
+"""
+
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from core.exceptions import DuplicateEntryError
+
+DEFAULT_IGNORE = (".*", "*.part", "*.tmp", "*.crdownload", "*.swp")
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+_WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+_EVENT = struct.Struct("iIII")
+
+Signature = Tuple[int, int]  # (size, mtime_ns)
+
+
+def _signature(path: str) -> Optional[Signature]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isfile(path):
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class _Filter:
+    def __init__(self, ignore: Iterable[str], exclude: Iterable[str]):
+        self.ignore = tuple(ignore)
+        self.exclude = {os.path.normpath(p) for p in exclude if p}
+
+    def skip_name(self, name: str) -> bool:
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.ignore)
+
+    def skip_dir(self, path: str) -> bool:
+        return os.path.normpath(path) in self.exclude
+
+
+def _scan_files(root: str, filt: _Filter) -> Dict[str, Signature]:
+    found: Dict[str, Signature] = {}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if filt.skip_name(entry.name):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if not filt.skip_dir(entry.path):
+                            stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        found[entry.path] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            continue  # каталог удалили во время обхода
+    return found
+
+
+# -------------------------------------------------
+# Change sources
+# -------------------------------------------------
+class PollingWatcher:
+    """Detects new or changed files by re-listing the tree."""
+
+    backend = "poll"
+
+    def __init__(self, root: str, filt: _Filter, interval: float = 1.0):
+        self.root = root
+        self.filt = filt
+        self.interval = interval
+        self._known: Dict[str, Signature] = {}
+
+    def initial(self) -> Set[str]:
+        self._known = _scan_files(self.root, self.filt)
+        return set(self._known)
+
+    def changes(self, timeout: float) -> Set[str]:
+        time.sleep(min(timeout, self.interval))
+        current = _scan_files(self.root, self.filt)
+        changed = {p for p, sig in current.items() if self._known.get(p) != sig}
+        self._known = current
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify over ``ctypes``; raises ``OSError`` if unavailable."""
+
+    backend = "inotify"
+
+    def __init__(self, root: str, filt: _Filter):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1: {os.strerror(err)}")
+        self.root = root
+        self.filt = filt
+        self._dirs: Dict[int, str] = {}
+
+    def _watch_tree(self, top: str) -> Set[str]:
+        """Adds watches under ``top``; returns files already there."""
+        files: Set[str] = set()
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            wd = self._add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if directory == self.root:
+                    raise OSError(err, f"inotify_add_watch: {os.strerror(err)}")
+                continue  # каталог исчез; ENOSPC — лимит watch-ей
+            self._dirs[wd] = directory
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if self.filt.skip_name(entry.name):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            if not self.filt.skip_dir(entry.path):
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            files.add(entry.path)
+            except OSError:
+                continue
+        return files
+
+    def initial(self) -> Set[str]:
+        return self._watch_tree(self.root)
+
+    def changes(self, timeout: float) -> Set[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed: Set[str] = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                wd, mask, _cookie, length = _EVENT.unpack_from(data, pos)
+                name = data[pos + _EVENT.size : pos + _EVENT.size + length]
+                pos += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    # очередь ядра переполнена: события потеряны, пересканируем
+                    changed |= _scan_files(self.root, self.filt).keys()
+                    continue
+                if mask & IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                name = os.fsdecode(name.rstrip(b"\0"))
+                if self.filt.skip_name(name):
+                    continue
+                path = os.path.join(directory, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and not self.filt.skip_dir(
+                        path
+                    ):
+                        changed |= self._watch_tree(path)
+                else:
+                    changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+# -------------------------------------------------
+# Stability + batching
+# -------------------------------------------------
+class StabilityTracker:
+    """Decides when a file is fully written: (size, mtime) unchanged for ``settle``."""
+
+    def __init__(self, settle: float = 2.0):
+        self.settle = settle
+        self._pending: Dict[str, Tuple[Signature, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def offer(self, path: str, now: float) -> None:
+        sig = _signature(path)
+        if sig is None:
+            self._pending.pop(path, None)
+            return
+        prev = self._pending.get(path)
+        if prev is None or prev[0] != sig:
+            self._pending[path] = (sig, now)
+
+    def ready(self, now: float) -> List[Tuple[str, Signature]]:
+        done = []
+        for path, (sig, since) in list(self._pending.items()):
+            current = _signature(path)
+            if current is None:
+                del self._pending[path]
+            elif current != sig:
+                self._pending[path] = (current, now)
+            elif now - since >= self.settle:
+                del self._pending[path]
+                done.append((path, sig))
+        return done
+
+
+@dataclass
+class WatchBatch:
+    added: List[Tuple[str, int]] = field(default_factory=list)  # (source, entry id)
+    duplicates: List[str] = field(default_factory=list)
+    failed: List[Tuple[str, str]] = field(default_factory=list)  # (source, error)
+    moved: int = 0
+
+
+class IncomingWatcher:
+    """Watches ``incoming_dir`` and ingests settled files in batches.
+
+    Args:
+        client (Client): Ingest target.
+        incoming_dir (Path): Directory to watch (recursively).
+        settle (float): Seconds a file's size and mtime must stay unchanged.
+        batch_size (int): Max files per ``add_many`` call.
+        batch_delay (float): Max seconds a ready file waits for its batch.
+        processed_dir (Path, optional): Processed and duplicate files are
+            moved here (verified move); kept in place if None.
+        backend (str): "auto" (inotify, else polling), "inotify" or "poll".
+        poll_interval (float): Polling period of the fallback.
+        ignore (iterable): ``fnmatch`` patterns of names to skip.
+        on_batch (callable, optional): Receives each ``WatchBatch``.
+        logger (logging.Logger, optional): Logger instance.
+    """
+
+    def __init__(
+        self,
+        client,
+        incoming_dir: Path,
+        settle: float = 2.0,
+        batch_size: int = 100,
+        batch_delay: float = 1.0,
+        processed_dir: Optional[Path] = None,
+        backend: str = "auto",
+        poll_interval: float = 1.0,
+        ignore: Iterable[str] = DEFAULT_IGNORE,
+        on_batch: Optional[Callable[[WatchBatch], None]] = None,
+        logger=None,
+    ):
+        self.client = client
+        self.root = str(Path(incoming_dir).expanduser().resolve())
+        self.processed_dir = (
+            Path(processed_dir).expanduser().resolve() if processed_dir else None
+        )
+        self.batch_size = max(1, batch_size)
+        self.batch_delay = batch_delay
+        self.on_batch = on_batch
+        self.logger = logger
+        self.tracker = StabilityTracker(settle)
+        # уже обработанные (оставленные на месте) и упавшие файлы: не предлагать снова,
+        # пока не изменятся
+        self._done: Dict[str, Signature] = {}
+        self._ready: List[str] = []
+        self._ready_since: Optional[float] = None
+        Path(self.root).mkdir(parents=True, exist_ok=True)
+
+        filt = _Filter(ignore, [str(self.processed_dir)] if self.processed_dir else [])
+        self.source = self._make_source(backend, filt, poll_interval)
+
+    def _make_source(self, backend: str, filt: _Filter, poll_interval: float):
+        if backend not in ("auto", "inotify", "poll"):
+            raise ValueError(f"Unknown watch backend: {backend}")
+        if backend != "poll":
+            try:
+                return InotifyWatcher(self.root, filt)
+            except OSError as exc:
+                if backend == "inotify":
+                    raise
+                if self.logger:
+                    self.logger.warning(f"inotify unavailable ({exc}); polling")
+        return PollingWatcher(self.root, filt, poll_interval)
+
+    @property
+    def backend(self) -> str:
+        return self.source.backend
+
+    def _offer(self, paths: Iterable[str], now: float) -> None:
+        for path in paths:
+            if path in self._done and self._done[path] == _signature(path):
+                continue
+            self._done.pop(path, None)
+            self.tracker.offer(path, now)
+
+    def _destination(self, path: str) -> Path:
+        dst = self.processed_dir / os.path.relpath(path, self.root)
+        counter = 1
+        while dst.exists():
+            dst = dst.with_name(f"{dst.stem}_{counter}{dst.suffix}")
+            counter += 1
+        return dst
+
+    def _finish(self, path: str, batch: WatchBatch) -> None:
+        if self.processed_dir is None:
+            sig = _signature(path)
+            if sig is not None:
+                self._done[path] = sig
+            return
+        from core.file_handler import move_file_with_verify
+
+        try:
+            move_file_with_verify(path, self._destination(path), logger=self.logger)
+            batch.moved += 1
+        except Exception as exc:  # noqa: BLE001
+            batch.failed.append((path, f"move failed: {exc}"))
+
+    def flush(self) -> Optional[WatchBatch]:
+        """Ingests up to ``batch_size`` ready files."""
+        if not self._ready:
+            return None
+        paths, self._ready = (
+            self._ready[: self.batch_size],
+            self._ready[self.batch_size :],
+        )
+        self._ready_since = time.monotonic() if self._ready else None
+        batch = WatchBatch()
+        result = self.client.add_many(paths)
+        for added in result.added:
+            batch.added.append((str(added.source), added.entry_id))
+            self._finish(str(added.source), batch)
+        for source, _stage, exc in result.errors:
+            if isinstance(exc, DuplicateEntryError):
+                batch.duplicates.append(str(source))
+                self._finish(str(source), batch)
+            else:
+                batch.failed.append((str(source), f"{exc.__class__.__name__}: {exc}"))
+                sig = _signature(str(source))
+                if sig is not None:
+                    self._done[str(source)] = (
+                        sig  # повтор — только после изменения файла
+                    )
+        if self.logger:
+            self.logger.info(
+                f"watch: {len(batch.added)} added, {len(batch.duplicates)} duplicates, "
+                f"{len(batch.failed)} failed"
+            )
+        if self.on_batch:
+            self.on_batch(batch)
+        return batch
+
+    def step(self, timeout: float) -> List[WatchBatch]:
+        """One iteration: collect events, promote settled files, flush due batches."""
+        changed = self.source.changes(timeout)
+        now = time.monotonic()
+        self._offer(changed, now)
+        for path, _sig in self.tracker.ready(now):
+            if path not in self._ready:
+                self._ready.append(path)
+        if self._ready and self._ready_since is None:
+            self._ready_since = now
+        batches = []
+        while self._ready and (
+            len(self._ready) >= self.batch_size
+            or now - self._ready_since >= self.batch_delay
+            or not len(self.tracker)
+        ):
+            batches.append(self.flush())
+        return batches
+
+    def run(
+        self, stop: Optional[threading.Event] = None, once: bool = False
+    ) -> List[WatchBatch]:
+        """Watches until ``stop`` is set; with ``once`` exits when idle.
+
+        Returns the batches processed (only collected when ``once``).
+        """
+        stop = stop or threading.Event()
+        collected: List[WatchBatch] = []
+        self._offer(self.source.initial(), time.monotonic())
+        tick = max(0.05, min(self.tracker.settle, self.batch_delay) / 4)
+        try:
+            while not stop.is_set():
+                batches = self.step(tick)
+                if once:
+                    collected.extend(batches)
+                    if not len(self.tracker) and not self._ready:
+                        break
+        finally:
+            self.source.close()
+        return collected
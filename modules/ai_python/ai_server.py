@@ -1,27 +1,149 @@
 #!/usr/bin/env python3
-import sys
+"""Glyph analysis service: line-delimited JSON over stdin/stdout.
+
+Runs for as long as stdin is open. Requests may carry an ``id``; responses
+echo it and can come back out of order, so a client can keep several
+requests in flight. Analysis runs in a pool of worker processes.
+
+Requests::
+
+    {"cmd": "analyze", "id": 1, "text": "..."}                  -> {"id": 1, "result": {...}}
+    {"cmd": "analyze", "id": 2, "path": "/file", "max_bytes": N}
+    {"cmd": "analyze_batch", "id": 3, "items": [{"key": "k", "text"|"path": ...}, ...]}
+        -> {"id": 3, "analyzer": "...",
+            "results": [{"key": "k", "result": {...}} | {"key": "k", "error": "..."}]}
+    {"cmd": "ping"}                                              -> {"result": "pong", "analyzer": ...}
+
+A request without ``id`` gets a response without ``id`` (one-shot use).
+"""
+
+import argparse
 import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+ANALYZER = "glyph-basic/1"
+DEFAULT_MAX_BYTES = 64 * 1024
+
+_WORD = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_STOPWORDS = {
+    "en": {"the", "and", "for", "that", "with", "this", "are", "was", "from", "not"},
+    "ru": {"что", "это", "как", "для", "его", "она", "они", "так", "все", "был"},
+    "de": {"und", "der", "die", "das", "nicht", "ist", "mit", "sich", "den", "auf"},
+    "fr": {"les", "des", "est", "que", "une", "pas", "pour", "dans", "qui", "sur"},
+    "es": {"los", "las", "que", "del", "una", "por", "con", "para", "como", "más"},
+}
+_ALL_STOPWORDS = set().union(*_STOPWORDS.values())
+
+
+def analyze_text(text: str) -> dict:
+    words = [w.lower() for w in _WORD.findall(text)]
+    scores = {
+        lang: sum(1 for w in words if w in stop) for lang, stop in _STOPWORDS.items()
+    }
+    language = max(scores, key=scores.get) if any(scores.values()) else "und"
+    summary = _SENTENCE.split(text.strip(), maxsplit=1)[0][:200] if text else ""
+    counts = Counter(w for w in words if w not in _ALL_STOPWORDS)
+    return {
+        "language": language,
+        "summary": " ".join(summary.split()),
+        "keywords": [w for w, _ in counts.most_common(5)],
+        "words": len(words),
+    }
 
-def main():
-    for line in sys.stdin:
-        try:
-            req = json.loads(line)
-        except Exception:
-            print(json.dumps({"error": "Invalid JSON"}))
-            continue
 
+def analyze_item(item: dict) -> dict:
+    if "text" in item:
+        text = item["text"]
+    elif "path" in item:
+        with open(item["path"], "rb") as f:
+            text = f.read(item.get("max_bytes", DEFAULT_MAX_BYTES)).decode(
+                "utf-8", errors="replace"
+            )
+    else:
+        raise ValueError("item needs 'text' or 'path'")
+    return analyze_text(text)
+
+
+def _safe_analyze(item: dict) -> dict:
+    # ошибки элемента не должны ронять всю пачку
+    try:
+        return {"key": item.get("key"), "result": analyze_item(item)}
+    except Exception as exc:  # noqa: BLE001
+        return {"key": item.get("key"), "error": f"{exc.__class__.__name__}: {exc}"}
+
+
+class Server:
+    def __init__(self, workers: int):
+        # spawn, не fork: главный поток держит блокировку stdin в readline,
+        # а форкнутый воркер закрывает sys.stdin при старте и зависает на ней
+        self.pool = (
+            ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            if workers > 1
+            else None
+        )
+        self.requests = ThreadPoolExecutor(max_workers=max(2, workers))
+        self._out = threading.Lock()
+
+    def reply(self, req_id, payload: dict) -> None:
+        if req_id is not None:
+            payload = {"id": req_id, **payload}
+        line = json.dumps(payload, ensure_ascii=False)
+        with self._out:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+    def _map(self, items):
+        if self.pool is None:
+            return [_safe_analyze(item) for item in items]
+        return list(self.pool.map(_safe_analyze, items, chunksize=4))
+
+    def handle(self, req: dict) -> None:
+        req_id = req.get("id")
         cmd = req.get("cmd")
-        if cmd == "analyze":
-            # Простейший анализ: возвращаем заглушку
-            result = {
-                "language": "en",
-                "summary": "This is a stub summary.",
-                "keywords": ["stub", "test"],
-            }
-            print(json.dumps({"result": result}))
-        else:
-            print(json.dumps({"error": f"Unknown command: {cmd}"}))
+        try:
+            if cmd == "analyze":
+                (out,) = self._map([req])
+                out.pop("key", None)
+                self.reply(req_id, out)
+            elif cmd == "analyze_batch":
+                results = self._map(req.get("items", []))
+                self.reply(req_id, {"analyzer": ANALYZER, "results": results})
+            elif cmd == "ping":
+                self.reply(req_id, {"result": "pong", "analyzer": ANALYZER})
+            else:
+                self.reply(req_id, {"error": f"Unknown command: {cmd}"})
+        except Exception as exc:  # noqa: BLE001
+            self.reply(req_id, {"error": f"{exc.__class__.__name__}: {exc}"})
+
+    def serve(self, stream) -> None:
+        for line in stream:
+            if not line.strip():
+                continue
+            try:
+                req = json.loads(line)
+            except Exception:
+                self.reply(None, {"error": "Invalid JSON"})
+                continue
+            self.requests.submit(self.handle, req)
+        self.requests.shutdown(wait=True)
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+    Server(args.workers).serve(sys.stdin)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 use serde::{Deserialize, Serialize};
+use std::fs::File;
 use std::io::{self, BufRead};
 use sha2::{Sha256, Digest};
 use aes_gcm::{
@@ -11,6 +12,7 @@ use base64::{engine::general_purpose::STANDARD as BASE64, Engine as _};
 struct Request {
     cmd: String,
     data: Option<String>,          // hex-encoded bytes
+    path: Option<String>,          // файл для хеширования (вместо data)
     algorithm: Option<String>,
     key: Option<String>,           // для шифрования
 }
@@ -49,6 +51,13 @@ fn main() {
 }
 
 fn handle_hash(req: &Request) -> Response {
+    let algo = req.algorithm.as_deref().unwrap_or("sha256");
+    if let Some(path) = &req.path {
+        return match hash_path(path, algo) {
+            Ok(digest) => Response { result: Some(digest), error: None },
+            Err(e) => Response { result: None, error: Some(e) },
+        };
+    }
     let data_hex = match &req.data {
         Some(d) => d,
         None => return Response { result: None, error: Some("Missing data".to_string()) },
@@ -57,7 +66,6 @@ fn handle_hash(req: &Request) -> Response {
         Ok(d) => d,
         Err(e) => return Response { result: None, error: Some(format!("Invalid hex: {}", e)) },
     };
-    let algo = req.algorithm.as_deref().unwrap_or("sha256");
     match algo {
         "sha256" => {
             let mut hasher = Sha256::new();
@@ -65,10 +73,36 @@ fn handle_hash(req: &Request) -> Response {
             let result = hasher.finalize();
             Response { result: Some(hex::encode(result)), error: None }
         }
+        "blake3" => {
+            let mut hasher = blake3::Hasher::new();
+            hasher.update_rayon(&data);
+            Response { result: Some(hasher.finalize().to_hex().to_string()), error: None }
+        }
         _ => Response { result: None, error: Some(format!("Unsupported hash algorithm: {}", algo)) },
     }
 }
 
+/// Хеширует файл, не передавая его содержимое через IPC.
+/// BLAKE3: mmap + rayon, большие файлы считаются на всех ядрах.
+fn hash_path(path: &str, algo: &str) -> Result<String, String> {
+    match algo {
+        "sha256" => {
+            let mut file = File::open(path).map_err(|e| format!("Cannot open {}: {}", path, e))?;
+            let mut hasher = Sha256::new();
+            io::copy(&mut file, &mut hasher).map_err(|e| format!("Read failed: {}", e))?;
+            Ok(hex::encode(hasher.finalize()))
+        }
+        "blake3" => {
+            let mut hasher = blake3::Hasher::new();
+            hasher
+                .update_mmap_rayon(path)
+                .map_err(|e| format!("Cannot hash {}: {}", path, e))?;
+            Ok(hasher.finalize().to_hex().to_string())
+        }
+        _ => Err(format!("Unsupported hash algorithm: {}", algo)),
+    }
+}
+
 fn handle_encrypt(req: &Request) -> Response {
     let data_hex = match &req.data {
         Some(d) => d,
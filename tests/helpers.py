@@ -0,0 +1,20 @@
+"""Shared helpers for the test modules."""
+
+from pathlib import Path
+
+
+def make_config(tmp: Path, encrypt: bool = False) -> dict:
+    """Minimal client config with every path under ``tmp``."""
+    return {
+        "logging": {"audit_file": str(tmp / "audit.jsonl")},
+        "storage": {"archive_dir": str(tmp / "archive")},
+        "metadata": {"database": str(tmp / "metadata.db")},
+        "security": {
+            "hash_algo": "sha256",
+            "encryption": {
+                "enabled": encrypt,
+                "algorithm": "aes-256-gcm",
+                "key_env_var": "GLYPH_TEST_UNSET_KEY",
+            },
+        },
+    }
@@ -0,0 +1,66 @@
+"""
+Бюджет холодного старта CLI: `glyph` вызывают из shell-скриптов в цикле.
+Запуск: pytest tests/load/test_startup.py -s
+Бюджет (мс) можно переопределить через GLYPH_IMPORT_BUDGET_MS.
+"""
+
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+IMPORT_BUDGET_MS = float(os.environ.get("GLYPH_IMPORT_BUDGET_MS", "150"))
+
+# тяжёлые модули, которые нужны только отдельным подкомандам
+DEFERRED = (
+    "asyncio",
+    "pydantic",
+    "cryptography",
+    "concurrent.futures.process",
+    "core.crypto",
+    "core.ingest",
+    "core.ipc",
+    "core.keys",
+    "core.pipeline",
+    "core.sync",
+)
+
+
+def _importtime(module: str):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)", line)
+        if m:
+            cumulative[m.group(2)] = int(m.group(1))
+    return cumulative
+
+
+def test_cli_import_defers_heavy_modules():
+    imported = _importtime("core.orchestrator")
+    loaded = [m for m in DEFERRED if m in imported]
+    assert not loaded, f"imported at CLI startup: {loaded}"
+
+
+def test_ipc_schema_import_is_lazy():
+    assert "pydantic" not in _importtime("core.ipc_schema")
+
+
+def test_cli_import_time_budget():
+    # лучший из нескольких запусков: отсекаем шум холодного кэша ФС
+    best_ms = min(
+        _importtime("core.orchestrator")["core.orchestrator"] for _ in range(3)
+    )
+    best_ms /= 1000
+    print(
+        f"\ncore.orchestrator import: {best_ms:.1f} ms (budget {IMPORT_BUDGET_MS} ms)"
+    )
+    assert best_ms < IMPORT_BUDGET_MS
@@ -0,0 +1,198 @@
+import json
+import socket
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from core.ai_bridge import AIClient, AIRequestError, ResponseCache, TokenBucket
+
+
+class _Stub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.connections = set()
+        self.active = 0
+        self.peak = 0
+        self.failures = {}  # prompt -> статусы, которые вернуть перед успехом
+        self.delay = 0.0
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/chat/completions"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][0]["content"]
+        with server.lock:
+            server.requests.append(body)
+            server.connections.add(self.client_address)
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            pending = server.failures.get(prompt)
+            status = pending.pop(0) if pending else 200
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+        payload = json.dumps(
+            {
+                "model": body["model"],
+                "choices": [{"message": {"content": prompt[::-1]}}],
+            }
+            if status == 200
+            else {"error": status}
+        ).encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0.05")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def stub():
+    server = _Stub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _answer(response) -> str:
+    return response["choices"][0]["message"]["content"]
+
+
+def test_concurrency_limit_and_keep_alive(stub):
+    stub.delay = 0.05
+    with AIClient(stub.endpoint, max_concurrency=3, backoff=0.01) as client:
+        prompts = [f"doc {i}" for i in range(24)] + ["doc 0", "doc 1"]
+        answers = client.complete_many(prompts)
+        assert [_answer(a) for a in answers] == [p[::-1] for p in prompts]
+        # одинаковые промпты отправлены один раз
+        assert len(stub.requests) == 24
+        assert stub.peak == 3
+        # соединения переиспользуются: не больше, чем слотов
+        assert client._pool.opened <= 3 and len(stub.connections) <= 3
+
+
+def test_retries_with_backoff_then_gives_up(stub):
+    stub.failures = {"flaky": [429, 503], "broken": [500] * 10, "bad": [400]}
+    with AIClient(stub.endpoint, max_retries=2, backoff=0.01) as client:
+        assert _answer(client.complete("flaky")) == "ykalf"
+        assert client.stats["retries"] == 2
+
+        with pytest.raises(AIRequestError) as err:
+            client.complete("broken")
+        assert err.value.status == 500
+        # 4xx (кроме 429) не повторяются
+        with pytest.raises(AIRequestError):
+            client.complete("bad")
+        assert [r["messages"][0]["content"] for r in stub.requests].count("bad") == 1
+
+
+def test_connection_errors_are_retried():
+    # порт без сервера: каждая попытка — ошибка соединения
+    with AIClient("http://127.0.0.1:9/v1", max_retries=1, backoff=0.01) as client:
+        with pytest.raises(AIRequestError):
+            client.complete("nobody home")
+        assert client.stats["retries"] == 1
+
+
+def test_stale_connection_is_resent_but_timeouts_back_off(stub):
+    with AIClient(stub.endpoint, max_retries=1, backoff=0.01, timeout=0.2) as client:
+        client.complete("warm up")
+        # сервер «закрыл» простаивавшее соединение: повтор сразу, без попытки
+        conn, reused = client._pool.get()
+        assert reused
+        conn.sock.shutdown(socket.SHUT_RDWR)
+        client._pool.put(conn)
+        assert _answer(client.complete("stale")) == "elats"
+        assert client.stats["retries"] == 0
+
+        # таймаут на живом соединении — обычный повтор с backoff
+        stub.delay = 0.5
+        with pytest.raises(AIRequestError):
+            client.complete("slow")
+        assert client.stats["retries"] == 1
+        prompts = [r["messages"][0]["content"] for r in stub.requests]
+        assert prompts.count("slow") == 2
+
+
+def test_token_bucket_spaces_requests(stub):
+    with AIClient(stub.endpoint, max_concurrency=4, rate=20, burst=1) as client:
+        start = time.monotonic()
+        client.complete_many(f"p{i}" for i in range(6))
+        assert time.monotonic() - start >= 0.2
+
+    bucket = TokenBucket(rate=1000, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05  # запас на всплеск
+
+
+def test_disk_cache_by_model_and_prompt_with_ttl(stub):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "cache.db"
+        with AIClient(stub.endpoint, cache=ResponseCache(path, ttl=60)) as client:
+            client.complete("same", temperature=0)
+            client.complete("same", temperature=0)
+            client.complete("same", temperature=0.5)
+            client.complete("same", model="other-model", temperature=0)
+            assert len(stub.requests) == 3 and client.stats["cache_hits"] == 1
+
+        # кэш на диске переживает клиента
+        with AIClient(stub.endpoint, cache=ResponseCache(path, ttl=60)) as client:
+            assert _answer(client.complete("same", temperature=0)) == "emas"
+            assert len(stub.requests) == 3
+
+        short = ResponseCache(path, ttl=0.05)
+        with AIClient(stub.endpoint, cache=short) as client:
+            client.complete("fresh")
+            time.sleep(0.1)
+            client.complete("fresh")
+            assert len(stub.requests) == 5
+        time.sleep(0.1)
+        key = ResponseCache.key(
+            "m", {"messages": [{"role": "user", "content": "fresh"}]}
+        )
+        # просроченные записи не отдаются и удаляются evict_expired
+        assert short.get("gpt-3.5-turbo", key) is None
+        assert short.evict_expired() == 1  # записи с ttl=60 живы
+
+
+def test_from_config_reads_ai_section(stub, monkeypatch):
+    monkeypatch.setenv("GLYPH_TEST_AI_KEY", "secret")
+    client = AIClient.from_config(
+        {
+            "ai": {
+                "endpoint": stub.endpoint,
+                "model": "stub-model",
+                "api_key_env": "GLYPH_TEST_AI_KEY",
+                "max_concurrency": 2,
+            }
+        }
+    )
+    with client:
+        assert client.complete("hi")["model"] == "stub-model"
+        assert client.api_key == "secret" and client.cache is None
+    with pytest.raises(ValueError):
+        AIClient("ftp://example.com/")
@@ -0,0 +1,108 @@
+import asyncio
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from core.aio import AsyncClient
+from core.exceptions import DuplicateEntryError
+from helpers import make_config
+
+
+def test_async_add_verify_list_search():
+    async def scenario(tmp: Path):
+        files = []
+        for i in range(20):
+            p = tmp / f"doc{i}.txt"
+            p.write_text(f"async payload {i}")
+            files.append(p)
+
+        async with AsyncClient(make_config(tmp), max_concurrency=8) as client:
+            results = await client.add_many(files, author="Ann")
+            assert all(not isinstance(r, Exception) for r in results)
+            assert len({r.entry_id for r in results}) == 20
+
+            with pytest.raises(DuplicateEntryError):
+                await client.add(files[0])
+
+            checks = await asyncio.gather(
+                *(client.verify(id=r.entry_id) for r in results)
+            )
+            assert all(c.ok for c in checks)
+            assert len(await client.list(limit=100)) == 20
+            found = await client.search("doc1")
+            assert {e.title for e in found} == {f"doc{i}" for i in (1, *range(10, 20))}
+            assert await client.get(results[3].entry_id, 6, 13) == b"payload"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        asyncio.run(scenario(Path(tmpdir)))
+
+
+def test_async_add_cancel_removes_partial_archive():
+    async def scenario(tmp: Path):
+        src = tmp / "slow.bin"
+        src.write_bytes(b"x" * 1024)
+        async with AsyncClient(make_config(tmp)) as client:
+            stages = await client._run(client._ingest_stages)
+            release = threading.Event()
+            original = stages.archive
+
+            def slow_archive(item):
+                out = original(item)
+                release.wait(5)
+                return out
+
+            stages.archive = slow_archive
+            with pytest.raises(TimeoutError):
+                await client.add(src, timeout=0.2)
+            release.set()
+            await asyncio.sleep(0)
+            await client._run(time.sleep, 0.05)
+
+            archive_dir = tmp / "archive"
+            assert not any(archive_dir.iterdir())
+            assert await client.list() == []
+            stages.archive = original
+            assert (await client.add(src)).entry_id
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        asyncio.run(scenario(Path(tmpdir)))
+
+
+def test_async_seen_is_released_after_register_and_on_cancel():
+    async def scenario(tmp: Path):
+        src = tmp / "again.txt"
+        src.write_text("same content")
+        async with AsyncClient(make_config(tmp)) as client:
+            stages = await client._run(client._ingest_stages)
+            first = await client.add(src)
+            assert stages.seen == set()
+            # после удаления записи то же содержимое добавляется снова
+            client.client.store.delete_entries([first.entry_id])
+            second = await client.add(src)
+            assert second.entry_id != first.entry_id
+
+            # отмена во время dedup не оставляет хеш занятым
+            other = tmp / "other.txt"
+            other.write_text("other content")
+            release = threading.Event()
+            original = stages.dedup
+
+            def slow_dedup(item):
+                out = original(item)
+                release.wait(5)
+                return out
+
+            stages.dedup = slow_dedup
+            with pytest.raises(TimeoutError):
+                await client.add(other, timeout=0.2)
+            release.set()
+            await client._run(time.sleep, 0.05)
+            assert stages.seen == set()
+            stages.dedup = original
+            assert (await client.add(other)).entry_id
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        asyncio.run(scenario(Path(tmpdir)))
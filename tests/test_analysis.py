@@ -0,0 +1,187 @@
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from core.client import Client
+from core.crypto import generate_key
+from core.ipc import PersistentModuleIPC
+from core.sharding import ShardedMetadataStore, reshard
+from helpers import make_config
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+AI_SERVER = PROJECT_ROOT / "modules" / "ai_python" / "ai_server.py"
+
+TEXT = "The archive keeps every manuscript. Glyph archive verifies manuscript hashes."
+
+
+def _analysis_config(tmp: Path, encrypt: bool = False) -> dict:
+    config = make_config(tmp, encrypt=encrypt)
+    config["analysis"] = {"enabled": True, "batch_size": 4, "concurrency": 2}
+    config["modules"] = {"ai": {"path": str(AI_SERVER), "workers": 2}}
+    return config
+
+
+def test_persistent_module_multiplexes_batches():
+    ipc = PersistentModuleIPC(AI_SERVER, args=["--workers", "2"])
+    try:
+        assert ipc.call({"cmd": "ping"})["result"] == "pong"
+        pid = ipc._proc.pid
+
+        def batch(i):
+            items = [{"key": f"{i}-{j}", "text": f"{TEXT} batch{i}"} for j in range(5)]
+            return i, ipc.call({"cmd": "analyze_batch", "items": items})
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            responses = list(pool.map(batch, range(12)))
+        for i, response in responses:
+            assert [r["key"] for r in response["results"]] == [
+                f"{i}-{j}" for j in range(5)
+            ]
+            result = response["results"][0]["result"]
+            assert result["language"] == "en"
+            assert result["keywords"][:2] == ["archive", "manuscript"]
+        # один процесс на все запросы
+        assert ipc._proc.pid == pid
+
+        response = ipc.call(
+            {"cmd": "analyze_batch", "items": [{"key": "x", "path": "/nonexistent"}]}
+        )
+        assert "FileNotFoundError" in response["results"][0]["error"]
+    finally:
+        ipc.close()
+
+
+def test_analysis_is_cached_by_content_hash():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        sources = []
+        for i in range(6):
+            src = tmp / f"doc{i}.txt"
+            src.write_text(f"{TEXT} Document number {i}.")
+            sources.append(src)
+
+        with Client(_analysis_config(tmp)) as client:
+            added = client.add_many(sources).added
+            # add не ждёт анализа: только очередь
+            assert client.analysis_summary() == {
+                "analyzed": 0,
+                "queued": 6,
+                "failed": 0,
+            }
+            report = client.analyze_pending()
+            assert (report.analyzed, report.failed) == (6, 0)
+            first = next(a for a in added if a.source == sources[0].resolve())
+            cached = client.analysis(first.entry_id)
+            assert cached["analyzer"] == "glyph-basic/1"
+            assert cached["result"]["summary"] == "The archive keeps every manuscript."
+
+            # удаление записи и повторное добавление того же содержимого
+            # из другого места не ставит его в очередь снова
+            client.store.delete_entries([first.entry_id])
+            first.file_path.unlink()
+            moved = tmp / "moved" / "renamed.txt"
+            moved.parent.mkdir()
+            moved.write_text(sources[0].read_text())
+            again = client.add(moved)
+            assert client.analysis_summary()["queued"] == 0
+            assert client.analyze_pending().batches == 0
+            assert client.analysis(again.entry_id)["result"] == cached["result"]
+
+            # записи, добавленные до включения анализа, — через backfill
+            client.config["analysis"]["enabled"] = False
+            late = tmp / "late.txt"
+            late.write_text("Added while analysis was off.")
+            late_id = client.add(late).entry_id
+            assert client.analysis(late_id) is None
+            assert client.analyze_pending(backfill=True).analyzed == 1
+            assert client.analysis(late_id) is not None
+
+
+def test_analysis_reads_encrypted_content_and_gives_up_on_failures():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        src, gone = tmp / "secret.txt", tmp / "gone.txt"
+        src.write_text(TEXT)
+        gone.write_text("This file will disappear from the archive.")
+        config = _analysis_config(tmp, encrypt=True)
+        config["analysis"]["max_attempts"] = 2
+
+        with Client(config, master_key=generate_key()) as client:
+            secret = client.add(src)
+            missing = client.add(gone)
+            missing.file_path.unlink()
+
+            report = client.analyze_pending()
+            assert (report.analyzed, report.failed) == (1, 1)
+            assert client.analysis(secret.entry_id)["result"]["language"] == "en"
+            # повтор — после retry_delay
+            assert client.analyze_pending().batches == 0
+            # вторая неудача исчерпывает max_attempts: хеш больше не берётся
+            client.store.fail_analysis([(missing.hash, "still missing")], 0)
+            assert client.analyze_pending().batches == 0
+            assert client.analysis_summary() == {
+                "analyzed": 1,
+                "queued": 0,
+                "failed": 1,
+            }
+
+
+def test_analysis_reads_encrypted_text_past_one_segment():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        src = tmp / "long.txt"
+        src.write_text(" ".join([TEXT] * 2500))  # ~200 КБ: четыре сегмента
+        config = _analysis_config(tmp, encrypt=True)
+        config["analysis"]["max_bytes"] = 256 * 1024
+
+        with Client(config, master_key=generate_key()) as client:
+            added = client.add(src)
+            assert client.analyze_pending().analyzed == 1
+            # анализатору ушёл весь текст, а не первый сегмент в 64 КиБ
+            result = client.analysis(added.entry_id)["result"]
+            assert result["words"] == 10 * 2500  # в TEXT 10 слов от трёх букв
+
+
+def test_background_enrichment_after_add():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        with Client(_analysis_config(tmp)) as client:
+            client.start_enrichment()
+            src = tmp / "bg.txt"
+            src.write_text(TEXT)
+            entry_id = client.add(src).entry_id
+            deadline = time.monotonic() + 20
+            while client.analysis(entry_id) is None and time.monotonic() < deadline:
+                time.sleep(0.05)
+            assert client.analysis(entry_id) is not None
+            assert client.enricher.totals.analyzed == 1
+
+
+def test_sharded_analysis_queue_routes_by_hash():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = ShardedMetadataStore(Path(tmpdir) / "metadata.db", 3)
+        hashes = [f"{i:02x}" + "0" * 62 for i in range(0, 256, 16)]
+        for h in hashes:
+            store.add_entry(f"/f/{h}", h, {}, enqueue_analysis=True)
+        assert store.enqueue_analysis(hashes) == 0  # уже в очереди
+
+        claimed = store.claim_analysis(100)
+        assert sorted(claimed) == hashes
+        assert store.claim_analysis(100) == []  # аренда ещё действует
+        store.put_analysis((h, {"n": i}, "test") for i, h in enumerate(hashes[:-1]))
+        store.fail_analysis([(hashes[-1], "boom")])
+        assert store.claim_analysis(100, max_attempts=3) == []  # retry_delay
+        assert store.get_analysis(hashes[3])["result"] == {"n": 3}
+        assert store.analysis_summary(max_attempts=1) == {
+            "analyzed": len(hashes) - 1,
+            "queued": 0,
+            "failed": 1,
+        }
+        assert store.enqueue_analysis(hashes) == 0
+
+        # решардинг сохраняет аренду и задержку повтора
+        reshard(Path(tmpdir) / "metadata.db", 3, 2)
+        moved = ShardedMetadataStore(Path(tmpdir) / "metadata.db", 2)
+        assert moved.claim_analysis(100, max_attempts=3) == []
+        assert moved.analysis_summary(max_attempts=1)["failed"] == 1
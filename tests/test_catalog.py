@@ -0,0 +1,81 @@
+import io
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from core.catalog import MAGIC, import_catalog, export_catalog, read_catalog
+from core.metadata_store import MetadataStore
+from core.sharding import ShardedMetadataStore
+
+
+def _hash(i: int) -> str:
+    return f"{i * 2654435761 % 2**32:08x}" + "0" * 56
+
+
+def _fill(store, n: int) -> None:
+    for i in range(n):
+        meta = {"title": f"T{i}", "size_bytes": i}
+        if i % 3:
+            meta["author"] = f"A{i % 4}"
+        if i % 2:
+            meta["tags"] = ["x", f"t{i % 5}"]
+        data_key = ("k1", bytes([i % 256]) * 40) if i % 4 else None
+        store.add_entry(f"/f/{i}", _hash(i), meta, data_key)
+    store.get_or_set_meta("kdf_salt", "c2FsdA==")
+
+
+def _snapshot(store):
+    keys = store.get_data_keys(e["id"] for e in store.iter_entries())
+    return sorted(store.iter_entries(), key=lambda e: e["id"]), keys
+
+
+def test_export_import_roundtrip_single_to_sharded_and_back():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = MetadataStore(str(Path(tmpdir) / "src.db"))
+        _fill(src, 50)
+        src.update_verification("/f/3", True)
+        buf = io.BytesIO()
+        assert export_catalog(src, buf, group_size=16) == 50
+        assert buf.getvalue().startswith(MAGIC)
+
+        buf.seek(0)
+        sharded = ShardedMetadataStore(Path(tmpdir) / "sharded.db", 3)
+        assert import_catalog(sharded, buf, batch_size=7) == 50
+        assert _snapshot(sharded) == _snapshot(src)
+        assert sharded.count(tag="x") == 25
+        assert sharded.count(author="A1") == src.count(author="A1")
+        assert sharded.get_or_set_meta("kdf_salt", "other") == "c2FsdA=="
+        # новые id не пересекаются с импортированными
+        new_id = sharded.add_entry("/f/new", _hash(1000), {"title": "N"})
+        assert new_id > 50 and sharded.get_entry_by_id(new_id)["hash"] == _hash(1000)
+
+        out = io.BytesIO()
+        export_catalog(sharded, out)
+        out.seek(0)
+        back = MetadataStore(str(Path(tmpdir) / "back.db"))
+        assert import_catalog(back, out) == 51
+        assert _snapshot(back) == _snapshot(sharded)
+
+
+def test_import_rejects_non_empty_and_corrupt_snapshots():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = MetadataStore(str(Path(tmpdir) / "src.db"))
+        _fill(src, 5)
+        buf = io.BytesIO()
+        export_catalog(src, buf)
+        with pytest.raises(ValueError):
+            import_catalog(src, io.BytesIO(buf.getvalue()))
+
+        data = bytearray(buf.getvalue())
+        data[-20] ^= 0xFF
+        _, entries = read_catalog(io.BytesIO(bytes(data)))
+        with pytest.raises(ValueError):
+            list(entries)
+
+        empty = MetadataStore(str(Path(tmpdir) / "empty.db"))
+        with pytest.raises(ValueError):
+            import_catalog(empty, io.BytesIO(bytes(buf.getvalue()[:-30])))
+        assert empty.count() == 0  # транзакция откатилась
+        with pytest.raises(ValueError):
+            import_catalog(empty, io.BytesIO(b"not a snapshot"))
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from core.aio import AsyncClient
+from core.client import Client
+from core.crypto import generate_key
+from core.exceptions import ConfigError, DuplicateEntryError, EntryNotFoundError
+from helpers import make_config
+
+
+def test_client_add_verify_list_get():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        src = tmp / "note.txt"
+        src.write_text("Hello, Glyph!")
+
+        with Client(make_config(tmp)) as client:
+            added = client.add(src, title="Note", tags=["a", "b"])
+            assert added.file_path.exists()
+
+            with pytest.raises(DuplicateEntryError):
+                client.add(src)
+
+            assert client.verify(id=added.entry_id).ok
+            assert client.verify(path=added.file_path).ok
+            entries = client.list()
+            assert [e.title for e in entries] == ["Note"]
+            assert client.get(added.entry_id, 7, 12) == b"Glyph"
+
+            added.file_path.write_text("tampered")
+            result = client.verify(hash=added.hash)
+            assert not result.ok
+            assert not client.list()[0].verified
+
+            with pytest.raises(EntryNotFoundError):
+                client.verify(id=999)
+
+
+def test_client_verifies_mixed_hash_algorithms():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        old, new = tmp / "old.txt", tmp / "new.txt"
+        old.write_text("hashed with sha256")
+        new.write_text("hashed with blake3")
+
+        with Client(make_config(tmp)) as client:
+            first = client.add(old)
+        config = make_config(tmp)
+        config["security"]["hash_algo"] = "blake3"
+        with Client(config) as client:
+            second = client.add(new)
+            assert client.entry(first.entry_id).hash_algo == "sha256"
+            assert client.entry(second.entry_id).hash_algo == "blake3"
+            assert client.verify(id=first.entry_id).ok
+            assert client.verify(id=second.entry_id).ok
+
+        config["security"]["hash_algo"] = "no-such-hash"
+        with pytest.raises(ConfigError):
+            Client(config)
+
+
+def test_client_encrypted_add_many_and_verify_many():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        files = []
+        for i in range(5):
+            p = tmp / f"f{i}.txt"
+            p.write_text(f"secret {i}")
+            files.append(p)
+
+        client = Client(make_config(tmp, encrypt=True), master_key=generate_key())
+        result = client.add_many(files + [files[0]], workers=2)
+        assert len(result.added) == 5
+        assert len(result.errors) == 1
+        assert all(a.file_path.suffix == ".enc" for a in result.added)
+
+        ids = [a.entry_id for a in result.added]
+        assert all(r.ok for r in client.verify_many(ids + [999]) if r.entry_id != 999)
+        first = min(result.added, key=lambda a: a.entry_id)
+        assert client.get(first.entry_id).startswith(b"secret")
+
+
+def test_client_get_range_spanning_segments():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        src = tmp / "big.bin"
+        data = os.urandom(64 * 1024 * 3 + 11)
+        src.write_bytes(data)
+        config, key = make_config(tmp, encrypt=True), generate_key()
+        with Client(config, master_key=key) as client:
+            entry_id = client.add(src).entry_id
+            assert client.get(entry_id, 65000, 70000) == data[65000:70000]
+            end = 64 * 1024 * 3
+            assert client.get(entry_id, 100, end) == data[100:end]
+            assert client.get(entry_id) == data
+
+        async def via_async():
+            async with AsyncClient(config, master_key=key) as client:
+                return await client.get(entry_id, 65000, 70000)
+
+        assert asyncio.run(via_async()) == data[65000:70000]
+
+
+def test_client_creates_subsystems_lazily():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        with Client(make_config(tmp)) as client:
+            assert not (tmp / "metadata.db").exists()
+            assert client.list() == []
+            assert (tmp / "metadata.db").exists()
+            assert not (tmp / "audit.jsonl").exists()
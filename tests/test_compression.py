@@ -0,0 +1,107 @@
+import io
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from core.client import Client
+from core.crypto import generate_key
+from core.exceptions import DuplicateEntryError
+from helpers import make_config
+
+zstandard = pytest.importorskip("zstandard")
+
+
+def _compressed_config(tmp: Path, encrypt: bool = False) -> dict:
+    config = make_config(tmp, encrypt=encrypt)
+    config["compression"] = {"enabled": True, "level": 3, "skip_suffixes": [".gz"]}
+    return config
+
+
+@pytest.mark.parametrize("encrypt", [False, True])
+def test_compressed_add_verify_get(encrypt):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        text = "".join(f"line {i}: the quick brown fox\n" for i in range(5000)).encode()
+        src = tmp / "corpus.txt"
+        src.write_bytes(text)
+        key = generate_key() if encrypt else None
+
+        with Client(_compressed_config(tmp, encrypt), master_key=key) as client:
+            added = client.add(src)
+            assert added.file_path.name == "corpus.txt.zst" + (
+                ".enc" if encrypt else ""
+            )
+            meta = client.entry(added.entry_id).metadata
+            assert meta["compression"] == "zstd"
+            assert meta["size_bytes"] == len(text)
+            assert meta["stored_size_bytes"] == added.file_path.stat().st_size
+            assert meta["stored_size_bytes"] < len(text) // 5
+            assert client.verify(id=added.entry_id).actual == added.hash
+
+            assert client.get(added.entry_id) == text
+            assert client.get(added.entry_id, 1000, 1010) == text[1000:1010]
+            with client.open(added.entry_id) as f:
+                f.seek(50000)
+                f.seek(10)
+                assert f.read(5) == text[10:15]
+
+            with pytest.raises(DuplicateEntryError):
+                client.add(src)
+
+            raw = bytearray(added.file_path.read_bytes())
+            raw[len(raw) // 2] ^= 0xFF
+            added.file_path.write_bytes(bytes(raw))
+            assert not client.verify(id=added.entry_id).ok
+
+
+def test_trained_dictionary_for_small_files():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        files = []
+        for i in range(40):
+            p = tmp / f"note{i}.txt"
+            p.write_text(
+                f'{{"id": {i}, "kind": "note", "status": "draft", '
+                f'"body": "meeting notes number {i * 7} about the quarterly plan"}}\n'
+            )
+            files.append(p)
+        with Client(_compressed_config(tmp)) as client:
+            assert client.add_many(files[:30]).ok
+            dict_id, used = client.train_dictionary(".txt", samples=30, size=4096)
+            assert used == 30
+
+            added = client.add(files[35])
+            meta = client.entry(added.entry_id).metadata
+            assert meta["compression_dict"] == dict_id
+            assert client.get(added.entry_id) == files[35].read_bytes()
+            assert client.verify(id=added.entry_id).ok
+
+        # словарь хранится в каталоге: новый клиент его находит
+        with Client(_compressed_config(tmp)) as client:
+            assert client.get(added.entry_id) == files[35].read_bytes()
+
+
+def test_skip_suffixes_store_as_is():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        src = tmp / "data.gz"
+        src.write_bytes(b"\x1f\x8b" + bytes(100))
+        with Client(_compressed_config(tmp)) as client:
+            added = client.add(src)
+            assert added.file_path.name == "data.gz"
+            assert "compression" not in client.entry(added.entry_id).metadata
+            assert client.get(added.entry_id) == src.read_bytes()
+
+
+def test_decompressed_reader_seeks_both_ways():
+    from core.compression import DecompressedReader
+
+    data = bytes(range(256)) * 1000
+    blob = zstandard.ZstdCompressor().compress(data)
+    with DecompressedReader(io.BytesIO(blob)) as f:
+        assert f.read(10) == data[:10]
+        f.seek(200000)
+        assert f.read(3) == data[200000:200003]
+        f.seek(5)
+        assert f.read(3) == data[5:8]
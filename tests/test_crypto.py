@@ -0,0 +1,70 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from core.crypto import (
+    HEADER_SIZE,
+    StreamEncryptor,
+    decrypt_file,
+    encrypt_file,
+    generate_key,
+    iter_decrypt,
+    load_key,
+)
+from core.file_handler import archive_file, calculate_hash, hash_stream
+
+
+@pytest.mark.parametrize("size", [0, 1, 1000, 64 * 1024, 64 * 1024 * 3 + 17])
+def test_encrypt_decrypt_roundtrip(size):
+    key = load_key(generate_key())
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "plain.bin"
+        src.write_bytes(os.urandom(size))
+        enc = encrypt_file(src, Path(tmpdir) / "plain.bin.enc", key)
+        # короткий открытый текст может случайно встретиться в шифртексте
+        assert src.read_bytes() not in enc.read_bytes() or size < 64
+        out = decrypt_file(enc, Path(tmpdir) / "out.bin", key)
+        assert out.read_bytes() == src.read_bytes()
+
+
+def test_tampered_or_truncated_stream_is_rejected():
+    key = load_key(generate_key())
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "plain.bin"
+        src.write_bytes(os.urandom(200_000))
+        enc = encrypt_file(src, Path(tmpdir) / "plain.bin.enc", key)
+        data = bytearray(enc.read_bytes())
+
+        tampered = Path(tmpdir) / "tampered.enc"
+        data[HEADER_SIZE + 10] ^= 1
+        tampered.write_bytes(bytes(data))
+        with pytest.raises(RuntimeError):
+            decrypt_file(tampered, Path(tmpdir) / "out1.bin", key)
+        assert not (Path(tmpdir) / "out1.bin").exists()
+
+        truncated = Path(tmpdir) / "truncated.enc"
+        truncated.write_bytes(enc.read_bytes()[: HEADER_SIZE + 64 * 1024 + 16])
+        with pytest.raises(RuntimeError):
+            decrypt_file(truncated, Path(tmpdir) / "out2.bin", key)
+
+
+def test_archive_file_encrypts_in_single_pass():
+    key = load_key(generate_key())
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "doc.txt"
+        src.write_bytes(b"secret " * 50_000)
+        dst = Path(tmpdir) / "archive" / "doc.txt.enc"
+        digest = archive_file(
+            src, dst, writer_factory=lambda raw: StreamEncryptor(raw, key)
+        )
+        assert digest == calculate_hash(src)
+        assert b"secret" not in dst.read_bytes()
+        with dst.open("rb") as f:
+            assert hash_stream(iter_decrypt(f, key)) == digest
+
+
+def test_load_key_rejects_wrong_length():
+    with pytest.raises(ValueError):
+        load_key("c2hvcnQ=")
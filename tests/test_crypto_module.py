@@ -26,3 +26,17 @@ def test_hash(crypto_proc):
         resp["result"]
         == "b94d27b9934d3e08a52e52d7da7dabfac484efe37a5380ee9088f7ace2efcde9"
     )
+
+
+def test_hash_path_blake3(crypto_proc, tmp_path):
+    src = tmp_path / "payload.bin"
+    src.write_bytes(b"abc")
+    req = {"cmd": "hash", "path": str(src), "algorithm": "blake3"}
+    proc = subprocess.Popen(
+        [str(crypto_proc)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    stdout, _ = proc.communicate(json.dumps(req))
+    assert (
+        json.loads(stdout)["result"]
+        == "6437b3ac38465133ffb63b75273a8db548c558465d79db03fd359c6cd5bd9d85"
+    )
@@ -0,0 +1,134 @@
+import asyncio
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from core.aio import AsyncClient
+from core.client import Client
+from core.dedup import BloomFilter, DedupIndex, LRUCache
+from core.exceptions import DuplicateEntryError
+from core.metadata_store import MetadataStore
+from helpers import make_config
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    keys = [f"{i:064x}" for i in range(1000)]
+    for k in keys:
+        bloom.add(k)
+    assert all(k in bloom for k in keys)
+    false_pos = sum(f"x{i}" in bloom for i in range(10000))
+    assert false_pos < 300
+
+
+def test_lru_cache_evicts_and_invalidates():
+    cache = LRUCache(max_entries=2)
+    for i in range(3):
+        cache.put({"id": i, "hash": f"h{i}"})
+    assert cache.get(entry_id=0) is None
+    assert cache.get(file_hash="h2")["id"] == 2
+    cache.invalidate(2)
+    assert cache.get(file_hash="h2") is None
+    assert len(cache) == 1
+
+
+def test_dedup_index_skips_db_for_new_hashes_and_warms_from_snapshot():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        store = MetadataStore(str(tmp / "test.db"))
+        for i in range(50):
+            store.add_entry(f"/fake/{i}", f"h{i}", {"title": str(i)})
+
+        snapshot = tmp / "dedup.snapshot"
+        index = DedupIndex(store, capacity=100, snapshot_path=snapshot)
+        assert index.get_entry_by_hash("h7")["id"] == 8
+        assert index.get_entry_by_hash("h7")["id"] == 8  # из LRU
+        assert all(index.get_entry_by_hash(f"new{i}") is None for i in range(200))
+        assert index.db_lookups < 5
+        assert index.save_snapshot()
+
+        # строки другого процесса подхватываются refresh() после загрузки снимка
+        store.add_entry("/fake/new", "h-new", {"title": "new"})
+        scans = []
+
+        class _ScanLog(MetadataStore):
+            def iter_hashes(self, after_id=0):
+                scans.append(after_id)
+                return super().iter_hashes(after_id)
+
+        warm = DedupIndex(
+            _ScanLog(str(tmp / "test.db")), capacity=100, snapshot_path=snapshot
+        )
+        assert scans == [50]  # снимок подошёл: дочитан только хвост
+        assert "h-new" in warm.bloom
+        assert warm.get_entry_by_hash("absent") is None
+        assert warm.db_lookups == 0
+        assert warm.get_entry_by_hash("h-new")["id"] == 51
+        assert warm.db_lookups == 1
+
+        # переполнение -> перестройка с удвоенной ёмкостью
+        for i in range(120):
+            store.add_entry(f"/more/{i}", f"m{i}", {})
+        warm.refresh()
+        assert warm.capacity >= 200
+        assert all(f"m{i}" in warm.bloom for i in range(120))
+
+        # снимок от другой БД отбрасывается
+        other = MetadataStore(str(tmp / "other.db"))
+        other.add_entry("/x", "zzz", {})
+        fresh = DedupIndex(other, capacity=100, snapshot_path=snapshot)
+        assert fresh.get_entry_by_hash("h7") is None
+        assert fresh.get_entry_by_hash("zzz") is not None
+
+
+def test_client_uses_dedup_index():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        config = make_config(tmp)
+        config["dedup"] = {"enabled": True, "snapshot": str(tmp / "dedup.snapshot")}
+        files = []
+        for i in range(10):
+            p = tmp / f"f{i}.txt"
+            p.write_text(f"payload {i}")
+            files.append(p)
+        with Client(config) as client:
+            assert client.add_many(files).ok
+            assert client.dedup.db_lookups == 0
+            again = client.add_many(files[:3])
+            assert len(again.errors) == 3
+            entry_id = client.list()[0].id
+            assert client.verify(id=entry_id).ok
+            assert client.dedup.cache.get(entry_id=entry_id) is None  # инвалидация
+        assert (tmp / "dedup.snapshot").exists()
+
+
+def test_long_lived_index_sees_entries_added_by_another_client():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        config = make_config(tmp)
+        config["dedup"] = {"enabled": True}
+        first, second = tmp / "first.txt", tmp / "second.txt"
+        first.write_text("added through the async client")
+        second.write_text("added by another process")
+        copy = tmp / "copy.txt"
+        copy.write_text(second.read_text())
+
+        async def run():
+            async with AsyncClient(config) as aclient:
+                added = await aclient.add(first)
+                cached = aclient.client.dedup.get_entry_by_id(added.entry_id)
+                assert aclient.client.dedup.cache.get(entry_id=cached["id"])
+
+                with Client(config) as other:
+                    other.add(second)
+                # фильтр долгоживущего индекса дочитывает чужую строку
+                with pytest.raises(DuplicateEntryError):
+                    await aclient.add(copy)
+                # чужая запись сбрасывает LRU: строки могли устареть
+                assert aclient.client.dedup.cache.get(entry_id=cached["id"]) is None
+
+        asyncio.run(run())
+        with Client(config) as client:
+            hashes = [h for _, h in client.store.iter_hashes()]
+        assert len(hashes) == len(set(hashes)) == 2
@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from core.fsck import MISSING, ORPHAN, fsck, iter_archive
+from core.logger import AuditLogger
+from core.metadata_store import MetadataStore
+from core.sharding import ShardedMetadataStore
+
+
+def _touch(path: Path, age: float = 7200) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x")
+    old = time.time() - age
+    os.utime(path, (old, old))
+    return str(path)
+
+
+def test_iter_archive_yields_sorted_paths():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        # "b/c" < "b/c-1" < "b/c.d/e": порядок строк, а не порядок обхода os.walk
+        names = ["a.txt", "a-b", "a1/a", "b/c", "b/c.d/e", "b.x", "a0/z", "é", "b/c-1"]
+        for name in names:
+            _touch(root / name)
+        errors = []
+        walked = list(iter_archive(str(root), workers=3, errors=errors))
+        expected = [
+            os.path.join(dirpath, f)
+            for dirpath, _, files in os.walk(root)
+            for f in files
+        ]
+        assert walked == sorted(expected)
+        assert not errors
+
+
+@pytest.mark.parametrize("shards", [1, 3])
+def test_fsck_reports_and_fixes(shards):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        base = Path(tmpdir)
+        archive = base / "archive"
+        db = base / "metadata.db"
+        store = (
+            ShardedMetadataStore(db, shards) if shards > 1 else MetadataStore(str(db))
+        )
+        ids = {}
+        for i in range(20):
+            sub = "sub/" if i % 2 else ""
+            path = _touch(archive / f"{sub}f{i}.bin")
+            ids[path] = store.add_entry(path, f"{i:064x}", {"title": str(i)})
+        orphan = _touch(archive / "sub" / "orphan.bin")
+        recent = _touch(archive / "fresh.bin", age=0)
+        gone = [str(archive / "f4.bin"), str(archive / "sub" / "f7.bin")]
+        for path in gone:
+            os.unlink(path)
+        outside = str(base / "elsewhere" / "old.bin")
+        store.add_entry(outside, "f" * 64, {"title": "old"})
+
+        found = []
+        report = fsck(store, archive, on_issue=found.append)
+        assert report.orphans == 1 and report.missing == 3
+        assert report.skipped_recent == 1
+        assert report.files == 20 and report.entries == 21
+        assert {(i.kind, i.path) for i in found} == {
+            (ORPHAN, orphan),
+            (MISSING, gone[0]),
+            (MISSING, gone[1]),
+            (MISSING, outside),
+        }
+        assert not report.clean
+
+        audit = AuditLogger(base / "audit.jsonl")
+        report = fsck(store, archive, action="quarantine", audit=audit)
+        assert report.quarantined == 4
+        assert not os.path.exists(orphan)
+        assert list((base / "quarantine").rglob("orphan.bin"))
+        assert store.get_entry_by_path(gone[0])["verified"] == 0
+        assert os.path.exists(recent)
+
+        report = fsck(store, archive, action="purge", audit=audit)
+        assert report.orphans == 0 and report.purged == 3
+        assert store.get_entry_by_path(gone[1]) is None
+        assert store.count() == 18
+        assert fsck(store, archive).clean
+
+        events = [
+            json.loads(line)["event"]
+            for line in (base / "audit.jsonl").read_text().splitlines()
+        ]
+        assert events.count("fsck_quarantine") == 4
+        assert events.count("fsck_purge") == 3
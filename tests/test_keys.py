@@ -0,0 +1,63 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from core.crypto import encrypt_file, generate_key, load_key
+from core.keys import KeyManager, rotate_master_key
+from core.metadata_store import MetadataStore
+from core.reader import read_entry
+
+
+def _add_encrypted(store, keys, tmp: Path, name: str, payload: bytes) -> dict:
+    src = tmp / name
+    src.write_bytes(payload)
+    dek, data_key = keys.new_data_key()
+    enc = encrypt_file(src, tmp / f"{name}.enc", dek)
+    entry_id = store.add_entry(str(enc), name, {}, data_key=data_key)
+    return store.get_entry_by_id(entry_id)
+
+
+def test_envelope_roundtrip_and_rotation():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        store = MetadataStore(str(tmp / "m.db"))
+        old = KeyManager(store, generate_key())
+        entry = _add_encrypted(store, old, tmp, "a.txt", b"payload a")
+        enc_before = Path(entry["file_path"]).read_bytes()
+
+        assert read_entry(entry, key=old.data_key_for(entry)) == b"payload a"
+
+        new = KeyManager(store, "correct horse battery staple")
+        assert rotate_master_key(store, old, new) == 1
+        assert Path(entry["file_path"]).read_bytes() == enc_before
+        assert read_entry(entry, key=new.data_key_for(entry)) == b"payload a"
+        with pytest.raises(ValueError):
+            old.data_key_for(entry)
+
+
+def test_rotation_adopts_legacy_master_key_entries():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        store = MetadataStore(str(tmp / "m.db"))
+        secret = generate_key()
+        src = tmp / "legacy.txt"
+        src.write_bytes(b"legacy")
+        enc = encrypt_file(src, tmp / "legacy.txt.enc", load_key(secret))
+        entry = store.get_entry_by_id(store.add_entry(str(enc), "h", {}))
+
+        old = KeyManager(store, secret)
+        assert read_entry(entry, key=old.data_key_for(entry)) == b"legacy"
+
+        new = KeyManager(store, generate_key())
+        assert rotate_master_key(store, old, new) == 1
+        assert read_entry(entry, key=new.data_key_for(entry)) == b"legacy"
+
+
+def test_passphrase_master_key_is_stable_per_store():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = MetadataStore(str(Path(tmpdir) / "m.db"))
+        a = KeyManager(store, "passphrase")
+        b = KeyManager(store, "passphrase")
+        assert a.key_id == b.key_id
+        assert b.unwrap(a.wrap(b"k" * 32)) == b"k" * 32
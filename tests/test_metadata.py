@@ -1,5 +1,8 @@
+import sqlite3
 import tempfile
 from pathlib import Path
+import pytest
+
 from core.metadata_store import MetadataStore
 
 
@@ -12,3 +15,118 @@ def test_add_and_get():
         entry = store.get_entry_by_path("/fake/path")
         assert entry is not None
         assert entry["hash"] == "abcdef"
+
+
+def test_iter_entries_keyset_pages_and_projection():
+    import csv
+    import io
+    import json
+
+    from core.export import write_csv, write_ndjson
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = MetadataStore(str(Path(tmpdir) / "test.db"))
+        for i in range(25):
+            store.add_entry(f"/fake/{i}", f"h{i}", {"title": f"T{i}", "n": i})
+        # одинаковые added: порядок внутри добивается id
+        conn = store._get_conn()
+        conn.execute("UPDATE books SET added = '2026-01-01' WHERE id <= 10")
+        conn.commit()
+        conn.close()
+
+        all_ids = [e["id"] for e in store.iter_entries(fields=["id"], batch_size=4)]
+        assert len(all_ids) == 25 and len(set(all_ids)) == 25
+
+        pages, after = [], None
+        while True:
+            page = list(
+                store.iter_entries(
+                    fields=["id"], after=after, limit=7, order="asc", with_cursor=True
+                )
+            )
+            pages.extend(e["id"] for _, e in page)
+            if len(page) < 7:
+                break
+            after = page[-1][0]
+        assert pages == list(range(1, 26))
+
+        raw = next(store.iter_entries(fields=["id", "metadata"], decode_metadata=False))
+        assert isinstance(raw["metadata"], str)
+
+        out = io.StringIO()
+        rows = store.iter_entries(fields=["id", "metadata"], decode_metadata=False)
+        assert write_ndjson(rows, out) == 25
+        first = json.loads(out.getvalue().splitlines()[0])
+        assert first["metadata"]["title"] == "T24"
+
+        out = io.StringIO()
+        write_csv(store.iter_entries(fields=["id", "hash"]), out, ["id", "hash"])
+        records = list(csv.reader(io.StringIO(out.getvalue())))
+        assert records[0] == ["id", "hash"] and len(records) == 26
+
+        with pytest.raises(ValueError):
+            store.iter_entries(fields=["nope"])
+        with pytest.raises(ValueError):
+            store.iter_entries(after="garbage")
+
+
+def test_query_pushes_filters_into_sql():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = str(Path(tmpdir) / "test.db")
+        store = MetadataStore(db_path)
+        for i in range(10):
+            store.add_entry(
+                f"/fake/{i}",
+                f"h{i}",
+                {
+                    "title": f"T{i}",
+                    "author": "Doe" if i % 2 else "Roe",
+                    "size_bytes": i * 100,
+                    "tags": ["even" if i % 2 == 0 else "odd", "all"],
+                    "lang": "ru" if i < 3 else "en",
+                },
+            )
+
+        ids = lambda rows: sorted(r["id"] for r in rows)  # noqa: E731
+        assert ids(store.query(author="Doe")) == [2, 4, 6, 8, 10]
+        assert ids(store.query(author="Doe", size_gt=500)) == [8, 10]
+        assert ids(store.query(tag="even", size_lte=200)) == [1, 3]
+        assert ids(store.query(tag=["odd", "all"], size_lt=400)) == [2, 4]
+        assert ids(store.query(lang="ru")) == [1, 2, 3]  # не promoted: json_extract
+        assert store.count(tag="all") == 10
+        assert store.count(author="Nobody") == 0
+
+        plan = store._get_conn().execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM books WHERE meta_author = ?", ("Doe",)
+        )
+        assert "idx_books_meta_author" in " ".join(str(r[3]) for r in plan)
+
+        # новый promoted-ключ добавляется к существующей БД
+        store = MetadataStore(db_path, promoted_keys=["author", "lang"])
+        assert ids(store.query(lang="en", author="Roe")) == [5, 7, 9]
+
+        with pytest.raises(ValueError):
+            store.query(**{"bad-key": 1})
+
+
+def test_schema_upgrade_adds_hash_algo():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Path(tmpdir) / "old.db"
+        conn = sqlite3.connect(db)
+        conn.execute(
+            "CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "file_path TEXT NOT NULL UNIQUE, hash TEXT NOT NULL, metadata TEXT NOT NULL, "
+            "added TEXT NOT NULL, verified INTEGER DEFAULT 1, last_checked TEXT)"
+        )
+        conn.execute(
+            "INSERT INTO books (file_path, hash, metadata, added) "
+            "VALUES ('/a', 'h1', '{}', '2026-01-01')"
+        )
+        conn.execute("PRAGMA user_version = 3")
+        conn.commit()
+        conn.close()
+
+        store = MetadataStore(str(db))
+        assert store.get_entry_by_hash("h1")["hash_algo"] == "sha256"
+        new_id = store.add_entry("/b", "h2", {}, hash_algo="blake3")
+        assert store.get_entry_by_id(new_id)["hash_algo"] == "blake3"
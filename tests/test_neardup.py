@@ -0,0 +1,239 @@
+import asyncio
+import random
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from core.aio import AsyncClient
+from core.client import Client
+from core.crypto import generate_key
+from core.exceptions import ConfigError, DuplicateEntryError, NearDuplicateError
+from core.neardup import MinHasher
+from core.sharding import ShardedMetadataStore, reshard
+from helpers import make_config
+
+# свой генератор: данные не зависят от того, что тянуло random до нас
+_rng = random.Random(11)
+VOCAB = [f"word{i}" for i in range(3000)]
+
+
+def _text(n: int = 800) -> str:
+    return " ".join(_rng.choice(VOCAB) for _ in range(n))
+
+
+def _edit(text: str, changes: int = 3) -> str:
+    words = text.split()
+    for _ in range(changes):
+        words[_rng.randrange(len(words))] = "edited"
+    return " ".join(words)
+
+
+def _near_config(tmp: Path, **near) -> dict:
+    config = make_config(tmp)
+    config["near_dup"] = {"enabled": True, "threshold": 0.8, **near}
+    return config
+
+
+def test_signature_estimates_jaccard_and_collides_in_bands():
+    hasher = MinHasher(num_perm=128, bands=32, shingle_size=3)
+    base = _text(2000).encode()
+    edited = _edit(base.decode(), 20).encode()
+    a, b = hasher.signature(base), hasher.signature(edited)
+    assert hasher.signature(base) == a  # детерминированно
+    assert hasher.unpack(hasher.pack(a)) == a
+
+    near = hasher.similarity(a, b)
+    assert 0.8 < near < 1.0
+    # оценка близка к точному Жаккару по шинглам
+    sa, sb = hasher.shingles(base), hasher.shingles(edited)
+    assert len(sa & sb) / len(sa | sb) == pytest.approx(near, abs=0.1)
+    other = hasher.signature(_text(2000).encode())
+    assert hasher.similarity(a, other) < 0.1
+    assert set(hasher.buckets(a)) & set(hasher.buckets(b))
+    assert not set(hasher.buckets(a)) & set(hasher.buckets(other))
+
+    # короткий текст и содержимое без слов тоже получают подпись
+    assert len(hasher.signature(b"two words")) == 128
+    assert len(hasher.signature(b"\x00\x01\x02")) == 128
+    with pytest.raises(ValueError):
+        MinHasher(num_perm=100, bands=32)
+
+
+def test_add_flags_near_duplicates():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        original = _text()
+        files = {
+            "original": original,
+            "reexport": _edit(original),
+            "unrelated": _text(),
+        }
+        for name, text in files.items():
+            (tmp / f"{name}.txt").write_text(text)
+
+        with Client(_near_config(tmp)) as client:
+            first = client.add(tmp / "original.txt")
+            flagged = client.add(tmp / "reexport.txt")
+            plain = client.add(tmp / "unrelated.txt")
+
+            meta = client.entry(flagged.entry_id).metadata["near_duplicate"]
+            assert meta["id"] == first.entry_id and meta["hash"] == first.hash
+            assert 0.8 <= meta["similarity"] < 1
+            assert "near_duplicate" not in client.entry(plain.entry_id).metadata
+            # точный дубликат по-прежнему отклоняется
+            with pytest.raises(DuplicateEntryError):
+                client.add(tmp / "original.txt")
+
+            # внутри одной пачки: второй файл сравнивается с первым
+            batch = [tmp / "a.txt", tmp / "b.txt"]
+            text = _text()
+            batch[0].write_text(text)
+            batch[1].write_text(_edit(text))
+            result = client.add_many(batch)
+            assert result.ok
+            flagged = [
+                a
+                for a in result.added
+                if "near_duplicate" in client.entry(a.entry_id).metadata
+            ]
+            assert len(flagged) == 1
+
+
+def test_add_rejects_near_duplicates():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        original = _text()
+        (tmp / "original.txt").write_text(original)
+        (tmp / "copy.txt").write_text(_edit(original))
+        (tmp / "copy2.txt").write_text(_edit(original, 2))
+
+        with Client(_near_config(tmp, action="reject")) as client:
+            first = client.add(tmp / "original.txt")
+            with pytest.raises(NearDuplicateError) as err:
+                client.add(tmp / "copy.txt")
+            assert err.value.existing_id == first.entry_id
+            assert err.value.similar_hash == first.hash
+            assert isinstance(err.value, DuplicateEntryError)
+            assert sorted(p.name for p in (tmp / "archive").iterdir()) == [
+                "original.txt"
+            ]
+
+            # удалённая запись больше не мешает добавлению
+            client.store.delete_entries([first.entry_id])
+            assert client.add(tmp / "copy.txt").entry_id
+            result = client.add_many([tmp / "copy2.txt"])
+            assert isinstance(result.errors[0][2], NearDuplicateError)
+
+
+@pytest.mark.parametrize("action", ["flag", "reject"])
+def test_async_add_checks_near_duplicates(action):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        original = _text()
+        (tmp / "original.txt").write_text(original)
+        (tmp / "copy.txt").write_text(_edit(original))
+
+        async def run():
+            async with AsyncClient(_near_config(tmp, action=action)) as client:
+                first = await client.add(tmp / "original.txt")
+                if action == "reject":
+                    with pytest.raises(NearDuplicateError) as err:
+                        await client.add(tmp / "copy.txt")
+                    assert err.value.existing_id == first.entry_id
+                    assert not (tmp / "archive" / "copy.txt").exists()
+                    return
+                flagged = await client.add(tmp / "copy.txt")
+                meta = client.client.entry(flagged.entry_id).metadata
+                assert meta["near_duplicate"]["id"] == first.entry_id
+                assert meta["near_duplicate"]["similarity"] >= 0.8
+
+        asyncio.run(run())
+
+
+def test_report_clusters_existing_entries_after_backfill():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        groups = []
+        paths = []
+        for g in range(3):
+            base = _text()
+            texts = [base] + [_edit(base) for _ in range(g + 1)]
+            groups.append(len(texts))
+            for i, text in enumerate(texts):
+                path = tmp / f"g{g}_{i}.txt"
+                path.write_text(text)
+                paths.append(path)
+        for i in range(5):
+            path = tmp / f"single{i}.txt"
+            path.write_text(_text())
+            paths.append(path)
+
+        config = _near_config(tmp)
+        config["near_dup"]["enabled"] = False
+        with Client(config) as client:
+            assert client.add_many(paths).ok
+            assert client.near_duplicates() == []  # ещё не проиндексированы
+            clusters = client.near_duplicates(backfill=True)
+            assert [len(c.entries) for c in clusters] == sorted(groups, reverse=True)
+            for c in clusters:
+                prefixes = {Path(e.file_path).name.split("_")[0] for e in c.entries}
+                assert len(prefixes) == 1 and c.similarity >= 0.8
+            assert client.index_near_duplicates() == 0
+
+            # удалённые записи выпадают из отчёта
+            client.store.delete_entries([clusters[-1].entries[0].id])
+            assert len(client.near_duplicates()) == 2
+            assert len(client.near_duplicates(threshold=0.999)) == 0
+
+
+def test_backfill_signs_encrypted_entries_past_one_segment():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        src = tmp / "big.txt"
+        src.write_text(_text(60000))  # ~420 КБ: несколько сегментов по 64 КиБ
+        config = make_config(tmp, encrypt=True)
+        config["near_dup"] = {"enabled": False}
+        with Client(config, master_key=generate_key()) as client:
+            added = client.add(src)
+            assert client.index_near_duplicates() == 1
+            hasher = client.minhasher
+            stored = client.store.get_minhashes([added.hash])[added.hash]
+            # подпись с расшифрованного архива совпадает с подписью исходника
+            assert hasher.unpack(stored) == hasher.signature(src.read_bytes())
+
+
+def test_changed_parameters_are_a_config_error():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        (tmp / "a.txt").write_text(_text())
+        with Client(_near_config(tmp)) as client:
+            client.add(tmp / "a.txt")
+        with Client(_near_config(tmp, bands=16)) as client:
+            with pytest.raises(ConfigError):
+                client.near_duplicates()
+
+
+def test_sharded_lsh_index_and_reshard():
+    hasher = MinHasher()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = Path(tmpdir) / "metadata.db"
+        store = ShardedMetadataStore(db, 3)
+        base = _text()
+        texts = {f"{i:02x}" + "0" * 62: _edit(base) for i in range(0, 256, 32)}
+        for h, text in texts.items():
+            sig = hasher.signature(text.encode())
+            store.add_entry(
+                f"/f/{h}", h, {}, minhash=(hasher.pack(sig), hasher.buckets(sig))
+            )
+        probe = hasher.signature(base.encode())
+        found = {h for h, _ in store.lsh_candidates(hasher.buckets(probe))}
+        assert found == set(texts)
+        rows = list(store.iter_lsh_buckets())
+        assert rows == sorted(rows) and len(rows) == len(texts) * hasher.bands
+        assert store.unindexed_minhashes() == []
+
+        reshard(db, 3, 2)
+        moved = ShardedMetadataStore(db, 2)
+        assert {h for h, _ in moved.lsh_candidates(hasher.buckets(probe))} == found
+        assert set(moved.get_minhashes(texts)) == set(texts)
@@ -111,6 +111,74 @@ def test_cli_add_verify_list(setup_env):
         assert result.returncode == 0
         assert "Test" in result.stdout
 
+        # list --format ndjson: stdout содержит только данные
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "core.orchestrator",
+                "list",
+                "--format",
+                "ndjson",
+                "--fields",
+                "id,hash,metadata",
+            ],
+            capture_output=True,
+            text=True,
+        )
+        assert result.returncode == 0, f"stderr: {result.stderr}"
+        row = json.loads(result.stdout)
+        assert row["id"] == rows[0][0]
+        assert row["metadata"]["author"] == "Tester"
+
+        # catalog export: бинарный снимок в stdout
+        result = subprocess.run(
+            [sys.executable, "-m", "core.orchestrator", "catalog", "export"],
+            capture_output=True,
+        )
+        assert result.returncode == 0, f"stderr: {result.stderr}"
+        assert result.stdout.startswith(b"GLYCAT1\n")
+
+        # watch --once: новый файл из incoming_dir, уже добавленный — дубликат
+        (env["incoming"] / "later.txt").write_text("arrived later")
+        result = subprocess.run(
+            [sys.executable, "-m", "core.orchestrator", "watch", "--once", "--poll"],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        assert result.returncode == 0, f"stderr: {result.stderr}"
+        lines = sorted(result.stdout.splitlines())
+        assert lines[0].endswith("later.txt") and lines[0].split("\t")[0].isdigit()
+        assert lines[1] == f"dup\t{env['test_file'].resolve()}"
+
+        # analyze --backfill: записи, добавленные без analysis.enabled
+        result = subprocess.run(
+            [sys.executable, "-m", "core.orchestrator", "analyze", "--backfill"],
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        assert result.returncode == 0, f"stderr: {result.stderr}"
+        assert result.stdout.splitlines()[-1].startswith("analyzed=2 failed=0")
+        result = subprocess.run(
+            [sys.executable, "-m", "core.orchestrator", "analyze", "--show", "1"],
+            capture_output=True,
+            text=True,
+        )
+        assert result.returncode == 0, f"stderr: {result.stderr}"
+        assert json.loads(result.stdout)["result"]["keywords"] == ["hello", "glyph"]
+
+        # near-dups --backfill: две несхожие записи — кластеров нет
+        result = subprocess.run(
+            [sys.executable, "-m", "core.orchestrator", "near-dups", "--backfill"],
+            capture_output=True,
+            text=True,
+        )
+        assert result.returncode == 0, f"stderr: {result.stderr}"
+        assert result.stdout == ""
+        assert "0 near-duplicate cluster(s)" in result.stderr
+
     finally:
         if config_dst.exists():
             config_dst.unlink()
@@ -0,0 +1,94 @@
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from core.exceptions import DuplicateEntryError
+from core.ingest import IngestContext, IngestItem, ingest_files
+from core.logger import AuditLogger
+from core.metadata_store import MetadataStore
+from core.pipeline import Pipeline, Stage
+from core.remote import RemoteStorage
+
+
+def test_pipeline_runs_stages_and_collects_errors():
+    def double(x):
+        return x * 2
+
+    def reject_odd_source(x):
+        if x % 4 == 2:
+            raise ValueError(x)
+        return x
+
+    pipeline = Pipeline(
+        [
+            Stage("double", double, workers=3, queue_size=2),
+            Stage("filter", reject_odd_source, workers=2, queue_size=2),
+        ]
+    )
+    result = pipeline.run(range(100))
+    assert sorted(result.results) == [x * 2 for x in range(100) if x % 2 == 0]
+    assert len(result.errors) == 50
+    assert all(stage == "filter" for stage, _, _ in result.errors)
+    assert result.stats["double"].processed == 100
+    assert result.stats["filter"].failed == 50
+
+
+def test_pipeline_applies_backpressure():
+    in_flight = []
+    lock = threading.Lock()
+    peak = [0]
+
+    def produce():
+        for i in range(50):
+            with lock:
+                in_flight.append(i)
+                peak[0] = max(peak[0], len(in_flight))
+            yield i
+
+    def slow(x):
+        time.sleep(0.001)
+        with lock:
+            in_flight.remove(x)
+        return x
+
+    Pipeline([Stage("slow", slow, workers=1, queue_size=4)]).run(produce())
+    # очередь 4 + 1 в работе + 1 у фидера
+    assert peak[0] <= 6
+
+
+def _context(tmp: Path) -> IngestContext:
+    config = {
+        "storage": {"archive_dir": str(tmp / "archive")},
+        "security": {"hash_algo": "sha256", "encryption": {"enabled": False}},
+    }
+    return IngestContext(
+        config,
+        MetadataStore(str(tmp / "m.db")),
+        AuditLogger(tmp / "audit.jsonl"),
+        RemoteStorage({}),
+    )
+
+
+def test_ingest_batch_with_duplicates():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        ctx = _context(tmp)
+        incoming = tmp / "incoming"
+        incoming.mkdir()
+        for i in range(20):
+            (incoming / f"f{i}.txt").write_text(f"content {i}")
+        (incoming / "copy.txt").write_text("content 3")
+
+        items = [IngestItem(p) for p in sorted(incoming.iterdir())]
+        result = ingest_files(ctx, items, workers=4)
+
+        assert len(result.results) == 20
+        assert len(result.errors) == 1
+        assert isinstance(result.errors[0][2], DuplicateEntryError)
+        assert len(list((tmp / "archive").iterdir())) == 20
+        assert len(ctx.store.list_entries(limit=100)) == 20
+
+        again = ingest_files(ctx, [IngestItem(incoming / "f0.txt")])
+        assert again.results == []
+        assert again.errors[0][0] == "dedup"
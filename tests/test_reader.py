@@ -0,0 +1,79 @@
+import io
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from core.crypto import EncryptedFileReader, encrypt_file, generate_key, load_key
+from core.reader import copy_range, open_entry, parse_range, read_entry
+
+
+def test_parse_range():
+    assert parse_range("0-9") == (0, 10)
+    assert parse_range("100-") == (100, None)
+    for bad in ("abc", "5-1", "-5", "1:2"):
+        with pytest.raises(ValueError):
+            parse_range(bad)
+
+
+def test_encrypted_range_decrypts_only_overlapping_segments(monkeypatch):
+    key = load_key(generate_key())
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "big.bin"
+        data = os.urandom(64 * 1024 * 10 + 123)
+        src.write_bytes(data)
+        enc = encrypt_file(src, Path(tmpdir) / "big.bin.enc", key)
+
+        decrypted = []
+        original = EncryptedFileReader._segment
+
+        def spy(self, index):
+            if index != self._cached_index:
+                decrypted.append(index)
+            return original(self, index)
+
+        monkeypatch.setattr(EncryptedFileReader, "_segment", spy)
+
+        entry = {"file_path": str(enc)}
+        start, end = parse_range("200000-200999")
+        assert read_entry(entry, start, end, key=key) == data[start:end]
+        assert decrypted == [3]
+
+        with open_entry(entry, key) as f:
+            assert f.size == len(data)
+            f.seek(-10, io.SEEK_END)
+            assert f.read() == data[-10:]
+
+
+def test_read_entry_range_spanning_segments():
+    key = load_key(generate_key())
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "big.bin"
+        data = os.urandom(64 * 1024 * 4 + 7)
+        src.write_bytes(data)
+        enc = encrypt_file(src, Path(tmpdir) / "big.bin.enc", key)
+        entry = {"file_path": str(enc)}
+        # через одну и через несколько границ сегментов
+        for start, end in ((65000, 70000), (1000, 64 * 1024 * 3 + 5), (0, None)):
+            assert read_entry(entry, start, end, key=key) == data[start:end]
+
+
+def test_copy_range_plain_file():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "plain.txt"
+        src.write_bytes(b"0123456789")
+        out = io.BytesIO()
+        with open_entry({"file_path": str(src)}) as f:
+            assert copy_range(f, out, 2, 5) == 3
+        assert out.getvalue() == b"234"
+
+
+def test_encrypted_entry_requires_key():
+    key = load_key(generate_key())
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir) / "a.txt"
+        src.write_bytes(b"hello")
+        enc = encrypt_file(src, Path(tmpdir) / "a.txt.enc", key)
+        with pytest.raises(ValueError):
+            open_entry({"file_path": str(enc)})
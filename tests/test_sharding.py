@@ -0,0 +1,87 @@
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from core.client import Client
+from core.metadata_store import MetadataStore
+from core.sharding import ShardedMetadataStore, reshard, shard_paths
+from helpers import make_config
+
+
+def _hash(i: int) -> str:
+    return f"{i * 2654435761 % 2**32:08x}" + "0" * 56
+
+
+def test_sharded_store_routes_and_merges():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        base = Path(tmpdir) / "metadata.db"
+        store = ShardedMetadataStore(base, 4)
+
+        def add(i):
+            return store.add_entry(
+                f"/f/{i}", _hash(i), {"title": f"T{i}", "tags": ["t"]}
+            )
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ids = list(pool.map(add, range(40)))
+        assert len(set(ids)) == 40
+        assert all(p.exists() for p in shard_paths(base, 4))
+        for i, entry_id in enumerate(ids):
+            assert store.get_entry_by_id(entry_id)["hash"] == _hash(i)
+            assert store.get_entry_by_hash(_hash(i))["id"] == entry_id
+        assert store.get_entry_by_path("/f/7")["id"] == ids[7]
+
+        listed = store.list_entries(limit=100)
+        keys = [(e["added"], e["id"]) for e in listed]
+        assert len(listed) == 40 and keys == sorted(keys, reverse=True)
+        assert store.count(tag="t") == 40
+        assert len(store.search("T1", limit=5)) == 5
+        assert [h for h, _, _ in store.iter_replication_candidates("r")] == sorted(
+            _hash(i) for i in range(40)
+        )
+
+        with pytest.raises(ValueError):
+            ShardedMetadataStore(base, 2)
+
+
+def test_reshard_preserves_ids_and_keeps_allocating_unique_ids():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        base = Path(tmpdir) / "metadata.db"
+        single = MetadataStore(str(base))
+        ids = {
+            single.add_entry(f"/f/{i}", _hash(i), {"title": str(i)}, ("k", b"w"))
+            for i in range(30)
+        }
+        salt = single.get_or_set_meta("kdf_salt", "abc")
+
+        assert reshard(base, 1, 3) == 30
+        sharded = ShardedMetadataStore(base, 3)
+        assert {e["id"] for e in sharded.list_entries(limit=100)} == ids
+        assert sharded.get_or_set_meta("kdf_salt", "other") == salt
+        assert all(sharded.get_data_key(i) == ("k", b"w") for i in ids)
+
+        new_ids = {sharded.add_entry(f"/g/{i}", _hash(100 + i), {}) for i in range(9)}
+        assert not new_ids & ids and min(new_ids) > max(ids)
+
+        assert reshard(base, 3, 1) == 39
+        back = MetadataStore(str(base))
+        assert {e["id"] for e in back.list_entries(limit=100)} == ids | new_ids
+
+
+def test_client_with_sharded_catalog():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        config = make_config(tmp)
+        config["metadata"]["shards"] = 4
+        files = []
+        for i in range(12):
+            p = tmp / f"f{i}.txt"
+            p.write_text(f"sharded payload {i}")
+            files.append(p)
+        with Client(config) as client:
+            result = client.add_many(files)
+            assert result.ok and len(result.added) == 12
+            assert all(client.verify(id=a.entry_id).ok for a in result.added)
+            assert client.count() == 12
@@ -0,0 +1,178 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.client import Client  # noqa: E402
+from core.crypto import generate_key  # noqa: E402
+from core.exceptions import ConfigError  # noqa: E402
+from core.similarity import HashingEmbedder, SimilarityIndex  # noqa: E402
+from helpers import make_config  # noqa: E402
+
+DOCS = {
+    "cats": "Cats are small domestic animals. Cats purr and chase mice at night.",
+    "kittens": "Kittens grow into cats. Young cats purr and chase mice and toys.",
+    "rust": "The Rust compiler checks ownership and borrowing at compile time.",
+    "python": "The Python interpreter compiles source to bytecode at run time.",
+    "bread": "Knead the dough, let it rise overnight and bake the bread hot.",
+}
+
+
+def _random_unit(rng, n, dim):
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def test_hashing_embedder_is_normalised_and_topical():
+    emb = HashingEmbedder(128)
+    vectors = emb.embed(list(DOCS.values()) + [""])
+    assert vectors.shape == (6, 128) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors[:5], axis=1), 1, atol=1e-5)
+    assert not vectors[5].any()  # пустой текст — нулевой вектор
+    scores = vectors[1:5] @ vectors[0]
+    assert scores.argmax() == 0  # kittens ближе всего к cats
+
+
+def test_blocked_search_matches_brute_force():
+    rng = np.random.default_rng(7)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        index = SimilarityIndex(Path(tmpdir), 32, "test")
+        data = _random_unit(rng, 1000, 32)
+        # две порции — дозапись без перестроения
+        index.append(list(range(1, 601)), data[:600])
+        index.append(list(range(601, 1001)), data[600:])
+        queries = _random_unit(rng, 5, 32)
+
+        results = index.search(queries, k=7, exclude=[3], block_rows=128)
+        scores = queries @ data.T
+        scores[:, 2] = -np.inf
+        for q, hits in enumerate(results):
+            expected = np.argsort(-scores[q])[:7] + 1
+            assert [i for i, _ in hits] == expected.tolist()
+            assert hits[0][1] == pytest.approx(scores[q].max(), abs=1e-5)
+
+        # k больше, чем строк в блоке и во всём индексе
+        assert len(index.search(queries[0], k=2000, block_rows=300)[0]) == 1000
+        assert index.vector(42) == pytest.approx(data[41])
+        # self_ids: каждый запрос исключает только свою запись
+        own = index.search(data[[9, 19]], k=1, self_ids=[10, 20])
+        assert own[0][0][0] != 10 and own[1][0][0] != 20
+        assert [hits[0][0] for hits in index.search(data[[9, 19]], k=1)] == [10, 20]
+
+
+def test_index_reopens_and_drops_torn_append():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir)
+        index = SimilarityIndex(path, 8, "test")
+        index.append([1, 2], np.eye(8, dtype=np.float32)[:2], watermarks=[5])
+        # прерванная дозапись: строки есть, index.json не обновлён
+        with (path / "vectors.f32").open("ab") as f:
+            f.write(np.ones(8, dtype=np.float32).tobytes())
+
+        reopened = SimilarityIndex(path, 8, "test")
+        assert (len(reopened), reopened.watermarks) == (2, [5])
+        assert [i for i, _ in reopened.search(np.eye(8)[1], k=5)[0]] == [2, 1]
+        reopened.append([7], np.eye(8, dtype=np.float32)[2:3])
+        assert reopened.watermarks == [5]
+        assert reopened.entry_ids().tolist() == [1, 2, 7]
+        assert (path / "vectors.f32").stat().st_size == 3 * 8 * 4
+        assert reopened.search(np.eye(8)[2], k=1)[0][0][0] == 7
+
+        with pytest.raises(ValueError):
+            SimilarityIndex(path, 16, "test")
+        with pytest.raises(ValueError):
+            SimilarityIndex(path, 8, "other")
+
+
+def _similarity_config(tmp: Path, encrypt: bool = False) -> dict:
+    config = make_config(tmp, encrypt=encrypt)
+    config["similarity"] = {"path": str(tmp / "similarity"), "dim": 128}
+    return config
+
+
+@pytest.mark.parametrize("encrypt", [False, True])
+def test_client_similar_indexes_incrementally(encrypt):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        ids = {}
+        key = generate_key() if encrypt else None
+        with Client(_similarity_config(tmp, encrypt), master_key=key) as client:
+            for name in ("cats", "rust", "bread"):
+                src = tmp / f"{name}.txt"
+                src.write_text(DOCS[name])
+                ids[name] = client.add(src).entry_id
+            assert client.index_similarity() == 3
+            assert client.index_similarity() == 0
+
+            for name in ("kittens", "python"):
+                src = tmp / f"{name}.txt"
+                src.write_text(DOCS[name])
+                ids[name] = client.add(src).entry_id
+            # similar сам дозаписывает новые записи
+            hits = client.similar(ids["cats"], k=2)
+            assert len(client.similarity) == 5
+            assert [e.id for e, _ in hits][0] == ids["kittens"]
+            assert ids["cats"] not in [e.id for e, _ in hits]
+            assert hits[0][1] > hits[1][1]
+
+            # удалённые записи не возвращаются, выборка добирается до k
+            client.store.delete_entries([ids["kittens"]])
+            hits = client.similar(ids["cats"], k=3)
+            assert len(hits) == 3 and ids["kittens"] not in [e.id for e, _ in hits]
+
+            batch = client.similar_many([ids["rust"], ids["python"]], k=1)
+            assert batch[ids["rust"]][0][0].id == ids["python"]
+            assert batch[ids["python"]][0][0].id == ids["rust"]
+
+        # индекс на диске переживает клиента
+        with Client(_similarity_config(tmp, encrypt), master_key=key) as client:
+            assert client.index_similarity() == 0
+            assert len(client.similarity) == 5
+
+
+def test_sharded_index_keeps_a_watermark_per_shard():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        config = _similarity_config(tmp)
+        config["metadata"]["shards"] = 3
+        texts = [f"{text} Note {i}." for i, text in enumerate(DOCS.values())] * 3
+        ids = []
+
+        def add(i):
+            src = tmp / f"doc{i}.txt"
+            src.write_text(f"{texts[i]} ({i})")
+            ids.append(client.add(src).entry_id)
+
+        with Client(config) as client:
+            for i in range(6):
+                add(i)
+            assert client.index_similarity() == 6
+            # id шардов не монотонны между собой: новые записи бывают
+            # ниже наибольшего уже проиндексированного id
+            for i in range(6, 12):
+                add(i)
+            assert min(ids[6:]) < max(ids[:6])
+            assert client.index_similarity() == 6
+            assert sorted(client.similarity.entry_ids().tolist()) == sorted(ids)
+
+            # после решардинга каталог проходится заново без дублей
+            client.reshard(2)
+            assert client.index_similarity() == 0
+            add(12)
+            assert client.index_similarity() == 1
+            assert client.index_similarity() == 0
+            assert sorted(client.similarity.entry_ids().tolist()) == sorted(ids)
+
+
+def test_embedder_mismatch_is_a_config_error():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        with Client(_similarity_config(tmp)) as client:
+            client.index_similarity()
+        config = _similarity_config(tmp)
+        config["similarity"]["embedder"] = "nonexistent.module:make"
+        with Client(config) as client:
+            with pytest.raises(ConfigError):
+                client.similar(1)
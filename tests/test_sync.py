@@ -0,0 +1,89 @@
+import hashlib
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from core.metadata_store import MetadataStore
+from core.remote import RemoteStorage
+from core.sync import STATE_REPLICATED, sync_remote
+
+
+def _setup(tmp: Path, count: int):
+    store = MetadataStore(str(tmp / "metadata.db"))
+    archive = tmp / "archive"
+    archive.mkdir()
+    for i in range(count):
+        p = archive / f"f{i}.txt"
+        p.write_text(f"data{i}")
+        store.add_entry(str(p), hashlib.sha256(p.read_bytes()).hexdigest(), {})
+    remote = RemoteStorage(
+        {"remote": {"enabled": True, "type": "dir", "path": str(tmp / "remote")}}
+    )
+    return store, remote, archive
+
+
+def test_sync_uploads_only_missing():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        store, remote, archive = _setup(tmp, 5)
+
+        report = sync_remote(store, remote, workers=2)
+        assert report.missing == 5
+        assert report.uploaded == 5
+        assert sorted(remote.iter_manifest()) == list(remote.iter_manifest())
+
+        p = archive / "new.txt"
+        p.write_text("new data")
+        new_hash = hashlib.sha256(b"new data").hexdigest()
+        store.add_entry(str(p), new_hash, {})
+
+        report = sync_remote(store, remote, workers=2)
+        assert report.local_objects == 6
+        assert report.missing == 1
+        assert report.uploaded == 1
+        assert remote.has_object(new_hash)
+        assert store.get_replication_state(new_hash, remote.name) == STATE_REPLICATED
+        assert store.replication_summary(remote.name) == {STATE_REPLICATED: 6}
+
+
+def test_sync_records_failures():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        store, remote, archive = _setup(tmp, 2)
+        (archive / "f0.txt").unlink()
+
+        report = sync_remote(store, remote)
+        assert report.failed == 1
+        assert report.uploaded == 1
+        assert store.replication_summary(remote.name) == {
+            "failed": 1,
+            STATE_REPLICATED: 1,
+        }
+
+
+def test_sync_dry_run_does_not_upload():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store, remote, _ = _setup(Path(tmpdir), 3)
+        report = sync_remote(store, remote, dry_run=True)
+        assert report.missing == 3
+        assert report.uploaded == 0
+        assert list(remote.iter_manifest()) == []
+
+
+def test_sync_writes_states_while_streaming_a_large_catalog():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        count = 2600  # несколько пачек состояний (_STATE_BATCH = 1000)
+        store, remote, _ = _setup(tmp, count)
+
+        # состояния пишутся пачками по ходу обхода каталога
+        report = sync_remote(store, remote, workers=4)
+        assert (report.local_objects, report.uploaded) == (count, count)
+        assert store.replication_summary(remote.name) == {STATE_REPLICATED: count}
+
+        # объекты уже на реплике, состояния потеряны: ветка present
+        with sqlite3.connect(tmp / "metadata.db") as conn:
+            conn.execute("DELETE FROM replication")
+        report = sync_remote(store, remote, workers=4)
+        assert (report.missing, report.uploaded) == (0, 0)
+        assert store.replication_summary(remote.name) == {STATE_REPLICATED: count}
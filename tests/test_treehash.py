@@ -0,0 +1,56 @@
+import hashlib
+import os
+
+import pytest
+
+from core import treehash
+from core.file_handler import calculate_hash, hash_stream
+from core.treehash import Blake3, blake3_file_python, check_algorithm
+
+EMPTY = "af1349b9f5f9a1a6a0404dea36dcc9499bcb25c9adc112b7cc9a93cae41f3262"
+ABC = "6437b3ac38465133ffb63b75273a8db548c558465d79db03fd359c6cd5bd9d85"
+
+
+def test_blake3_known_digests():
+    assert Blake3().hexdigest() == EMPTY
+    assert Blake3(b"abc").hexdigest() == ABC
+
+
+@pytest.mark.parametrize("size", [1023, 1024, 1025, 4096, 5121, 9000])
+def test_blake3_incremental_split_does_not_matter(size):
+    data = bytes(i % 251 for i in range(size))
+    whole = Blake3(data).hexdigest()
+    for step in (1, 63, 1000):
+        hasher = Blake3()
+        for i in range(0, size, step):
+            hasher.update(data[i : i + step])
+        assert hasher.hexdigest() == whole
+
+
+@pytest.mark.parametrize("chunks", [5, 8, 9, 23])
+def test_parallel_subtrees_match_sequential(monkeypatch, tmp_path, chunks):
+    # сегменты по 2 чанка: проверка слияния поддеревьев на малых файлах
+    monkeypatch.setattr(treehash, "MIN_PARALLEL_SIZE", 0)
+    monkeypatch.setattr(treehash, "_MIN_SEGMENT_CHUNKS", 2)
+    path = tmp_path / "blob"
+    path.write_bytes(os.urandom(chunks * 1024 - 100))
+    expected = Blake3(path.read_bytes()).hexdigest()
+    assert blake3_file_python(str(path), workers=2) == expected
+
+
+def test_native_package_agrees_if_installed(tmp_path):
+    blake3 = pytest.importorskip("blake3")
+    data = os.urandom(70000)
+    assert Blake3(data).hexdigest() == blake3.blake3(data).hexdigest()
+
+
+def test_file_and_stream_hashes_agree(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_bytes(b"x" * 3000)
+    for algo in ("sha256", "blake3"):
+        chunks = iter([b"x" * 1000] * 3)
+        assert calculate_hash(path, algo) == hash_stream(chunks, algo)
+    assert calculate_hash(path) == hashlib.sha256(b"x" * 3000).hexdigest()
+    check_algorithm("blake3")
+    with pytest.raises(ValueError):
+        check_algorithm("crc-nope")
@@ -0,0 +1,145 @@
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from core.client import Client
+from core.exceptions import ConfigError
+from core.watch import InotifyWatcher, StabilityTracker, _Filter
+from helpers import make_config
+
+
+def _watch_config(tmp: Path, **watch) -> dict:
+    config = make_config(tmp)
+    config["storage"]["incoming_dir"] = str(tmp / "incoming")
+    config["watch"] = {"settle_seconds": 0.2, "batch_delay": 0.1, **watch}
+    (tmp / "incoming").mkdir()
+    return config
+
+
+def test_stability_tracker_waits_for_writer():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "growing.bin"
+        path.write_bytes(b"a")
+        tracker = StabilityTracker(settle=1.0)
+        tracker.offer(str(path), now=0.0)
+        assert tracker.ready(now=0.5) == []
+        with path.open("ab") as f:
+            f.write(b"more")
+        # размер изменился: отсчёт начинается заново
+        assert tracker.ready(now=1.2) == []
+        assert tracker.ready(now=2.0) == []
+        assert [p for p, _ in tracker.ready(now=2.3)] == [str(path)]
+        assert len(tracker) == 0
+
+        tracker.offer(str(path), now=3.0)
+        path.unlink()
+        assert tracker.ready(now=5.0) == [] and len(tracker) == 0
+
+
+@pytest.mark.parametrize("backend", ["poll", "inotify"])
+def test_watch_once_ingests_and_moves(backend):
+    if backend == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux-only")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        config = _watch_config(tmp, backend=backend, processed_dir=str(tmp / "done"))
+        incoming = tmp / "incoming"
+        (incoming / "sub").mkdir()
+        (incoming / "a.txt").write_text("alpha")
+        (incoming / "sub" / "b.txt").write_text("beta")
+        (incoming / "copy.txt").write_text("alpha")
+        (incoming / "partial.txt.part").write_text("skip me")
+
+        with Client(config) as client:
+            batches = client.watch(once=True)
+            added = [source for b in batches for source, _ in b.added]
+            duplicates = [source for b in batches for source in b.duplicates]
+            assert len(added) == 2 and len(duplicates) == 1
+            # какой из двух одинаковых файлов станет записью — зависит от порядка
+            titles = sorted(e.title for e in client.list())
+            assert titles in (["a", "b"], ["b", "copy"])
+
+        assert sorted(p.name for p in incoming.rglob("*") if p.is_file()) == [
+            "partial.txt.part"
+        ]
+        done = sorted(
+            str(p.relative_to(tmp / "done")) for p in (tmp / "done").rglob("*.txt")
+        )
+        assert done == ["a.txt", "copy.txt", str(Path("sub") / "b.txt")]
+
+
+@pytest.mark.parametrize("backend", ["poll", "inotify"])
+def test_watch_picks_up_new_files_in_batches(backend):
+    if backend == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux-only")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmp = Path(tmpdir)
+        config = _watch_config(tmp, backend=backend, batch_size=3, poll_interval=0.05)
+        incoming = tmp / "incoming"
+        stop = threading.Event()
+        batches = []
+
+        with Client(config) as client:
+            worker = threading.Thread(
+                target=client.watch,
+                kwargs={"stop": stop, "on_batch": batches.append},
+            )
+            worker.start()
+            try:
+                time.sleep(0.3)
+                (incoming / "new").mkdir()
+                for i in range(7):
+                    (incoming / "new" / f"{i}.txt").write_text(f"file {i}")
+                deadline = time.monotonic() + 10
+                while time.monotonic() < deadline:
+                    if sum(len(b.added) for b in batches) == 7:
+                        break
+                    time.sleep(0.05)
+            finally:
+                stop.set()
+                worker.join(timeout=10)
+            assert not worker.is_alive()
+            assert sum(len(b.added) for b in batches) == 7
+            assert all(len(b.added) <= 3 for b in batches)
+            assert client.count() == 7
+            # без processed_dir файлы остаются на месте и не добавляются повторно
+            assert all(not b.duplicates and not b.failed for b in batches)
+
+
+def test_inotify_reports_created_and_moved_files():
+    if not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux-only")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir)
+        watcher = InotifyWatcher(str(root), _Filter([".*"], []))
+        try:
+            assert watcher.initial() == set()
+            (root / "plain.txt").write_text("x")
+            (root / ".hidden").write_text("x")
+            (root / "staging").mkdir()
+            (root / "staging" / "inner.txt").write_text("y")
+            elsewhere = Path(tmpdir + "-src")
+            elsewhere.write_text("z")
+            elsewhere.rename(root / "moved.txt")
+            seen = set()
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and len(seen) < 3:
+                seen |= watcher.changes(0.1)
+            assert seen == {
+                str(root / "plain.txt"),
+                str(root / "staging" / "inner.txt"),
+                str(root / "moved.txt"),
+            }
+        finally:
+            watcher.close()
+
+
+def test_watch_requires_incoming_dir():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with Client(make_config(Path(tmpdir))) as client:
+            with pytest.raises(ConfigError):
+                client.watch(once=True)